@@ -1,7 +1,13 @@
+from os import environ
+
 from fastapi import FastAPI
-from sqlmodel import SQLModel
 
-from src.backend.database import engine
+from src.backend.database import engine, query_profiler, replicas
+from src.backend.database.migrations import migrate
+from src.backend.database.profiling import QueryProfilingMiddleware
+from src.backend.database.routing import ReadRoutingMiddleware
+from src.backend.dependencies import reaper, hasher, like_counter, metrics, images
+from src.backend.metrics import MetricsMiddleware
 from src.backend.routes import (
     nickname_validation,
     authentication,
@@ -12,15 +18,39 @@ from src.backend.routes import (
     likes,
     update_story,
     get_all_stories_by_userID,
-    goal_update_endpoint
+    goal_update_endpoint,
+    database_status,
+    metrics_endpoint,
+    batch_endpoint,
+    profile_endpoint,
 )
 
 app = FastAPI()
+app.add_middleware(
+    ReadRoutingMiddleware,
+    pin_seconds=int(environ.get("DATABASE_REPLICA_PIN_SECONDS", 5)),
+    # read-only endpoints taking a body
+    read_paths=frozenset({"/user/validate_nickname"}),
+)
+app.add_middleware(QueryProfilingMiddleware, profiler=query_profiler)
+app.add_middleware(MetricsMiddleware, registry=metrics)
 
 
 @app.on_event("startup")
 async def startup():
-    SQLModel.metadata.create_all(engine)
+    migrate(engine)
+    reaper.start()
+    like_counter.start()
+    replicas.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await reaper.stop()
+    await like_counter.stop()
+    await replicas.stop()
+    hasher.shutdown()
+    images.shutdown()
 
 
 app.include_router(
@@ -63,3 +93,19 @@ app.include_router(
     goal_update_endpoint.app,
     tags=["Goal"]
 )
+app.include_router(
+    profile_endpoint.app,
+    tags=["User"]
+)
+app.include_router(
+    batch_endpoint.app,
+    tags=["Batch"]
+)
+app.include_router(
+    database_status.app,
+    tags=["Status"]
+)
+app.include_router(
+    metrics_endpoint.app,
+    tags=["Status"]
+)
@@ -0,0 +1,123 @@
+"""Throughput of one worker serving story lookups with the sync and async ORM.
+
+Run from the repository root::
+
+    python -m benchmarks.async_orm_load [--requests N] [--concurrency C] [--latency-ms L]
+
+``before`` is ``GET /story/{id}`` as it was, an ``async def`` route running
+``Story.get_by_id`` on a sync session; ``after`` awaits
+``Story.aget_by_id``. Both are served in-process to concurrent clients.
+sqlite answers in microseconds, so every statement is delayed by
+``--latency-ms`` inside the driver, like the round trip to a database
+server: the sync driver waits on the event loop, the async one in its
+own thread.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+from time import perf_counter, sleep
+
+directory = tempfile.mkdtemp(prefix="actnow-bench-")
+# never the configured database, the benchmark writes to it
+os.environ["DATABASE_URL"] = f"sqlite:///{directory}/bench.sqlite"
+os.environ.setdefault("SESSION_MINUTES_TO_LIVE", "60")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, HTTPException  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from src.backend.database import async_engine, async_session, engine  # noqa: E402
+from src.backend.database.migrations import migrate  # noqa: E402
+from src.backend.database.orm import Goal, Story, User  # noqa: E402
+
+STORIES = 100
+
+app = FastAPI()
+
+
+@app.get("/before/story/{story_id}")
+async def before(story_id: int):
+    with Session(engine) as transaction:
+        story = Story.get_by_id(transaction, story_id)
+
+    if story is None:
+        raise HTTPException(status_code=404, detail="Story not found")
+
+    return story
+
+
+@app.get("/after/story/{story_id}")
+async def after(story_id: int):
+    async with async_session() as transaction:
+        story = await Story.aget_by_id(transaction, story_id)
+
+    if story is None:
+        raise HTTPException(status_code=404, detail="Story not found")
+
+    return story
+
+
+def add_latency(seconds: float) -> None:
+    # the trace callback runs in the thread executing the statement
+    def delay(statement):
+        sleep(seconds)
+
+    @event.listens_for(engine, "connect")
+    def sync_connect(connection, record):
+        connection.set_trace_callback(delay)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def async_connect(connection, record):
+        # adapted aiosqlite connection, the sqlite3 connection lives in its thread
+        connection._connection._conn.set_trace_callback(delay)
+
+
+def seed() -> None:
+    migrate(engine)
+    with Session(engine) as session:
+        user = User(nickname="bench", password="-")
+        session.add(user)
+        session.commit()
+        goal = Goal(title="bench", description="bench", user_id=user.id)
+        session.add(goal)
+        session.commit()
+        session.add_all(
+            Story(user_id=user.id, goal_id=goal.id, photo="photo", summary="bench") for _ in range(STORIES)
+        )
+        session.commit()
+
+
+async def load(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> float:
+    remaining = iter(range(requests))
+
+    async def client_loop():
+        for index in remaining:
+            response = await client.get(path.format(index % STORIES + 1))
+            response.raise_for_status()
+
+    start = perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+
+    return requests / (perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int) -> None:
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for name in ("before", "after"):
+            path = f"/{name}/story/{{}}"
+            await load(client, path, concurrency, concurrency)
+            print(f"{name:<8}{await load(client, path, requests, concurrency):>8.0f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent clients")
+    parser.add_argument("--latency-ms", type=float, default=2., help="added to every statement")
+    args = parser.parse_args()
+
+    seed()
+    add_latency(args.latency_ms / 1000)
+    asyncio.run(main(args.requests, args.concurrency))
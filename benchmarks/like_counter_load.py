@@ -0,0 +1,130 @@
+"""Like count updates under a burst of likes on a few popular stories.
+
+Run from the repository root::
+
+    python -m benchmarks.like_counter_load [--likes N] [--stories S] [--concurrency C]
+
+The likes are committed up front, only counting them is measured.
+``before`` recounts ``Story.like_count`` in its own transaction for every
+like, as a like handler counting synchronously would. ``after`` hands
+every like to the write-behind ``LikeCounter``, which recounts the liked
+stories in batches. Both end with the same counts, which is checked.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+from time import perf_counter
+
+directory = tempfile.mkdtemp(prefix="actnow-bench-")
+# never the configured database, the benchmark writes to it
+os.environ["DATABASE_URL"] = f"sqlite:///{directory}/bench.sqlite"
+os.environ.setdefault("SESSION_MINUTES_TO_LIVE", "60")
+
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session, select, update  # noqa: E402
+
+from src.backend.database import engine  # noqa: E402
+from src.backend.database.migrations import migrate  # noqa: E402
+from src.backend.database.orm import Goal, Story, User, UserStoryLikes  # noqa: E402
+from src.backend.internals.likes import LikeCounter  # noqa: E402
+
+
+def seed(stories: int) -> list[int]:
+    migrate(engine)
+    with Session(engine) as session:
+        user = User(nickname="bench", password="-")
+        session.add(user)
+        session.commit()
+        goal = Goal(title="bench", description="bench", user_id=user.id)
+        session.add(goal)
+        session.commit()
+        rows = [Story(user_id=user.id, goal_id=goal.id, photo="photo", summary="bench") for _ in range(stories)]
+        session.add_all(rows)
+        session.commit()
+
+        return [row.id for row in rows]
+
+
+def like(burst: list[int]) -> None:
+    # every like of the burst comes from another user
+    with Session(engine) as session:
+        users = [User(nickname=f"fan{index}", password="-") for index in range(len(burst))]
+        session.add_all(users)
+        session.commit()
+        session.add_all(UserStoryLikes(user_id=user.id, story_id=story_id) for user, story_id in zip(users, burst))
+        session.commit()
+
+
+def reset(story_ids: list[int]) -> None:
+    with Session(engine) as session:
+        session.exec(update(Story).where(Story.id.in_(story_ids)).values(like_count=0))
+        session.commit()
+
+
+def counts(story_ids: list[int]) -> dict[int, int]:
+    with Session(engine) as session:
+        return dict(session.exec(select(Story.id, Story.like_count).where(Story.id.in_(story_ids))).all())
+
+
+def count_one(story_id: int) -> None:
+    with Session(engine) as session:
+        Story.recount_like_counts(session, [story_id])
+
+
+async def before(likes: list[int], concurrency: int) -> None:
+    queue = iter(likes)
+
+    async def client_loop():
+        for story_id in queue:
+            await asyncio.to_thread(count_one, story_id)
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+
+
+async def after(likes: list[int], concurrency: int) -> None:
+    counter = LikeCounter(engine, reconcile_interval=0)
+    counter.start()
+    queue = iter(likes)
+
+    async def client_loop():
+        for story_id in queue:
+            counter.add(story_id, 1)
+            # a request yields to the loop at least once
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    await counter.stop()
+
+
+def main(likes: int, stories: int, concurrency: int) -> None:
+    story_ids = seed(stories)
+    # most likes go to a handful of stories
+    burst = random.Random(0).choices(story_ids, weights=[1 / (rank + 1) for rank in range(stories)], k=likes)
+    expected = {story_id: burst.count(story_id) for story_id in story_ids}
+    like(burst)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    print(f"{'mode':<8}{'likes/s':>10}{'UPDATEs':>10}")
+    for name, run in (("before", before), ("after", after)):
+        reset(story_ids)
+        statements.clear()
+        start = perf_counter()
+        asyncio.run(run(burst, concurrency))
+        elapsed = perf_counter() - start
+        updates = sum(statement.startswith("UPDATE") for statement in statements)
+
+        assert counts(story_ids) == expected, f"{name} lost likes"
+        print(f"{name:<8}{likes / elapsed:>10.0f}{updates:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--likes", type=int, default=20000, help="likes in the burst")
+    parser.add_argument("--stories", type=int, default=100, help="liked stories")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent clients")
+    args = parser.parse_args()
+    main(args.likes, args.stories, args.concurrency)
@@ -0,0 +1,91 @@
+"""Latency of liking a story for a user who already likes many stories.
+
+Run from the repository root::
+
+    python -m benchmarks.like_story [--liked N] [--likes K]
+
+``before`` likes the way ``User.like_story`` did before likes became a
+single statement: load the story, check membership in the user's
+``liked_stories`` collection, append and commit. Loading the collection
+reads every story the user likes. ``after`` is the current
+``User.like_story``, one insert-or-ignore on the link table.
+"""
+import argparse
+import os
+import tempfile
+from statistics import median, quantiles
+from time import perf_counter
+
+directory = tempfile.mkdtemp(prefix="actnow-bench-")
+# never the configured database, the benchmark writes to it
+os.environ["DATABASE_URL"] = f"sqlite:///{directory}/bench.sqlite"
+os.environ.setdefault("SESSION_MINUTES_TO_LIVE", "60")
+
+from sqlalchemy import insert  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from src.backend.database import engine  # noqa: E402
+from src.backend.database.migrations import migrate  # noqa: E402
+from src.backend.database.orm import Goal, Story, User, UserStoryLikes  # noqa: E402
+
+
+def like_before(user: User, session: Session, story_id: int) -> None:
+    story = Story.get_by_id(session, story_id)
+    if story not in user.liked_stories:
+        user.liked_stories.append(story)
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+
+
+def like_after(user: User, session: Session, story_id: int) -> None:
+    user.like_story(session, story_id)
+
+
+def seed(liked: int, likes: int) -> int:
+    migrate(engine)
+    with Session(engine) as session:
+        user = User(nickname="bench", password="-")
+        session.add(user)
+        session.commit()
+        goal = Goal(title="bench", description="bench", user_id=user.id)
+        session.add(goal)
+        session.commit()
+
+        stories = [
+            {"user_id": user.id, "goal_id": goal.id, "photo": "photo", "summary": "bench",
+             "deleted": False, "date_create": goal.date_create}
+            for _ in range(liked + 2 * likes)
+        ]
+        session.exec(insert(Story).values(stories))
+        session.exec(insert(UserStoryLikes).values([{"user_id": user.id, "story_id": i} for i in range(1, liked + 1)]))
+        session.commit()
+
+        return user.id
+
+
+def main(liked: int, likes: int) -> None:
+    user_id = seed(liked, likes)
+    # every run likes stories not liked yet
+    unliked = iter(range(liked + 1, liked + 2 * likes + 1))
+
+    print(f"{'mode':<8}{'median':>12}{'p95':>12}")
+    for name, like in (("before", like_before), ("after", like_after)):
+        timings = []
+        for _ in range(likes):
+            with Session(engine) as session:
+                user = User.get_by_id(session, user_id)
+                start = perf_counter()
+                like(user, session, next(unliked))
+                timings.append(perf_counter() - start)
+
+        p95 = quantiles(timings, n=20)[18]
+        print(f"{name:<8}{median(timings) * 1e3:>10.1f}ms{p95 * 1e3:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--liked", type=int, default=10000, help="stories the user already likes")
+    parser.add_argument("--likes", type=int, default=50, help="measured likes per mode")
+    args = parser.parse_args()
+    main(args.liked, args.likes)
@@ -0,0 +1,94 @@
+"""Cost of recording metrics on the request path.
+
+Run from the repository root::
+
+    python -m benchmarks.metrics_overhead [--updates N] [--requests N]
+
+Times a histogram observation and a counter increment, checks that
+counter updates from several threads are not lost, and compares an ASGI
+app with and without ``MetricsMiddleware``.
+"""
+import argparse
+import asyncio
+import threading
+import timeit
+from time import perf_counter
+
+from src.backend.metrics import MetricsMiddleware, MetricsRegistry
+
+
+class Route:
+    path = "/story/{story_id}"
+
+
+async def app(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"x" * 100})
+
+
+async def receive():
+    return {"type": "http.request"}
+
+
+async def send(message):
+    pass
+
+
+async def per_request(application, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/story/1"}
+    start = perf_counter()
+    for _ in range(requests):
+        await application(dict(scope), receive, send)
+
+    return (perf_counter() - start) / requests
+
+
+async def middleware_overhead(requests: int) -> tuple[float, float]:
+    instrumented = MetricsMiddleware(app, MetricsRegistry())
+    # the first round warms up
+    for _ in range(2):
+        bare = await per_request(app, requests)
+        measured = await per_request(instrumented, requests)
+
+    return bare, measured
+
+
+def main(updates: int, requests: int, threads: int) -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "Benchmark histogram.", ("route",))
+    counter = registry.counter("bench_total", "Benchmark counter.")
+
+    observe = timeit.timeit(lambda: histogram.observe(.003, ("/story/{story_id}",)), number=updates) / updates
+    increment = timeit.timeit(counter.inc, number=updates) / updates
+    print(f"histogram observe   {observe * 1e9:8.0f} ns")
+    print(f"counter inc         {increment * 1e9:8.0f} ns")
+
+    start = counter.collect()[()]
+
+    def work():
+        for _ in range(updates // 5):
+            counter.inc()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    lost = threads * (updates // 5) - (counter.collect()[()] - start)
+    print(f"{threads} threads, lost increments: {lost}")
+
+    bare, measured = asyncio.run(middleware_overhead(requests))
+    print(f"request bare        {bare * 1e6:8.2f} us")
+    print(f"request measured    {measured * 1e6:8.2f} us")
+    print(f"middleware overhead {(measured - bare) * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=1_000_000, help="timed metric updates")
+    parser.add_argument("--requests", type=int, default=200_000, help="timed requests per app")
+    parser.add_argument("--threads", type=int, default=8, help="threads updating one counter")
+    args = parser.parse_args()
+    main(args.updates, args.requests, args.threads)
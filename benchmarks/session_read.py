@@ -0,0 +1,84 @@
+"""Read latency of the session backends.
+
+Run from the repository root::
+
+    python -m benchmarks.session_read [--reads N]
+
+Every backend reads the same sessions from a fresh sqlite database in a
+temporary directory, the shared-memory table is a file next to it.
+Caches are disabled, so the database backends hit the database on every
+read.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+from statistics import median, quantiles
+from time import perf_counter
+from uuid import uuid4
+
+directory = tempfile.mkdtemp(prefix="actnow-bench-")
+# never the configured database, the benchmark writes to it
+os.environ["DATABASE_URL"] = f"sqlite:///{directory}/bench.sqlite"
+os.environ.setdefault("SESSION_MINUTES_TO_LIVE", "60")
+
+from src.backend.database import async_engine, engine  # noqa: E402
+from src.backend.database.migrations import migrate  # noqa: E402
+from src.backend.sessions import (  # noqa: E402
+    AsyncSQLBackend,
+    SessionData,
+    SharedMemoryBackend,
+    SharedSessionTable,
+    SignedSessionBackend,
+    SQLBackend,
+)
+
+
+async def measure(backend, keys, reads: int) -> list[float]:
+    timings = []
+    for index in range(reads):
+        key = keys[index % len(keys)]
+        start = perf_counter()
+        data = await backend.read(key)
+        timings.append(perf_counter() - start)
+        assert data is not None
+
+    return timings
+
+
+async def main(reads: int, sessions: int) -> None:
+    migrate(engine)
+    data = [SessionData(uuid=uuid4(), user_id=index + 1, nickname=f"user{index}") for index in range(sessions)]
+
+    sql = SQLBackend(engine)
+    for session in data:
+        await sql.create(session.uuid, SessionData(**session.dict()))
+
+    table = SharedSessionTable(f"{directory}/sessions.shm", slots=sessions * 2)
+    shared = SharedMemoryBackend(table)
+    for session in data:
+        await shared.create(session.uuid, session)
+
+    ids = [session.uuid for session in data]
+    backends = [
+        ("SQLBackend", sql, ids),
+        ("AsyncSQLBackend", AsyncSQLBackend(async_engine), ids),
+        ("SharedMemoryBackend", shared, ids),
+        # the signed cookie is the key, reads only check the revocation list
+        ("SignedSessionBackend", SignedSessionBackend(async_engine), data),
+    ]
+
+    print(f"{'backend':<22}{'median':>12}{'p99':>12}")
+    for name, backend, keys in backends:
+        await measure(backend, keys, min(reads, 1000))
+        timings = await measure(backend, keys, reads)
+        p99 = quantiles(timings, n=100)[98]
+        print(f"{name:<22}{median(timings) * 1e6:>10.1f}us{p99 * 1e6:>10.1f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reads", type=int, default=20000, help="reads per backend")
+    parser.add_argument("--sessions", type=int, default=1000, help="distinct sessions")
+    args = parser.parse_args()
+    asyncio.run(main(args.reads, args.sessions))
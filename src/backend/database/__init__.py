@@ -1,20 +1,183 @@
+from contextlib import asynccontextmanager, contextmanager
 from os import environ
-from sqlmodel import create_engine
-
-if environ.get('DATABASE_URL').startswith('mysql'):
-    engine = create_engine(
-        environ.get("DATABASE_URL"),
-        echo=False,
-    )
-elif environ.get('DATABASE_URL').startswith('postgresql'):
-    engine = create_engine(
-        environ.get("DATABASE_URL"),
-        echo=False,
-    )
-elif environ.get('DATABASE_URL').startswith('sqlite'):
-    connect_args = {"check_same_thread": False}
-    engine = create_engine(
-        environ.get("DATABASE_URL"),
-        echo=False,
-        connect_args=connect_args,
-    )
+from typing import AsyncIterator, Iterator
+
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.database.pool import PoolStats, pool_options
+from src.backend.database.profiling import QueryProfiler
+from src.backend.database.routing import Replica, ReplicaSet, RoutingAsyncSession, RoutingSession
+
+UNIT_OF_WORK = "unit_of_work"
+"""Session info key marking a session whose ORM methods defer commit and refresh."""
+
+engine_stats = PoolStats("engine")
+"""Pool statistics of the sync engine."""
+
+async_engine_stats = PoolStats("async_engine")
+"""Pool statistics of the async engine."""
+
+query_profiler = QueryProfiler(
+    strict=environ.get("QUERY_BUDGET_STRICT", "False") == "True",
+    repeat_threshold=int(environ.get("QUERY_REPEAT_THRESHOLD", 3)),
+)
+"""Per-request statement statistics of every engine."""
+
+
+def create_engines(url: str, stats: PoolStats, async_stats: PoolStats) -> tuple[Engine, AsyncEngine]:
+    """Create sync and async engine for database URL.
+
+    Args:
+        url (str): Database URL.
+        stats (PoolStats): Pool statistics of the sync engine.
+        async_stats (PoolStats): Pool statistics of the async engine.
+
+    Returns:
+        tuple[Engine, AsyncEngine]: Sync and async engine.
+    """
+    if url.startswith('mysql'):
+        sync_engine = create_engine(
+            url,
+            echo=False,
+            **pool_options("mysql", False, stats),
+        )
+        async_engine_ = create_async_engine(
+            make_url(url).set(drivername="mysql+aiomysql"),
+            echo=False,
+            **pool_options("mysql", True, async_stats),
+        )
+    elif url.startswith('postgresql'):
+        sync_engine = create_engine(
+            url,
+            echo=False,
+            **pool_options("postgresql", False, stats),
+        )
+        async_engine_ = create_async_engine(
+            make_url(url).set(drivername="postgresql+asyncpg"),
+            echo=False,
+            **pool_options("postgresql", True, async_stats),
+        )
+    elif url.startswith('sqlite'):
+        connect_args = {"check_same_thread": False}
+        sync_engine = create_engine(
+            url,
+            echo=False,
+            connect_args=connect_args,
+            **pool_options("sqlite", False, stats),
+        )
+        async_engine_ = create_async_engine(
+            make_url(url).set(drivername="sqlite+aiosqlite"),
+            echo=False,
+            connect_args=connect_args,
+            **pool_options("sqlite", True, async_stats),
+        )
+    else:
+        raise ValueError(f"Unsupported database URL: {url}")
+
+    stats.attach(sync_engine)
+    async_stats.attach(async_engine_.sync_engine)
+    query_profiler.attach(sync_engine)
+    query_profiler.attach(async_engine_.sync_engine)
+
+    return sync_engine, async_engine_
+
+
+engine, async_engine = create_engines(environ.get("DATABASE_URL"), engine_stats, async_engine_stats)
+
+replica_stats: list[PoolStats] = []
+"""Pool statistics of the replica engines."""
+
+
+def create_replicas(urls: str) -> list[Replica]:
+    """Create engines of comma separated replica URLs.
+
+    Args:
+        urls (str): Replica URLs.
+
+    Returns:
+        list[Replica]: Replicas.
+    """
+    created = []
+    for index, url in enumerate(url.strip() for url in urls.split(",") if url.strip()):
+        stats, async_stats = PoolStats(f"replica{index}"), PoolStats(f"async_replica{index}")
+        replica_stats.extend((stats, async_stats))
+        created.append(Replica(f"replica{index}", *create_engines(url, stats, async_stats)))
+
+    return created
+
+
+replicas = ReplicaSet(
+    create_replicas(environ.get("DATABASE_REPLICA_URLS", "")),
+    interval=float(environ.get("DATABASE_REPLICA_HEALTH_INTERVAL", 5)),
+    timeout=float(environ.get("DATABASE_REPLICA_HEALTH_TIMEOUT", 2)),
+)
+"""Read replicas, empty without ``DATABASE_REPLICA_URLS``."""
+
+
+def async_session() -> AsyncSession:
+    """Open session on the async engine.
+
+    Committed objects are not expired, so their attributes stay readable
+    without a lazy load, which an async session cannot do implicitly.
+    Reads of read-only requests go to a replica when one is configured.
+
+    Returns:
+        AsyncSession: Async session.
+    """
+    return RoutingAsyncSession(async_engine, expire_on_commit=False, replicas=replicas)
+
+
+def sync_session() -> Session:
+    """Open session on the sync engine.
+
+    Reads of read-only requests go to a replica when one is configured.
+
+    Returns:
+        Session: Session.
+    """
+    return RoutingSession(engine, replicas=replicas)
+
+
+@contextmanager
+def unit_of_work() -> Iterator[Session]:
+    """Open session that commits once when the block exits.
+
+    ORM ``create``/``update``/``delete`` methods called with this session only
+    add their objects; everything is flushed and committed in one transaction
+    at the end of the block and rolled back if it raises. Primary keys of new
+    objects are therefore assigned on exit, link dependent rows through
+    relationships instead of ids.
+
+    Yields:
+        Session: Session in unit-of-work mode.
+    """
+    with RoutingSession(engine, expire_on_commit=False, replicas=replicas) as session:
+        session.info[UNIT_OF_WORK] = True
+        try:
+            yield session
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+
+
+@asynccontextmanager
+async def async_unit_of_work() -> AsyncIterator[AsyncSession]:
+    """Open async session that commits once when the block exits.
+
+    Async counterpart of :func:`unit_of_work`.
+
+    Yields:
+        AsyncSession: Async session in unit-of-work mode.
+    """
+    async with async_session() as session:
+        session.sync_session.info[UNIT_OF_WORK] = True
+        try:
+            yield session
+            await session.commit()
+        except BaseException:
+            await session.rollback()
+            raise
@@ -0,0 +1,263 @@
+"""Versioned schema migrations.
+
+Applied versions are recorded in the ``schema_migrations`` table. Every
+worker calls ``migrate`` on startup; the first one to take the migration
+lock applies pending migrations, the others find them already recorded.
+
+Migrations spell out their DDL and never read the models, so a fresh
+database goes through the same steps as an old one. Version 1 is the
+schema as it was before migrations existed; databases created back then
+already have its tables, so every step skips what is in place.
+"""
+import fcntl
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, inspect, select, text
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel.sql.sqltypes import GUID, AutoString
+
+__all__ = [
+    "MIGRATIONS",
+    "migrate",
+]
+
+LOCK_KEY = 0x41637441
+"""Advisory lock key shared by all workers."""
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, description: str):
+    """Register function as migration
+
+    :param version: schema version, migrations are applied in ascending order
+    :param description: short description
+    """
+    def decorator(upgrade: Callable[[Connection], None]):
+        MIGRATIONS.append(Migration(version, description, upgrade))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return upgrade
+
+    return decorator
+
+
+def create_index(connection: Connection, name: str, table: str, *columns: str, live_only: bool = False) -> None:
+    """Create index unless it exists
+
+    :param connection: connection
+    :param name: index name
+    :param table: table name
+    :param columns: indexed columns
+    :param live_only: only index rows not soft deleted, where the dialect supports partial indexes
+    """
+    # CREATE INDEX needs the column names only
+    columns = Table(table, MetaData(), *(Column(column) for column in columns)).c
+    where = {"postgresql_where": text("NOT deleted"), "sqlite_where": text("deleted = 0")} if live_only else {}
+    Index(name, *columns, **where).create(connection, checkfirst=True)
+
+
+def drop_indexes(connection: Connection, table: str, *names: str) -> None:
+    """Drop indexes if they exist
+
+    :param connection: connection
+    :param table: table name
+    :param names: index names
+    """
+    existing = {index["name"] for index in inspect(connection).get_indexes(table)}
+    quote = connection.dialect.identifier_preparer.quote
+
+    for name in names:
+        if name not in existing:
+            continue
+
+        if connection.dialect.name == "mysql":
+            connection.execute(text(f"DROP INDEX {quote(name)} ON {quote(table)}"))
+        else:
+            connection.execute(text(f"DROP INDEX {quote(name)}"))
+
+
+def has_column(connection: Connection, table: str, column: str) -> bool:
+    """Check whether table has column
+
+    :param connection: connection
+    :param table: table name
+    :param column: column name
+    """
+    return column in {c["name"] for c in inspect(connection).get_columns(table)}
+
+
+@migration(1, "baseline schema")
+def _baseline(connection: Connection) -> None:
+    metadata = MetaData()
+    Table(
+        "user", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("nickname", AutoString, nullable=False),
+        Column("password", AutoString, nullable=False),
+        Column("deleted", Boolean, nullable=False),
+    )
+    Table(
+        "usermetadata", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("description", AutoString),
+        Column("photo", AutoString),
+        Column("date_create", DateTime, nullable=False),
+        Column("date_modify", DateTime, nullable=False),
+        Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+    )
+    Table(
+        "goal", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("title", AutoString, nullable=False),
+        Column("description", AutoString, nullable=False),
+        Column("price", Float),
+        Column("deadline", DateTime),
+        Column("date_create", DateTime, nullable=False),
+        Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+        Column("deleted", Boolean, nullable=False),
+    )
+    Table(
+        "story", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+        Column("goal_id", Integer, ForeignKey("goal.id"), nullable=False),
+        Column("photo", AutoString, nullable=False),
+        Column("summary", AutoString, nullable=False),
+        Column("date_create", DateTime, nullable=False),
+        Column("deleted", Boolean, nullable=False),
+    )
+    Table(
+        "userstorylikes", metadata,
+        Column("user_id", Integer, ForeignKey("user.id"), primary_key=True),
+        Column("story_id", Integer, ForeignKey("story.id"), primary_key=True),
+    )
+    Table(
+        "sessions", metadata,
+        Column("uuid", GUID, primary_key=True),
+        Column("user_id", Integer, nullable=False),
+        Column("nickname", AutoString, nullable=False),
+        Column("expires_in", Float, nullable=False),
+    )
+    Table(
+        "revoked_sessions", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("uuid", GUID),
+        Column("user_id", Integer),
+        Column("expires_in", Float, nullable=False),
+    )
+
+    for table in metadata.sorted_tables:
+        table.create(connection, checkfirst=True)
+
+    # the reaper scans by expiry, databases older than it lack these
+    create_index(connection, "ix_sessions_expires_in", "sessions", "expires_in")
+    create_index(connection, "ix_revoked_sessions_expires_in", "revoked_sessions", "expires_in")
+
+
+@migration(2, "hot path indexes")
+def _hot_path_indexes(connection: Connection) -> None:
+    create_index(connection, "ix_user_nickname", "user", "nickname")
+    create_index(connection, "ix_usermetadata_user_id", "usermetadata", "user_id")
+    # second column of the primary key, lookups by story need their own index
+    create_index(connection, "ix_userstorylikes_story_id", "userstorylikes", "story_id")
+    create_index(connection, "ix_goal_user_id", "goal", "user_id", live_only=True)
+    create_index(connection, "ix_story_user_id", "story", "user_id", live_only=True)
+    create_index(connection, "ix_story_goal_id", "story", "goal_id", live_only=True)
+
+
+@migration(3, "keyset pagination indexes")
+def _keyset_pagination_indexes(connection: Connection) -> None:
+    create_index(connection, "ix_goal_user_id_date_create", "goal", "user_id", "date_create", "id", live_only=True)
+    create_index(connection, "ix_story_user_id_date_create", "story", "user_id", "date_create", "id", live_only=True)
+    create_index(connection, "ix_story_goal_id_date_create", "story", "goal_id", "date_create", "id", live_only=True)
+    # covered by the composite indexes
+    drop_indexes(connection, "goal", "ix_goal_user_id")
+    drop_indexes(connection, "story", "ix_story_user_id", "ix_story_goal_id")
+
+
+@migration(4, "story like counter")
+def _story_like_count(connection: Connection) -> None:
+    if not has_column(connection, "story", "like_count"):
+        connection.execute(text("ALTER TABLE story ADD COLUMN like_count INTEGER NOT NULL DEFAULT 0"))
+
+    connection.execute(text(
+        "UPDATE story SET like_count = "
+        "(SELECT COUNT(*) FROM userstorylikes WHERE userstorylikes.story_id = story.id)"
+    ))
+
+
+@contextmanager
+def _migration_lock(connection: Connection):
+    dialect = connection.dialect.name
+
+    if dialect == "postgresql":
+        # released with the transaction
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+        yield
+    elif dialect == "mysql":
+        connection.execute(text("SELECT GET_LOCK(:name, -1)"), {"name": f"migrations_{LOCK_KEY}"})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": f"migrations_{LOCK_KEY}"})
+    elif connection.engine.url.database and connection.engine.url.database != ":memory:":
+        # sqlite is only ever shared by workers of one host
+        with open(f"{connection.engine.url.database}.migrations.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+    else:
+        yield
+
+
+def migrate(engine: Engine) -> list[int]:
+    """Apply pending migrations
+
+    :param engine: engine
+    :return: applied versions
+    """
+    applied = []
+
+    with engine.begin() as connection, _migration_lock(connection):
+        schema_migrations.create(connection, checkfirst=True)
+        done = set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+        for m in MIGRATIONS:
+            if m.version in done:
+                continue
+
+            m.upgrade(connection)
+            connection.execute(
+                schema_migrations.insert().values(
+                    version=m.version,
+                    description=m.description,
+                    applied_at=datetime.now(),
+                )
+            )
+            applied.append(m.version)
+
+    return applied
+
+
+if __name__ == "__main__":
+    from src.backend.database import engine
+
+    print("Applied migrations:", migrate(engine) or "none")
@@ -1,8 +1,16 @@
-from sqlmodel import SQLModel, Field, Relationship, select, Session
-from typing import List, TypeVar
+from sqlalchemy import Index, event, false, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session as _Session, aliased, with_loader_criteria
+from sqlmodel import SQLModel, Field, Relationship, delete, func, select, update, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.database import UNIT_OF_WORK
+from src.backend.database.pagination import Cursor, paginate
+from typing import Dict, Iterable, List, Set, Tuple, TypeVar
 from datetime import datetime
 
 __all__ = [
+    "INCLUDE_DELETED",
     "User",
     "UserMetadata",
     "Goal",
@@ -10,12 +18,64 @@ __all__ = [
     "UserStoryLikes",
 ]
 
+INCLUDE_DELETED = "include_deleted"
+"""Execution option that disables soft-delete filtering of a statement."""
+
 U = TypeVar("U", bound="User")
 UM = TypeVar("UM", bound="UserMetadata")
 G = TypeVar("G", bound="Goal")
 S = TypeVar("S", bound="Story")
 
 
+def _commit(session: Session, *instances: SQLModel) -> None:
+    """Commit session and refresh instances
+
+    Does nothing in unit-of-work mode, the owner of the session commits.
+
+    :param session: session
+    :param instances: instances to refresh
+    """
+    if session.info.get(UNIT_OF_WORK):
+        return
+
+    session.commit()
+    for instance in instances:
+        session.refresh(instance)
+
+
+async def _acommit(session: AsyncSession, *instances: SQLModel) -> None:
+    """Commit session and refresh instances
+
+    Does nothing in unit-of-work mode, the owner of the session commits.
+
+    :param session: async session
+    :param instances: instances to refresh
+    """
+    if session.sync_session.info.get(UNIT_OF_WORK):
+        return
+
+    await session.commit()
+    for instance in instances:
+        await session.refresh(instance)
+
+
+def _insert_ignore(session: _Session, model: type[SQLModel], rows: List[dict]):
+    """Build insert that skips rows conflicting with existing keys
+
+    :param session: sync session, its bind decides the dialect
+    :param model: table model
+    :param rows: rows to insert
+    :return: insert statement
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model).values(rows).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(model).values(rows).on_conflict_do_nothing()
+
+    return insert(model).values(rows).prefix_with("IGNORE")
+
+
 class UserStoryLikes(SQLModel, table=True):
     """UserStoryLikes model
 
@@ -23,7 +83,112 @@ class UserStoryLikes(SQLModel, table=True):
     :param story_id: story id
     """
     user_id: int | None = Field(foreign_key="user.id", primary_key=True)
-    story_id: int | None = Field(foreign_key="story.id", primary_key=True)
+    # second column of the primary key, lookups by story need their own index
+    story_id: int | None = Field(foreign_key="story.id", primary_key=True, index=True)
+
+    @classmethod
+    def liked_story_ids(cls, session: Session, user_id: int, story_ids: Iterable[int]) -> Set[int]:
+        """Get which of the stories user likes, in one query
+
+        :param session: session
+        :param user_id: user id
+        :param story_ids: story ids
+        :return: ids of liked stories
+        """
+        story_ids = set(story_ids)
+        if not story_ids:
+            return set()
+
+        return set(session.exec(select(cls.story_id).where(cls.user_id == user_id, cls.story_id.in_(story_ids))))
+
+    @classmethod
+    async def aliked_story_ids(cls, session: AsyncSession, user_id: int, story_ids: Iterable[int]) -> Set[int]:
+        """Get which of the stories user likes, in one query
+
+        :param session: async session
+        :param user_id: user id
+        :param story_ids: story ids
+        :return: ids of liked stories
+        """
+        story_ids = set(story_ids)
+        if not story_ids:
+            return set()
+
+        statement = select(cls.story_id).where(cls.user_id == user_id, cls.story_id.in_(story_ids))
+        return set(await session.exec(statement))
+
+    @classmethod
+    def add(cls, session: Session, user_id: int, story_ids: Iterable[int]) -> int:
+        """Add likes of user, already existing ones are skipped
+
+        Stories are not checked, callers make sure they exist.
+
+        :param session: session
+        :param user_id: user id
+        :param story_ids: story ids
+        :return: number of likes added
+        """
+        rows = [{"user_id": user_id, "story_id": story_id} for story_id in set(story_ids)]
+        if not rows:
+            return 0
+
+        added = session.exec(_insert_ignore(session, cls, rows)).rowcount
+        _commit(session)
+        return added
+
+    @classmethod
+    async def aadd(cls, session: AsyncSession, user_id: int, story_ids: Iterable[int]) -> int:
+        """Add likes of user, already existing ones are skipped
+
+        Stories are not checked, callers make sure they exist.
+
+        :param session: async session
+        :param user_id: user id
+        :param story_ids: story ids
+        :return: number of likes added
+        """
+        rows = [{"user_id": user_id, "story_id": story_id} for story_id in set(story_ids)]
+        if not rows:
+            return 0
+
+        added = (await session.exec(_insert_ignore(session.sync_session, cls, rows))).rowcount
+        await _acommit(session)
+        return added
+
+    @classmethod
+    def remove(cls, session: Session, user_id: int, story_ids: Iterable[int]) -> int:
+        """Remove likes of user
+
+        :param session: session
+        :param user_id: user id
+        :param story_ids: story ids
+        :return: number of likes removed
+        """
+        story_ids = set(story_ids)
+        if not story_ids:
+            return 0
+
+        removed = session.exec(delete(cls).where(cls.user_id == user_id, cls.story_id.in_(story_ids))).rowcount
+        _commit(session)
+        return removed
+
+    @classmethod
+    async def aremove(cls, session: AsyncSession, user_id: int, story_ids: Iterable[int]) -> int:
+        """Remove likes of user
+
+        :param session: async session
+        :param user_id: user id
+        :param story_ids: story ids
+        :return: number of likes removed
+        """
+        story_ids = set(story_ids)
+        if not story_ids:
+            return 0
+
+        statement = delete(cls).where(cls.user_id == user_id, cls.story_id.in_(story_ids))
+        removed = (await session.exec(statement)).rowcount
+        await _acommit(session)
+        return removed
 
 
 # class user with id, nickname, password and relationship for UserMetadata
@@ -38,7 +203,7 @@ class User(SQLModel, table=True):
     :param user_metadata: user metadata
     """
     id: int | None = Field(default=None, primary_key=True)
-    nickname: str
+    nickname: str = Field(index=True)
     password: str
     goals: List["Goal"] = Relationship(back_populates="user")
     stories: List["Story"] = Relationship(back_populates="user")
@@ -47,25 +212,62 @@ class User(SQLModel, table=True):
     deleted: bool = Field(default=False)
 
     @classmethod
-    def get_by_nickname(cls: type[U], session: Session, nickname: str) -> U | None:
+    def get_by_nickname(cls: type[U], session: Session, nickname: str, include_deleted: bool = False) -> U | None:
         """Get user by nickname
 
         :param session: session
         :param nickname: user nickname
+        :param include_deleted: whether deleted users are looked up too
         :return: user
         """
-        return session.exec(select(cls).where(cls.nickname == nickname)).first()
+        statement = select(cls).where(cls.nickname == nickname).execution_options(include_deleted=include_deleted)
+        return session.exec(statement).first()
 
     @classmethod
-    def get_by_id(cls: type[U], session: Session, _id: int) -> U | None:
+    async def aget_by_nickname(
+            cls: type[U], session: AsyncSession, nickname: str, include_deleted: bool = False
+    ) -> U | None:
+        """Get user by nickname
+
+        :param session: async session
+        :param nickname: user nickname
+        :param include_deleted: whether deleted users are looked up too
+        :return: user
+        """
+        statement = select(cls).where(cls.nickname == nickname).execution_options(include_deleted=include_deleted)
+        return (await session.exec(statement)).first()
+
+    @classmethod
+    def get_by_id(cls: type[U], session: Session, _id: int, include_deleted: bool = False) -> U | None:
         """Get user by id
 
         :param session: session
         :param _id: user id
+        :param include_deleted: whether a deleted user is returned too
         :return: user
         """
+        if include_deleted:
+            return session.exec(select(cls).where(cls.id == _id).execution_options(include_deleted=True)).first()
+
         return session.get(cls, _id)
 
+    @classmethod
+    async def aget_by_id(
+            cls: type[U], session: AsyncSession, _id: int, include_deleted: bool = False
+    ) -> U | None:
+        """Get user by id
+
+        :param session: async session
+        :param _id: user id
+        :param include_deleted: whether a deleted user is returned too
+        :return: user
+        """
+        if include_deleted:
+            statement = select(cls).where(cls.id == _id).execution_options(include_deleted=True)
+            return (await session.exec(statement)).first()
+
+        return await session.get(cls, _id)
+
     @classmethod
     def get_all(cls: type[U], session: Session, limit: int = 100, offset: int = 0) -> List[U]:
         """Get all users
@@ -75,41 +277,141 @@ class User(SQLModel, table=True):
         :param offset: offset
         :return: users
         """
-        return session.exec(select(cls).offset(offset).limit(limit)).all()
+        return session.exec(select(cls).order_by(cls.id).offset(offset).limit(limit)).all()
+
+    @classmethod
+    async def aget_all(cls: type[U], session: AsyncSession, limit: int = 100, offset: int = 0) -> List[U]:
+        """Get all users
+
+        :param session: async session
+        :param limit: limit
+        :param offset: offset
+        :return: users
+        """
+        return (await session.exec(select(cls).order_by(cls.id).offset(offset).limit(limit))).all()
+
+    @classmethod
+    def get_with_metadata(cls: type[U], session: Session, _id: int) -> Tuple[U, "UserMetadata | None"] | None:
+        """Get user and its metadata in one query
+
+        :param session: session
+        :param _id: user id
+        :return: user and metadata
+        """
+        statement = select(cls, UserMetadata).join(UserMetadata, isouter=True).where(cls.id == _id)
+        return session.exec(statement).first()
+
+    @classmethod
+    async def aget_with_metadata(
+            cls: type[U], session: AsyncSession, _id: int
+    ) -> Tuple[U, "UserMetadata | None"] | None:
+        """Get user and its metadata in one query
+
+        :param session: async session
+        :param _id: user id
+        :return: user and metadata
+        """
+        statement = select(cls, UserMetadata).join(UserMetadata, isouter=True).where(cls.id == _id)
+        return (await session.exec(statement)).first()
 
-    def like_story(self, session: Session, story_id: int) -> U | None:
-        """Like story
+    def like_story(self, session: Session, story_id: int) -> bool:
+        """Like story, liking it again changes nothing
 
         :param session: session
         :param story_id: story id
+        :return: whether like was added
+        """
+        return UserStoryLikes.add(session, self.id, [story_id]) == 1
+
+    async def ahas_liked_story(self, session: AsyncSession, story_id: int) -> bool:
+        """Check whether user likes story
+
+        :param session: async session
+        :param story_id: story id
+        :return: whether story is liked
+        """
+        return await session.get(UserStoryLikes, (self.id, story_id)) is not None
+
+    def liked_story_ids(self, session: Session, story_ids: Iterable[int]) -> Set[int]:
+        """Get which of the stories user likes, in one query
+
+        :param session: session
+        :param story_ids: story ids
+        :return: ids of liked stories
+        """
+        return UserStoryLikes.liked_story_ids(session, self.id, story_ids)
+
+    async def aliked_story_ids(self, session: AsyncSession, story_ids: Iterable[int]) -> Set[int]:
+        """Get which of the stories user likes, in one query
+
+        :param session: async session
+        :param story_ids: story ids
+        :return: ids of liked stories
         """
-        story = Story.get_by_id(session, story_id)
-        if story:
-            if story not in self.liked_stories:
-                self.liked_stories.append(story)
-                session.add(self)
-                session.commit()
-                session.refresh(self)
-            return self
+        return await UserStoryLikes.aliked_story_ids(session, self.id, story_ids)
 
-        return None
+    def like_stories(self, session: Session, story_ids: Iterable[int]) -> int:
+        """Like stories with one insert
 
-    def dislike_story(self, session: Session, story_id: int) -> U | None:
-        """Dislike story
+        :param session: session
+        :param story_ids: story ids
+        :return: number of likes added
+        """
+        return UserStoryLikes.add(session, self.id, story_ids)
+
+    async def alike_stories(self, session: AsyncSession, story_ids: Iterable[int]) -> int:
+        """Like stories with one insert
+
+        :param session: async session
+        :param story_ids: story ids
+        :return: number of likes added
+        """
+        return await UserStoryLikes.aadd(session, self.id, story_ids)
+
+    def dislike_stories(self, session: Session, story_ids: Iterable[int]) -> int:
+        """Dislike stories with one delete
 
         :param session: session
+        :param story_ids: story ids
+        :return: number of likes removed
+        """
+        return UserStoryLikes.remove(session, self.id, story_ids)
+
+    async def adislike_stories(self, session: AsyncSession, story_ids: Iterable[int]) -> int:
+        """Dislike stories with one delete
+
+        :param session: async session
+        :param story_ids: story ids
+        :return: number of likes removed
+        """
+        return await UserStoryLikes.aremove(session, self.id, story_ids)
+
+    async def alike_story(self, session: AsyncSession, story_id: int) -> bool:
+        """Like story, liking it again changes nothing
+
+        :param session: async session
         :param story_id: story id
+        :return: whether like was added
         """
-        story = Story.get_by_id(session, story_id)
-        if story:
-            if story in self.liked_stories:
-                self.liked_stories.remove(story)
-                session.add(self)
-                session.commit()
-                session.refresh(self)
-            return self
+        return await UserStoryLikes.aadd(session, self.id, [story_id]) == 1
 
-        return None
+    def dislike_story(self, session: Session, story_id: int) -> bool:
+        """Dislike story, disliking it again changes nothing
+
+        :param session: session
+        :param story_id: story id
+        :return: whether like was removed
+        """
+        return UserStoryLikes.remove(session, self.id, [story_id]) == 1
+
+    async def adislike_story(self, session: AsyncSession, story_id: int) -> bool:
+        """Dislike story, disliking it again changes nothing
+
+        :param session: async session
+        :param story_id: story id
+        :return: whether like was removed
+        """
+        return await UserStoryLikes.aremove(session, self.id, [story_id]) == 1
 
     def create(self, session: Session) -> U:
         """Create user
@@ -118,8 +420,17 @@ class User(SQLModel, table=True):
         :return: user
         """
         session.add(self)
-        session.commit()
-        session.refresh(self)
+        _commit(session, self)
+        return self
+
+    async def acreate(self, session: AsyncSession) -> U:
+        """Create user
+
+        :param session: async session
+        :return: user
+        """
+        session.add(self)
+        await _acommit(session, self)
         return self
 
     def update(self, session: Session) -> U:
@@ -129,8 +440,17 @@ class User(SQLModel, table=True):
         :return: user
         """
         session.add(self)
-        session.commit()
-        session.refresh(self)
+        _commit(session, self)
+        return self
+
+    async def aupdate(self, session: AsyncSession) -> U:
+        """Update user
+
+        :param session: async session
+        :return: user
+        """
+        session.add(self)
+        await _acommit(session, self)
         return self
 
     def delete(self, session: Session) -> U:
@@ -141,8 +461,18 @@ class User(SQLModel, table=True):
         """
         self.deleted = True
         session.add(self)
-        session.commit()
-        session.refresh(self)
+        _commit(session, self)
+        return self
+
+    async def adelete(self, session: AsyncSession) -> U:
+        """Disable user
+
+        :param session: async session
+        :return: user
+        """
+        self.deleted = True
+        session.add(self)
+        await _acommit(session, self)
         return self
 
 
@@ -163,7 +493,7 @@ class UserMetadata(SQLModel, table=True):
     photo: str = Field(default=None)
     date_create: datetime = Field(default_factory=datetime.now)
     date_modify: datetime = Field(default_factory=datetime.now)
-    user_id: int = Field(foreign_key="user.id")
+    user_id: int = Field(foreign_key="user.id", index=True)
     user: "User" = Relationship(back_populates="user_metadata")
 
     @classmethod
@@ -176,6 +506,16 @@ class UserMetadata(SQLModel, table=True):
         """
         return session.exec(select(cls).where(cls.user_id == user_id)).first()
 
+    @classmethod
+    async def aget_by_user_id(cls: type[UM], session: AsyncSession, user_id: int) -> UM | None:
+        """Get user metadata by user id
+
+        :param session: async session
+        :param user_id: user id
+        :return: user metadata
+        """
+        return (await session.exec(select(cls).where(cls.user_id == user_id))).first()
+
     def create(self, session: Session) -> UM:
         """Create user metadata
 
@@ -183,10 +523,44 @@ class UserMetadata(SQLModel, table=True):
         :return: user metadata
         """
         session.add(self)
-        session.commit()
-        session.refresh(self)
+        _commit(session, self)
         return self
 
+    async def acreate(self, session: AsyncSession) -> UM:
+        """Create user metadata
+
+        :param session: async session
+        :return: user metadata
+        """
+        session.add(self)
+        await _acommit(session, self)
+        return self
+
+    @classmethod
+    def photo_references(cls, session: Session) -> Dict[str, int]:
+        """Count user metadata rows per photo
+
+        :param session: session
+        :return: number of rows by photo
+        """
+        statement = select(cls.photo, func.count()).where(cls.photo.is_not(None)).group_by(cls.photo)
+        return dict(session.exec(statement).all())
+
+    @classmethod
+    def replace_photo(cls, session: Session, old: str, new: str) -> int:
+        """Point rows using photo to another one
+
+        :param session: session
+        :param old: replaced photo
+        :param new: new photo
+        :return: number of updated rows
+        """
+        result = session.exec(
+            update(cls).where(cls.photo == old).values(photo=new).execution_options(synchronize_session=False)
+        )
+        _commit(session)
+        return result.rowcount
+
     def update(self, session: Session) -> UM:
         """Update user metadata
 
@@ -195,8 +569,18 @@ class UserMetadata(SQLModel, table=True):
         """
         self.date_modify = datetime.now()
         session.add(self)
-        session.commit()
-        session.refresh(self)
+        _commit(session, self)
+        return self
+
+    async def aupdate(self, session: AsyncSession) -> UM:
+        """Update user metadata
+
+        :param session: async session
+        :return: user metadata
+        """
+        self.date_modify = datetime.now()
+        session.add(self)
+        await _acommit(session, self)
         return self
 
 
@@ -214,6 +598,13 @@ class Goal(SQLModel, table=True):
     :param user: user
     :param stories: goal stories
     """
+    __table_args__ = (
+        Index(
+            "ix_goal_user_id_date_create", "user_id", "date_create", "id",
+            postgresql_where=text("NOT deleted"), sqlite_where=text("deleted = 0"),
+        ),
+    )
+
     id: int = Field(default=None, primary_key=True)
     title: str
     description: str
@@ -226,37 +617,161 @@ class Goal(SQLModel, table=True):
     deleted: bool = Field(default=False)
 
     @classmethod
-    def get_by_id(cls: type[G], session: Session, _id: int) -> G | None:
+    def get_by_id(cls: type[G], session: Session, _id: int, include_deleted: bool = False) -> G | None:
         """Get goal by id
 
         :param session: session
         :param _id: goal id
+        :param include_deleted: whether a deleted goal is returned too
         :return: goal
         """
+        if include_deleted:
+            return session.exec(select(cls).where(cls.id == _id).execution_options(include_deleted=True)).first()
+
         return session.get(cls, _id)
 
     @classmethod
-    def get_all(cls: type[G], session: Session, limit: int = 100, offset: int = 0) -> List[G]:
+    async def aget_by_id(
+            cls: type[G], session: AsyncSession, _id: int, include_deleted: bool = False
+    ) -> G | None:
+        """Get goal by id
+
+        :param session: async session
+        :param _id: goal id
+        :param include_deleted: whether a deleted goal is returned too
+        :return: goal
+        """
+        if include_deleted:
+            statement = select(cls).where(cls.id == _id).execution_options(include_deleted=True)
+            return (await session.exec(statement)).first()
+
+        return await session.get(cls, _id)
+
+    @classmethod
+    def get_by_ids(cls: type[G], session: Session, ids: Iterable[int]) -> Dict[int, G]:
+        """Get goals by ids in one query
+
+        :param session: session
+        :param ids: goal ids
+        :return: goals by id, missing ids are left out
+        """
+        ids = set(ids)
+        if not ids:
+            return {}
+
+        return {item.id: item for item in session.exec(select(cls).where(cls.id.in_(ids)))}
+
+    @classmethod
+    async def aget_by_ids(cls: type[G], session: AsyncSession, ids: Iterable[int]) -> Dict[int, G]:
+        """Get goals by ids in one query
+
+        :param session: async session
+        :param ids: goal ids
+        :return: goals by id, missing ids are left out
+        """
+        ids = set(ids)
+        if not ids:
+            return {}
+
+        return {item.id: item for item in await session.exec(select(cls).where(cls.id.in_(ids)))}
+
+    @classmethod
+    def get_all(
+            cls: type[G], session: Session, limit: int = 100, offset: int = 0,
+            cursor: Cursor | None = None
+    ) -> List[G]:
         """Get all goals
 
         :param session: session
         :param limit: limit
         :param offset: offset
+        :param cursor: position after which the page starts, replaces offset
+        :return: goals
+        """
+        return session.exec(paginate(select(cls), cls, limit, offset, cursor)).all()
+
+    @classmethod
+    async def aget_all(
+            cls: type[G], session: AsyncSession, limit: int = 100, offset: int = 0,
+            cursor: Cursor | None = None
+    ) -> List[G]:
+        """Get all goals
+
+        :param session: async session
+        :param limit: limit
+        :param offset: offset
+        :param cursor: position after which the page starts, replaces offset
         :return: goals
         """
-        return session.exec(select(cls).offset(offset).limit(limit)).all()
+        return (await session.exec(paginate(select(cls), cls, limit, offset, cursor))).all()
 
     @classmethod
-    def get_by_user_id(cls: type[G], session: Session, user_id: int, limit: int = 100, offset: int = 0) -> List[G]:
+    def get_by_user_id(
+            cls: type[G], session: Session, user_id: int, limit: int = 100, offset: int = 0,
+            cursor: Cursor | None = None
+    ) -> List[G]:
         """Get goals by user id
 
         :param session: session
         :param user_id: user id
         :param limit: limit
         :param offset: offset
+        :param cursor: position after which the page starts, replaces offset
         :return: goals
         """
-        return session.exec(select(cls).where(cls.user_id == user_id).offset(offset).limit(limit)).all()
+        statement = paginate(select(cls).where(cls.user_id == user_id), cls, limit, offset, cursor)
+        return session.exec(statement).all()
+
+    @classmethod
+    async def aget_by_user_id(
+            cls: type[G], session: AsyncSession, user_id: int, limit: int = 100, offset: int = 0,
+            cursor: Cursor | None = None
+    ) -> List[G]:
+        """Get goals by user id
+
+        :param session: async session
+        :param user_id: user id
+        :param limit: limit
+        :param offset: offset
+        :param cursor: position after which the page starts, replaces offset
+        :return: goals
+        """
+        statement = paginate(select(cls).where(cls.user_id == user_id), cls, limit, offset, cursor)
+        return (await session.exec(statement)).all()
+
+    @classmethod
+    def get_active_by_user_id(cls: type[G], session: Session, user_id: int, limit: int = 100) -> List[G]:
+        """Get goals of user whose deadline has not passed, newest first
+
+        :param session: session
+        :param user_id: user id
+        :param limit: limit
+        :return: goals
+        """
+        statement = (
+            select(cls)
+            .where(cls.user_id == user_id, cls.deadline.is_(None) | (cls.deadline >= datetime.now()))
+            .order_by(cls.date_create.desc(), cls.id.desc())
+            .limit(limit)
+        )
+        return session.exec(statement).all()
+
+    @classmethod
+    async def aget_active_by_user_id(cls: type[G], session: AsyncSession, user_id: int, limit: int = 100) -> List[G]:
+        """Get goals of user whose deadline has not passed, newest first
+
+        :param session: async session
+        :param user_id: user id
+        :param limit: limit
+        :return: goals
+        """
+        statement = (
+            select(cls)
+            .where(cls.user_id == user_id, cls.deadline.is_(None) | (cls.deadline >= datetime.now()))
+            .order_by(cls.date_create.desc(), cls.id.desc())
+            .limit(limit)
+        )
+        return (await session.exec(statement)).all()
 
     def create(self, session: Session) -> G:
         """Create goal
@@ -265,8 +780,17 @@ class Goal(SQLModel, table=True):
         :return: goal
         """
         session.add(self)
-        session.commit()
-        session.refresh(self)
+        _commit(session, self)
+        return self
+
+    async def acreate(self, session: AsyncSession) -> G:
+        """Create goal
+
+        :param session: async session
+        :return: goal
+        """
+        session.add(self)
+        await _acommit(session, self)
         return self
 
     def update(self, session: Session) -> G:
@@ -276,8 +800,17 @@ class Goal(SQLModel, table=True):
         :return: goal
         """
         session.add(self)
-        session.commit()
-        session.refresh(self)
+        _commit(session, self)
+        return self
+
+    async def aupdate(self, session: AsyncSession) -> G:
+        """Update goal
+
+        :param session: async session
+        :return: goal
+        """
+        session.add(self)
+        await _acommit(session, self)
         return self
 
     def delete(self, session: Session) -> G:
@@ -288,8 +821,18 @@ class Goal(SQLModel, table=True):
         """
         self.deleted = True
         session.add(self)
-        session.commit()
-        session.refresh(self)
+        _commit(session, self)
+        return self
+
+    async def adelete(self, session: AsyncSession) -> G:
+        """Disable goal
+
+        :param session: async session
+        :return: goal
+        """
+        self.deleted = True
+        session.add(self)
+        await _acommit(session, self)
         return self
 
 
@@ -304,9 +847,21 @@ class Story(SQLModel, table=True):
     :param goal: goal
     :param photo: story photo
     :param summary: story summary
+    :param like_count: number of likes, maintained in batches by the like counter
     :param date_create: story date create
     :param deleted: story deleted
     """
+    __table_args__ = (
+        Index(
+            "ix_story_user_id_date_create", "user_id", "date_create", "id",
+            postgresql_where=text("NOT deleted"), sqlite_where=text("deleted = 0"),
+        ),
+        Index(
+            "ix_story_goal_id_date_create", "goal_id", "date_create", "id",
+            postgresql_where=text("NOT deleted"), sqlite_where=text("deleted = 0"),
+        ),
+    )
+
     id: int = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     user: "User" = Relationship(back_populates="stories")
@@ -315,89 +870,315 @@ class Story(SQLModel, table=True):
     liked_users: List["User"] = Relationship(back_populates="liked_stories", link_model=UserStoryLikes)
     photo: str
     summary: str
+    like_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     date_create: datetime = Field(default_factory=datetime.now)
     deleted: bool = Field(default=False)
 
     @classmethod
-    def get_by_id(cls: type[S], session: Session, _id: int) -> S | None:
+    def get_by_id(cls: type[S], session: Session, _id: int, include_deleted: bool = False) -> S | None:
         """Get story by id
 
         :param session: session
         :param _id: story id
+        :param include_deleted: whether a deleted story is returned too
         :return: story
         """
+        if include_deleted:
+            return session.exec(select(cls).where(cls.id == _id).execution_options(include_deleted=True)).first()
+
         return session.get(cls, _id)
 
     @classmethod
-    def get_all(cls: type[S], session: Session, limit: int = 100, offset: int = 0) -> List[S]:
+    async def aget_by_id(
+            cls: type[S], session: AsyncSession, _id: int, include_deleted: bool = False
+    ) -> S | None:
+        """Get story by id
+
+        :param session: async session
+        :param _id: story id
+        :param include_deleted: whether a deleted story is returned too
+        :return: story
+        """
+        if include_deleted:
+            statement = select(cls).where(cls.id == _id).execution_options(include_deleted=True)
+            return (await session.exec(statement)).first()
+
+        return await session.get(cls, _id)
+
+    @classmethod
+    def get_by_ids(cls: type[S], session: Session, ids: Iterable[int]) -> Dict[int, S]:
+        """Get stories by ids in one query
+
+        :param session: session
+        :param ids: story ids
+        :return: stories by id, missing ids are left out
+        """
+        ids = set(ids)
+        if not ids:
+            return {}
+
+        return {item.id: item for item in session.exec(select(cls).where(cls.id.in_(ids)))}
+
+    @classmethod
+    async def aget_by_ids(cls: type[S], session: AsyncSession, ids: Iterable[int]) -> Dict[int, S]:
+        """Get stories by ids in one query
+
+        :param session: async session
+        :param ids: story ids
+        :return: stories by id, missing ids are left out
+        """
+        ids = set(ids)
+        if not ids:
+            return {}
+
+        return {item.id: item for item in await session.exec(select(cls).where(cls.id.in_(ids)))}
+
+    @classmethod
+    def get_all(
+            cls: type[S], session: Session, limit: int = 100, offset: int = 0,
+            cursor: Cursor | None = None
+    ) -> List[S]:
         """Get all stories
 
         :param session: session
         :param limit: limit
         :param offset: offset
+        :param cursor: position after which the page starts, replaces offset
         :return: stories
         """
-        return session.exec(select(cls).offset(offset).limit(limit)).all()
+        return session.exec(paginate(select(cls), cls, limit, offset, cursor)).all()
 
     @classmethod
-    def get_by_user_id(cls: type[S], session: Session, user_id: int, limit: int = 100, offset: int = 0) -> List[S]:
+    async def aget_all(
+            cls: type[S], session: AsyncSession, limit: int = 100, offset: int = 0,
+            cursor: Cursor | None = None
+    ) -> List[S]:
+        """Get all stories
+
+        :param session: async session
+        :param limit: limit
+        :param offset: offset
+        :param cursor: position after which the page starts, replaces offset
+        :return: stories
+        """
+        return (await session.exec(paginate(select(cls), cls, limit, offset, cursor))).all()
+
+    @classmethod
+    def get_by_user_id(
+            cls: type[S], session: Session, user_id: int, limit: int = 100, offset: int = 0,
+            cursor: Cursor | None = None
+    ) -> List[S]:
         """Get stories by user id
 
         :param session: session
         :param user_id: user id
         :param limit: limit
         :param offset: offset
+        :param cursor: position after which the page starts, replaces offset
+        :return: stories
+        """
+        statement = paginate(select(cls).where(cls.user_id == user_id), cls, limit, offset, cursor)
+        return session.exec(statement).all()
+
+    @classmethod
+    async def aget_by_user_id(
+            cls: type[S], session: AsyncSession, user_id: int, limit: int = 100, offset: int = 0,
+            cursor: Cursor | None = None
+    ) -> List[S]:
+        """Get stories by user id
+
+        :param session: async session
+        :param user_id: user id
+        :param limit: limit
+        :param offset: offset
+        :param cursor: position after which the page starts, replaces offset
         :return: stories
         """
-        return session.exec(select(cls).where(cls.user_id == user_id).offset(offset).limit(limit)).all()
+        statement = paginate(select(cls).where(cls.user_id == user_id), cls, limit, offset, cursor)
+        return (await session.exec(statement)).all()
 
     @classmethod
-    def get_by_goal_id(cls: type[S], session: Session, goal_id: int, limit: int = 100, offset: int = 0) -> List[S]:
+    def get_by_goal_id(
+            cls: type[S], session: Session, goal_id: int, limit: int = 100, offset: int = 0,
+            cursor: Cursor | None = None
+    ) -> List[S]:
         """Get stories by goal id
 
         :param session: session
         :param goal_id: goal id
         :param limit: limit
         :param offset: offset
+        :param cursor: position after which the page starts, replaces offset
         :return: stories
         """
-        return session.exec(select(cls).where(cls.goal_id == goal_id).offset(offset).limit(limit)).all()
+        statement = paginate(select(cls).where(cls.goal_id == goal_id), cls, limit, offset, cursor)
+        return session.exec(statement).all()
+
+    @classmethod
+    async def aget_by_goal_id(
+            cls: type[S], session: AsyncSession, goal_id: int, limit: int = 100, offset: int = 0,
+            cursor: Cursor | None = None
+    ) -> List[S]:
+        """Get stories by goal id
+
+        :param session: async session
+        :param goal_id: goal id
+        :param limit: limit
+        :param offset: offset
+        :param cursor: position after which the page starts, replaces offset
+        :return: stories
+        """
+        statement = paginate(select(cls).where(cls.goal_id == goal_id), cls, limit, offset, cursor)
+        return (await session.exec(statement)).all()
+
+    @classmethod
+    def _recent_by_goal_ids(cls, goal_ids: Iterable[int], per_goal: int):
+        rank = func.row_number().over(
+            partition_by=cls.goal_id, order_by=(cls.date_create.desc(), cls.id.desc())
+        ).label("rank")
+        # deleted stories must not take places in the ranking
+        ranked = select(cls, rank).where(cls.goal_id.in_(set(goal_ids)), cls.deleted == false()).subquery()
+        story = aliased(cls, ranked)
+
+        return select(story).where(ranked.c.rank <= per_goal).order_by(story.goal_id, ranked.c.rank)
+
+    @classmethod
+    def get_recent_by_goal_ids(cls: type[S], session: Session, goal_ids: Iterable[int], per_goal: int) -> List[S]:
+        """Get newest stories of every goal in one query
+
+        :param session: session
+        :param goal_ids: goal ids
+        :param per_goal: number of stories per goal
+        :return: stories ordered by goal, newest first
+        """
+        goal_ids = set(goal_ids)
+        if not goal_ids or per_goal < 1:
+            return []
 
-    def add_user_like(self, session: Session, user_id: int) -> S | None:
-        """Add user like
+        return session.exec(cls._recent_by_goal_ids(goal_ids, per_goal)).all()
+
+    @classmethod
+    async def aget_recent_by_goal_ids(
+            cls: type[S], session: AsyncSession, goal_ids: Iterable[int], per_goal: int
+    ) -> List[S]:
+        """Get newest stories of every goal in one query
+
+        :param session: async session
+        :param goal_ids: goal ids
+        :param per_goal: number of stories per goal
+        :return: stories ordered by goal, newest first
+        """
+        goal_ids = set(goal_ids)
+        if not goal_ids or per_goal < 1:
+            return []
+
+        return (await session.exec(cls._recent_by_goal_ids(goal_ids, per_goal))).all()
+
+    def add_user_like(self, session: Session, user_id: int) -> bool:
+        """Add user like, adding it again changes nothing
 
         :param session: session
         :param user_id: user id
-        :return: story
+        :return: whether like was added
         """
-        user = User.get_by_id(session, user_id)
-        if user:
-            if user not in self.liked_users:
-                self.liked_users.append(user)
-                session.add(self)
-                session.commit()
-                session.refresh(self)
-            return self
+        return UserStoryLikes.add(session, user_id, [self.id]) == 1
 
-        return None
+    async def aadd_user_like(self, session: AsyncSession, user_id: int) -> bool:
+        """Add user like, adding it again changes nothing
 
-    def remove_user_like(self, session: Session, user_id: int) -> S | None:
-        """Remove user like
+        :param session: async session
+        :param user_id: user id
+        :return: whether like was added
+        """
+        return await UserStoryLikes.aadd(session, user_id, [self.id]) == 1
+
+    def remove_user_like(self, session: Session, user_id: int) -> bool:
+        """Remove user like, removing it again changes nothing
 
         :param session: session
         :param user_id: user id
-        :return: story
+        :return: whether like was removed
+        """
+        return UserStoryLikes.remove(session, user_id, [self.id]) == 1
+
+    async def aremove_user_like(self, session: AsyncSession, user_id: int) -> bool:
+        """Remove user like, removing it again changes nothing
+
+        :param session: async session
+        :param user_id: user id
+        :return: whether like was removed
+        """
+        return await UserStoryLikes.aremove(session, user_id, [self.id]) == 1
+
+    @classmethod
+    def photo_references(cls, session: Session) -> Dict[str, int]:
+        """Count stories per photo, deleted stories included
+
+        :param session: session
+        :return: number of stories by photo
+        """
+        statement = select(cls.photo, func.count()).group_by(cls.photo).execution_options(include_deleted=True)
+        return dict(session.exec(statement).all())
+
+    @classmethod
+    def replace_photo(cls, session: Session, old: str, new: str) -> int:
+        """Point stories using photo to another one, deleted stories included
+
+        :param session: session
+        :param old: replaced photo
+        :param new: new photo
+        :return: number of updated stories
         """
-        user = User.get_by_id(session, user_id)
-        if user:
-            if user in self.liked_users:
-                self.liked_users.remove(user)
-                session.add(self)
-                session.commit()
-                session.refresh(self)
-            return self
+        result = session.exec(
+            update(cls).where(cls.photo == old).values(photo=new).execution_options(synchronize_session=False)
+        )
+        _commit(session)
+        return result.rowcount
+
+    @classmethod
+    def _recount_likes(cls, session: Session, condition) -> int:
+        # lock the rows first, the count is then taken after every earlier write to them
+        session.exec(select(cls.id).where(condition).with_for_update().execution_options(include_deleted=True)).all()
+
+        likes = select(func.count()).select_from(UserStoryLikes).where(UserStoryLikes.story_id == cls.id)
+        likes = likes.scalar_subquery()
+
+        fixed = session.exec(
+            update(cls)
+            .where(condition, cls.like_count != likes)
+            .values(like_count=likes)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        _commit(session)
+        return fixed
 
-        return None
+    @classmethod
+    def recount_like_counts(cls, session: Session, story_ids: Iterable[int]) -> int:
+        """Set like counts of stories to their number of likes with one update
+
+        Counts are absolute, a recount never adds to a count another
+        worker has just written.
+
+        :param session: session
+        :param story_ids: story ids
+        :return: number of changed stories
+        """
+        story_ids = list(story_ids)
+        if not story_ids:
+            return 0
+
+        return cls._recount_likes(session, cls.id.in_(story_ids))
+
+    @classmethod
+    def reconcile_like_counts(cls, session: Session, first_id: int, last_id: int) -> int:
+        """Recount likes of stories in id range and fix counts that drifted
+
+        :param session: session
+        :param first_id: first story id, inclusive
+        :param last_id: last story id, inclusive
+        :return: number of fixed stories
+        """
+        return cls._recount_likes(session, cls.id.between(first_id, last_id))
 
     def create(self, session: Session) -> S:
         """Create story
@@ -406,8 +1187,17 @@ class Story(SQLModel, table=True):
         :return: story
         """
         session.add(self)
-        session.commit()
-        session.refresh(self)
+        _commit(session, self)
+        return self
+
+    async def acreate(self, session: AsyncSession) -> S:
+        """Create story
+
+        :param session: async session
+        :return: story
+        """
+        session.add(self)
+        await _acommit(session, self)
         return self
 
     def update(self, session: Session) -> S:
@@ -417,8 +1207,17 @@ class Story(SQLModel, table=True):
         :return: story
         """
         session.add(self)
-        session.commit()
-        session.refresh(self)
+        _commit(session, self)
+        return self
+
+    async def aupdate(self, session: AsyncSession) -> S:
+        """Update story
+
+        :param session: async session
+        :return: story
+        """
+        session.add(self)
+        await _acommit(session, self)
         return self
 
     def delete(self, session: Session) -> S:
@@ -429,6 +1228,36 @@ class Story(SQLModel, table=True):
         """
         self.deleted = True
         session.add(self)
-        session.commit()
-        session.refresh(self)
+        _commit(session, self)
         return self
+
+    async def adelete(self, session: AsyncSession) -> S:
+        """Delete story
+
+        :param session: async session
+        :return: story
+        """
+        self.deleted = True
+        session.add(self)
+        await _acommit(session, self)
+        return self
+
+
+@event.listens_for(_Session, "do_orm_execute")
+def _exclude_deleted(execute_state):
+    """Hide soft-deleted users, goals and stories from every ORM select
+
+    Applies to lazy loads of relationships as well. Statements executed with
+    the ``include_deleted`` execution option and refreshes of already loaded
+    objects are left as is.
+    """
+    if (
+            execute_state.is_select
+            and not execute_state.is_column_load
+            and not execute_state.execution_options.get(INCLUDE_DELETED, False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(User, User.deleted == false(), include_aliases=True),
+            with_loader_criteria(Goal, Goal.deleted == false(), include_aliases=True),
+            with_loader_criteria(Story, Story.deleted == false(), include_aliases=True),
+        )
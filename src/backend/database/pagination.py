@@ -0,0 +1,62 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+__all__ = [
+    "Cursor",
+    "encode_cursor",
+    "decode_cursor",
+    "paginate",
+]
+
+Cursor = tuple[datetime, int]
+"""Keyset position, (date_create, id) of the last row of the previous page."""
+
+
+def encode_cursor(date_create: datetime, _id: int) -> str:
+    """Encode keyset position into an opaque token
+
+    :param date_create: date create of the last row
+    :param _id: id of the last row
+    :return: cursor token
+    """
+    return urlsafe_b64encode(json.dumps([date_create.isoformat(), _id]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Decode cursor token
+
+    :param token: cursor token
+    :raises ValueError: if token is malformed
+    :return: keyset position
+    """
+    try:
+        date_create, _id = json.loads(urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return datetime.fromisoformat(date_create), int(_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+
+def paginate(statement, model, limit: int, offset: int = 0, cursor: Cursor | None = None):
+    """Order statement by (date_create, id) and select one page
+
+    With a cursor the page starts right after it and offset is ignored, so
+    the cost of a page does not depend on how deep it is.
+
+    :param statement: select statement
+    :param model: model with date_create and id columns
+    :param limit: limit
+    :param offset: offset
+    :param cursor: keyset position
+    :return: statement
+    """
+    statement = statement.order_by(model.date_create, model.id)
+
+    if cursor is not None:
+        statement = statement.where(tuple_(model.date_create, model.id) > tuple_(*cursor))
+    else:
+        statement = statement.offset(offset)
+
+    return statement.limit(limit)
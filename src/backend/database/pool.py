@@ -0,0 +1,153 @@
+from os import environ
+from threading import Lock
+from time import perf_counter
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+__all__ = [
+    "PoolStats",
+    "pool_options",
+    "instrumented_pool",
+]
+
+
+class PoolStats:
+    """Connection pool counters
+
+    :param name: engine name
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_time = 0.
+        self.max_wait = 0.
+        self.timeouts = 0
+        self._lock = Lock()
+
+    def attach(self, engine) -> None:
+        """Listen to pool events of engine
+
+        :param engine: engine
+        """
+        self.engine = engine
+
+        @event.listens_for(engine, "connect")
+        def _connect(*_):
+            self.connects += 1
+
+        @event.listens_for(engine, "checkout")
+        def _checkout(*_):
+            self.checkouts += 1
+
+        @event.listens_for(engine, "checkin")
+        def _checkin(*_):
+            self.checkins += 1
+
+        @event.listens_for(engine, "invalidate")
+        def _invalidate(*_):
+            self.invalidations += 1
+
+        @event.listens_for(engine, "soft_invalidate")
+        def _soft_invalidate(*_):
+            self.invalidations += 1
+
+    def record_wait(self, elapsed: float, timed_out: bool) -> None:
+        """Record checkout that had to wait for a free connection
+
+        :param elapsed: wait time in seconds
+        :param timed_out: whether the wait ended with a timeout
+        """
+        with self._lock:
+            self.waits += 1
+            self.wait_time += elapsed
+            self.max_wait = max(self.max_wait, elapsed)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        """Get counters and current pool gauges
+
+        :return: pool statistics
+        """
+        stats = {
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "waits": self.waits,
+            "wait_time": self.wait_time,
+            "max_wait": self.max_wait,
+            "timeouts": self.timeouts,
+        }
+
+        pool = self.engine.pool if self.engine is not None else None
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+
+        return stats
+
+
+def instrumented_pool(pool_class: type[QueuePool], stats: PoolStats) -> type[QueuePool]:
+    """Make queue pool class that reports checkout waits to stats
+
+    :param pool_class: QueuePool or AsyncAdaptedQueuePool
+    :param stats: pool stats
+    :return: pool class
+    """
+    def _do_get(self):
+        # the checkout blocks only when the pool and its overflow are exhausted
+        saturated = self._max_overflow > -1 and self._overflow >= self._max_overflow and self._pool.empty()
+        if not saturated:
+            return pool_class._do_get(self)
+
+        start = perf_counter()
+        try:
+            connection = pool_class._do_get(self)
+        except exc.TimeoutError:
+            stats.record_wait(perf_counter() - start, True)
+            raise
+
+        stats.record_wait(perf_counter() - start, False)
+        return connection
+
+    return type(f"Instrumented{pool_class.__name__}", (pool_class,), {"_do_get": _do_get})
+
+
+def pool_options(dialect: str, is_async: bool, stats: PoolStats) -> dict:
+    """Get engine pool options for dialect from environment
+
+    sqlite keeps its default pool, only pre-ping applies to it.
+
+    :param dialect: mysql, postgresql or sqlite
+    :param is_async: whether options are for an async engine
+    :param stats: pool stats
+    :return: create_engine keyword arguments
+    """
+    options = {
+        "pool_pre_ping": environ.get("DATABASE_POOL_PRE_PING", "False") == "True",
+    }
+
+    if dialect == "sqlite":
+        return options
+
+    options.update(
+        poolclass=instrumented_pool(AsyncAdaptedQueuePool if is_async else QueuePool, stats),
+        pool_size=int(environ.get("DATABASE_POOL_SIZE", 5)),
+        max_overflow=int(environ.get("DATABASE_MAX_OVERFLOW", 10)),
+        pool_timeout=float(environ.get("DATABASE_POOL_TIMEOUT", 30)),
+        # mysql drops connections idle for longer than wait_timeout
+        pool_recycle=int(environ.get("DATABASE_POOL_RECYCLE", 3600 if dialect == "mysql" else -1)),
+    )
+
+    return options
@@ -0,0 +1,183 @@
+"""Per-request query profiling.
+
+Engine events attribute every statement to the request being served, the
+middleware aggregates them per route: number of statements, time spent in
+the database and statements repeated within one request, the usual sign of
+an N+1 pattern. Routes declare how many statements they may run with
+:func:`query_budget`; in strict mode a route running more fails instead of
+only being logged, which turns query regressions into test failures.
+"""
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_ATTRIBUTE = "__query_budget__"
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Route ran more statements than its budget in strict mode"""
+
+
+def query_budget(queries: int):
+    """Declare how many statements a route may run, session verification included
+
+    Apply below the route decorator, so the router sees the marked function.
+
+    :param queries: statement budget
+    """
+    def decorator(endpoint):
+        setattr(endpoint, QUERY_BUDGET_ATTRIBUTE, queries)
+        return endpoint
+
+    return decorator
+
+
+def route_name(scope) -> str:
+    """Get route template of request, e.g. ``GET /story/{story_id}``
+
+    :param scope: ASGI scope
+    :return: route name
+    """
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route is not None else '<unmatched>'}"
+
+
+class RequestQueries:
+    """Statements of one request
+
+    :param scope: ASGI scope of the request, the router adds the endpoint to it
+    """
+    __slots__ = ("scope", "count", "time", "statements", "closed")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.time = 0.
+        self.statements = Counter()
+        self.closed = False
+
+    @property
+    def budget(self) -> int | None:
+        return getattr(self.scope.get("endpoint"), QUERY_BUDGET_ATTRIBUTE, None)
+
+    @property
+    def repeated(self) -> int:
+        return sum(count - 1 for count in self.statements.values())
+
+
+_current: ContextVar[RequestQueries | None] = ContextVar("request_queries", default=None)
+
+
+class QueryProfiler:
+    """Aggregates statements of requests per route
+
+    :param strict: raise :class:`QueryBudgetExceeded` when a route runs more statements than its budget
+    :param repeat_threshold: log requests running one statement this many times
+    """
+    def __init__(self, strict: bool = False, repeat_threshold: int = 3):
+        self.strict = strict
+        self.repeat_threshold = repeat_threshold
+        self.routes: dict[str, dict] = {}
+
+    def attach(self, engine: Engine) -> None:
+        """Listen to statements of engine
+
+        :param engine: sync engine, for async engines their ``sync_engine``
+        """
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        request = _current.get()
+        if request is None or request.closed:
+            return
+
+        request.count += 1
+        request.statements[statement] += 1
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+        if self.strict and request.budget is not None and request.count > request.budget:
+            conn.info["query_start"].pop()
+            raise QueryBudgetExceeded(
+                f"{route_name(request.scope)} ran {request.count} statements, its budget is {request.budget}"
+            )
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        request = _current.get()
+        if request is None or request.closed or not conn.info.get("query_start"):
+            return
+
+        request.time += perf_counter() - conn.info["query_start"].pop()
+
+    def record(self, request: RequestQueries) -> None:
+        """Add finished request to statistics of its route
+
+        :param request: statements of request
+        """
+        name = route_name(request.scope)
+        stats = self.routes.get(name)
+        if stats is None:
+            stats = self.routes[name] = {
+                "requests": 0,
+                "queries": 0,
+                "max_queries": 0,
+                "db_time": 0.,
+                "repeated": 0,
+                "over_budget": 0,
+                "budget": request.budget,
+            }
+
+        stats["requests"] += 1
+        stats["queries"] += request.count
+        stats["max_queries"] = max(stats["max_queries"], request.count)
+        stats["db_time"] += request.time
+        stats["repeated"] += request.repeated
+
+        if request.budget is not None and request.count > request.budget:
+            stats["over_budget"] += 1
+            logger.warning("%s ran %d statements, its budget is %d", name, request.count, request.budget)
+
+        statement, times = max(request.statements.items(), key=lambda item: item[1], default=(None, 0))
+        if times >= self.repeat_threshold:
+            logger.warning("%s ran one statement %d times: %s", name, times, statement)
+
+    def stats(self) -> dict:
+        """Get per-route statistics
+
+        :return: statistics by route
+        """
+        return {
+            name: {**stats, "avg_queries": stats["queries"] / stats["requests"]}
+            for name, stats in self.routes.items()
+        }
+
+
+class QueryProfilingMiddleware:
+    """Attributes statements to the current request
+
+    :param app: ASGI application
+    :param profiler: query profiler
+    """
+    def __init__(self, app, profiler: QueryProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request = RequestQueries(scope)
+        token = _current.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            # tasks spawned by the request keep the context, do not count them
+            request.closed = True
+            self.profiler.record(request)
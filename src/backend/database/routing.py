@@ -0,0 +1,218 @@
+"""Read replica routing.
+
+Requests that only read run their ORM sessions against a healthy replica,
+everything else uses the primary. A client that has just written carries
+a short-lived pin cookie and reads from the primary until it expires, so
+it always sees its own writes.
+"""
+import asyncio
+import logging
+from contextvars import ContextVar
+from itertools import count
+from typing import List, NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = "primary_pin"
+"""Cookie pinning a client to the primary after a write."""
+
+read_only: ContextVar[bool] = ContextVar("read_only", default=False)
+"""Whether the current request may read from a replica."""
+
+
+class Replica(NamedTuple):
+    """Replica engines
+
+    :param name: name used in logs and statistics
+    :param engine: sync engine
+    :param async_engine: async engine
+    """
+    name: str
+    engine: Engine
+    async_engine: AsyncEngine
+
+
+class ReplicaSet:
+    """Healthy replicas picked round-robin
+
+    A background task runs ``SELECT 1`` on every replica each ``interval``
+    seconds. Replicas join the rotation once they pass a check and leave it
+    while they fail or do not answer within ``timeout``. When no replica is
+    healthy, reads go to the primary. With ``interval`` 0 health checks are
+    off and every replica is used.
+
+    :param replicas: replicas
+    :param interval: seconds between health checks
+    :param timeout: seconds a health check may take
+    """
+    def __init__(self, replicas: List[Replica], interval: float = 5., timeout: float = 2.):
+        self.replicas = replicas
+        self.interval = interval
+        self.timeout = timeout
+        self.healthy = {replica.name: interval <= 0 for replica in replicas}
+        self.picks = {replica.name: 0 for replica in replicas}
+        self.last_error: dict[str, str | None] = {replica.name: None for replica in replicas}
+        self.fallbacks = 0
+        self._next = count()
+        self._task: asyncio.Task | None = None
+
+    def pick(self, is_async: bool = False) -> Engine | None:
+        """Pick next healthy replica
+
+        :param is_async: whether the engine is for an async session
+        :return: sync engine of the replica, None when no replica is healthy
+        """
+        healthy = [replica for replica in self.replicas if self.healthy[replica.name]]
+        if not healthy:
+            if self.replicas:
+                self.fallbacks += 1
+            return None
+
+        replica = healthy[next(self._next) % len(healthy)]
+        self.picks[replica.name] += 1
+
+        # async sessions bind to the sync facade of the async engine
+        return replica.async_engine.sync_engine if is_async else replica.engine
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            async with replica.async_engine.connect() as connection:
+                await asyncio.wait_for(connection.execute(text("SELECT 1")), self.timeout)
+        except Exception as e:
+            if self.healthy[replica.name]:
+                logger.warning("Replica %s failed health check, reading from others: %r", replica.name, e)
+            self.healthy[replica.name] = False
+            self.last_error[replica.name] = repr(e)
+        else:
+            if not self.healthy[replica.name]:
+                logger.info("Replica %s is healthy again", replica.name)
+            self.healthy[replica.name] = True
+
+    async def check(self) -> None:
+        """Check every replica"""
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start health checks"""
+        if self.replicas and self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop health checks"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Get replica statistics
+
+        :return: statistics
+        """
+        return {
+            "replicas": {
+                replica.name: {
+                    "healthy": self.healthy[replica.name],
+                    "picks": self.picks[replica.name],
+                    "last_error": self.last_error[replica.name],
+                }
+                for replica in self.replicas
+            },
+            "fallbacks": self.fallbacks,
+        }
+
+
+class RoutingSession(Session):
+    """Session reading from a replica in read-only requests
+
+    The replica is picked once per session, so all reads of a session see
+    the same database. Flushes and sessions outside read-only requests use
+    the bind of the session, the primary.
+
+    :param replicas: replica set
+    :param is_async: whether the session backs an async session
+    """
+    def __init__(self, *args, replicas: ReplicaSet | None = None, is_async: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self.is_async = is_async
+        self._replica: Engine | None = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.replicas is not None and read_only.get() and not self._flushing:
+            if self._replica is None:
+                self._replica = self.replicas.pick(self.is_async)
+            if self._replica is not None:
+                return self._replica
+
+        return super().get_bind(mapper, clause, **kwargs)
+
+
+class RoutingAsyncSession(AsyncSession):
+    """Async session reading from a replica in read-only requests
+
+    sqlmodel's async session always builds a plain sync session, this one
+    builds a :class:`RoutingSession` instead.
+
+    :param bind: async engine of the primary
+    :param replicas: replica set
+    """
+    def __init__(self, bind: AsyncEngine, replicas: ReplicaSet | None = None, **kwargs):
+        kwargs["future"] = True
+        self.bind = bind
+        self.sync_session = self._proxied = self._assign_proxied(
+            RoutingSession(bind=bind.sync_engine, replicas=replicas, is_async=True, **kwargs)
+        )
+
+
+class ReadRoutingMiddleware:
+    """Marks read-only requests and pins writers to the primary
+
+    GET and HEAD requests, and requests to ``read_paths`` whatever their
+    method, may read from replicas unless they carry the pin cookie. Any
+    other request that succeeds sets the pin cookie for ``pin_seconds``.
+
+    :param app: ASGI application
+    :param pin_seconds: seconds a writer reads from the primary
+    :param read_paths: paths of read-only endpoints using other methods
+    """
+    def __init__(self, app, pin_seconds: int = 5, read_paths: frozenset = frozenset()):
+        self.app = app
+        self.pin_seconds = pin_seconds
+        self.read_paths = read_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if scope["method"] in ("GET", "HEAD") or scope["path"] in self.read_paths:
+            token = read_only.set(PIN_COOKIE not in HTTPConnection(scope).cookies)
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                read_only.reset(token)
+
+        async def send_pinned(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and self.pin_seconds > 0:
+                MutableHeaders(scope=message).append(
+                    "set-cookie", f"{PIN_COOKIE}=1; Max-Age={self.pin_seconds}; Path=/; HttpOnly; SameSite=lax"
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_pinned)
@@ -1,29 +1,200 @@
 from fastapi import HTTPException
 from fastapi_sessions.frontends.implementations import CookieParameters
-from src.backend.database import engine
-from src.backend.sessions import SQLBackend, FastSessionVerifier, FastSessionCookie
+from src.backend.database import engine, async_engine, engine_stats, async_engine_stats, replica_stats
+from src.backend.internals.hashing import PasswordHasher
+from src.backend.internals.images import ImagePipeline, parse_sizes
+from src.backend.internals.likes import LikeCounter
+from src.backend.internals.uploads import UploadWriter
+from src.backend.metrics import MetricsRegistry
+from src.backend.sessions import (
+    AsyncSQLBackend,
+    SessionCache,
+    SessionReaper,
+    SignedSessionBackend,
+    SharedMemoryBackend,
+    SharedSessionTable,
+    FastSessionVerifier,
+    FastSessionCookie,
+    SignedSessionCookie,
+)
 from os import environ
 
 cookie_params = CookieParameters()
 """Cookie parameters."""
 
-# Uses UUID
-cookie = FastSessionCookie(
-    cookie_name=environ.get("SESSION_COOKIE_NAME"),
-    identifier=environ.get("SESSION_IDENTIFIER"),
-    auto_error=True,
-    secret_key=environ.get("SESSION_SECRET_KEY"),
-    cookie_params=cookie_params,
+metrics = MetricsRegistry()
+"""Prometheus metrics of this worker."""
+
+upload_bytes = metrics.counter("actnow_upload_bytes_total", "Bytes of uploaded files received.", ("endpoint",))
+"""Upload bytes by endpoint."""
+
+deduplicated_bytes = metrics.counter(
+    "actnow_upload_deduplicated_bytes_total", "Bytes of uploads that reused a stored file.", ("endpoint",)
+)
+"""Deduplicated upload bytes by endpoint."""
+
+uploads = UploadWriter(
+    max_bytes=int(environ.get("UPLOAD_MAX_BYTES", 4194304)),
+    chunk_size=int(environ.get("UPLOAD_CHUNK_SIZE", 65536)),
+    concurrency=int(environ.get("UPLOAD_CONCURRENCY", 8)),
+    uploaded_bytes=upload_bytes,
+    deduplicated_bytes=deduplicated_bytes,
+)
+"""Upload pipeline."""
+
+images = ImagePipeline(
+    parse_sizes(environ.get("IMAGE_DERIVATIVES", "thumb:256,medium:1024")),
+    webp=environ.get("IMAGE_WEBP", "True") == "True",
+    quality=int(environ.get("IMAGE_QUALITY", 80)),
+    workers=int(environ.get("IMAGE_WORKERS", 2)),
+)
+"""Image derivatives of uploads."""
+
+session_verify_seconds = metrics.histogram("actnow_session_verify_seconds", "Session verification time.")
+"""Session verification time."""
+
+
+def _pool_values(key: str):
+    def values():
+        snapshots = [(stats.name, stats.snapshot()) for stats in (engine_stats, async_engine_stats, *replica_stats)]
+        # sqlite pools have no size gauges
+        return {(name,): snapshot[key] for name, snapshot in snapshots if key in snapshot}
+
+    return values
+
+
+for _key, _help in (
+        ("size", "Configured pool size."),
+        ("checked_in", "Idle pooled connections."),
+        ("checked_out", "Connections in use."),
+        ("overflow", "Connections opened beyond the pool size."),
+):
+    metrics.gauge(f"actnow_db_pool_{_key}", _help, ("engine",), _pool_values(_key))
+
+for _key, _help in (
+        ("checkouts", "Connection checkouts."),
+        ("waits", "Checkouts that waited for a free connection."),
+        ("wait_time", "Seconds spent waiting for a free connection."),
+        ("timeouts", "Checkouts that timed out."),
+):
+    metrics.counter(f"actnow_db_pool_{_key}_total", _help, ("engine",), _pool_values(_key))
+
+session_cache = SessionCache(
+    maxsize=int(environ.get("SESSION_CACHE_SIZE", 10000)),
+    ttl=float(environ.get("SESSION_CACHE_TTL", 30)),
 )
-"""Session cookie."""
+"""Per-process cache in front of the session backend."""
 
-backend = SQLBackend(engine)
-"""Session backend."""
+metrics.counter(
+    "actnow_session_cache_lookups_total", "Session cache lookups by result.", ("result",),
+    lambda: {("hit",): session_cache.stats()["hits"], ("miss",): session_cache.stats()["misses"]},
+)
+metrics.gauge(
+    "actnow_session_cache_size", "Sessions in the cache.", function=lambda: {(): session_cache.stats()["size"]}
+)
+
+if environ.get("SESSION_BACKEND", "database") == "signed":
+    # Session data lives in the signed cookie, the database only keeps revocations
+    cookie = SignedSessionCookie(
+        cookie_name=environ.get("SESSION_COOKIE_NAME"),
+        identifier=environ.get("SESSION_IDENTIFIER"),
+        auto_error=True,
+        secret_key=environ.get("SESSION_SECRET_KEY"),
+        cookie_params=cookie_params,
+    )
+    backend = SignedSessionBackend(
+        async_engine,
+        refresh_interval=float(environ.get("SESSION_REVOCATION_REFRESH", 5)),
+    )
+elif environ.get("SESSION_BACKEND", "database") == "shared_memory":
+    # Sessions live in a table mapped by every worker of the host, the database is optional
+    cookie = FastSessionCookie(
+        cookie_name=environ.get("SESSION_COOKIE_NAME"),
+        identifier=environ.get("SESSION_IDENTIFIER"),
+        auto_error=True,
+        secret_key=environ.get("SESSION_SECRET_KEY"),
+        cookie_params=cookie_params,
+    )
+    backend = SharedMemoryBackend(
+        SharedSessionTable(
+            path=environ.get("SESSION_SHM_PATH", "/dev/shm/actnow_sessions"),
+            slots=int(environ.get("SESSION_SHM_SLOTS", 65536)),
+        ),
+        fallback=AsyncSQLBackend(async_engine) if environ.get("SESSION_SHM_FALLBACK", "True") == "True" else None,
+    )
+else:
+    # Uses UUID
+    cookie = FastSessionCookie(
+        cookie_name=environ.get("SESSION_COOKIE_NAME"),
+        identifier=environ.get("SESSION_IDENTIFIER"),
+        auto_error=True,
+        secret_key=environ.get("SESSION_SECRET_KEY"),
+        cookie_params=cookie_params,
+    )
+    backend = AsyncSQLBackend(async_engine, cache=session_cache)
+
+reaper = SessionReaper(
+    engine,
+    interval=float(environ.get("SESSION_REAPER_INTERVAL", 60)),
+    batch_size=int(environ.get("SESSION_REAPER_BATCH_SIZE", 1000)),
+)
+"""Expired sessions reaper."""
 
 verifier = FastSessionVerifier(
     identifier=environ.get("SESSION_IDENTIFIER"),
     auto_error=True,
     backend=backend,
     auth_http_exception=HTTPException(status_code=403, detail="Invalid session"),
+    # signed sessions are immutable, renewing them would be a no-op
+    renew_fraction=None if isinstance(backend, SignedSessionBackend) else float(
+        environ.get("SESSION_RENEW_FRACTION", 0.5)
+    ),
+    verify_seconds=session_verify_seconds,
 )
 """Session verifier."""
+
+metrics.counter(
+    "actnow_session_renewals_total", "Sliding session renewals by outcome.", ("outcome",),
+    lambda: {(outcome,): verifier.renewal_stats()[outcome] for outcome in ("written", "skipped")},
+)
+metrics.gauge(
+    "actnow_session_renewals_in_flight", "Session renewals being written.",
+    function=lambda: {(): verifier.renewal_stats()["in_flight"]},
+)
+
+hasher = PasswordHasher(
+    workers=int(environ.get("PASSWORD_HASH_WORKERS", 2)),
+    queue_limit=int(environ.get("PASSWORD_HASH_QUEUE_LIMIT", 32)),
+)
+"""Password hashing pool."""
+
+metrics.gauge(
+    "actnow_password_hash_queue_depth", "Password hashes waiting for a worker.",
+    function=lambda: {(): hasher.stats()["queue_depth"]},
+)
+metrics.gauge(
+    "actnow_password_hash_in_flight", "Password hashes queued or running.",
+    function=lambda: {(): hasher.stats()["in_flight"]},
+)
+metrics.counter(
+    "actnow_password_hashes_total", "Password hashes by outcome.", ("outcome",),
+    lambda: {(outcome,): hasher.stats()[outcome] for outcome in ("completed", "rejected")},
+)
+# with the completed hashes gives the average latency over any window
+metrics.counter(
+    "actnow_password_hash_seconds_total", "Seconds spent on completed password hashes.",
+    function=lambda: {(): hasher.total_time},
+)
+metrics.gauge(
+    "actnow_password_hash_max_seconds", "Slowest password hash since start.",
+    function=lambda: {(): hasher.stats()["max_latency"]},
+)
+
+like_counter = LikeCounter(
+    engine,
+    flush_interval=float(environ.get("LIKE_FLUSH_INTERVAL_MS", 500)) / 1000,
+    max_pending=int(environ.get("LIKE_FLUSH_MAX_PENDING", 1000)),
+    reconcile_interval=float(environ.get("LIKE_RECONCILE_INTERVAL", 3600)),
+    reconcile_batch_size=int(environ.get("LIKE_RECONCILE_BATCH_SIZE", 10000)),
+)
+"""Write-behind like counter."""
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+from datetime import datetime
+from os import environ
+from typing import Annotated, Any, List, Literal, Union
+
+from pydantic import BaseModel, Field, ValidationError, parse_obj_as, validator
+
+from src.backend.database import async_unit_of_work
+from src.backend.database.orm import Goal, Story, User
+from src.backend.dependencies import like_counter
+from src.backend.internals.goals import GoalPatchRequest, GoalRequest, goal_response
+from src.backend.internals.stories import check_description, story_response
+
+BATCH_MAX_OPERATIONS = int(environ.get("BATCH_MAX_OPERATIONS", 100))
+
+
+class CreateGoalOperation(BaseModel):
+    op: Literal["create_goal"]
+    goal: GoalRequest
+
+
+class UpdateGoalOperation(BaseModel):
+    op: Literal["update_goal"]
+    goal_id: int
+    goal: GoalPatchRequest
+
+    @validator("goal")
+    def check_change(cls, goal):
+        if goal.title is None and goal.description is None and goal.price is None and goal.deadline is None:
+            raise ValueError("At least one field must be specified.")
+        return goal
+
+
+class UpdateStoryOperation(BaseModel):
+    op: Literal["update_story"]
+    story_id: int
+    description: str
+
+    _check_description = validator("description", allow_reuse=True)(check_description)
+
+
+class LikeOperation(BaseModel):
+    op: Literal["like"]
+    story_id: int
+
+
+class DislikeOperation(BaseModel):
+    op: Literal["dislike"]
+    story_id: int
+
+
+Operation = Annotated[
+    Union[CreateGoalOperation, UpdateGoalOperation, UpdateStoryOperation, LikeOperation, DislikeOperation],
+    Field(discriminator="op"),
+]
+
+LIKE_OPERATIONS = (LikeOperation, DislikeOperation)
+STORY_OPERATIONS = (UpdateStoryOperation, *LIKE_OPERATIONS)
+
+
+class BatchRequest(BaseModel):
+    # operations are parsed one by one, so an invalid one fails alone
+    operations: List[dict] = Field(max_items=BATCH_MAX_OPERATIONS)
+
+
+class BatchResult(BaseModel):
+    status: int
+    detail: Any = None
+    result: Any = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchResult]
+
+
+def parse_operations(operations: List[dict]) -> List[Operation | BatchResult]:
+    parsed = []
+    for operation in operations:
+        try:
+            parsed.append(parse_obj_as(Operation, operation))
+        except ValidationError as error:
+            parsed.append(BatchResult(status=422, detail=error.errors()))
+
+    return parsed
+
+
+async def apply_batch(operations: List[dict], user_id: int) -> List[BatchResult]:
+    """Apply operations in order within one transaction.
+
+    Referenced goals, stories and likes are loaded with one query each,
+    operations are checked against them in memory and the changes are
+    written with a single commit. Every operation gets its own result,
+    failed ones are skipped without affecting the others.
+    """
+    parsed = parse_operations(operations)
+    results: List[BatchResult | None] = [item if isinstance(item, BatchResult) else None for item in parsed]
+
+    # built after the commit, when created goals have their ids
+    created: dict[int, Goal] = {}
+    updated_goals: dict[int, Goal] = {}
+    updated_stories: dict[int, Story] = {}
+
+    async with async_unit_of_work() as transaction:
+        user = await User.aget_by_id(transaction, user_id)
+        if user is None:
+            return [result or BatchResult(status=404, detail="User not found.") for result in results]
+
+        goals = await Goal.aget_by_ids(
+            transaction, (item.goal_id for item in parsed if isinstance(item, UpdateGoalOperation))
+        )
+        stories = await Story.aget_by_ids(
+            transaction, (item.story_id for item in parsed if isinstance(item, STORY_OPERATIONS))
+        )
+        # also tells liked_by_me of updated stories
+        liked_before = await user.aliked_story_ids(
+            transaction, (item.story_id for item in parsed if isinstance(item, STORY_OPERATIONS))
+        )
+        liked = set(liked_before)
+
+        for index, item in enumerate(parsed):
+            if isinstance(item, CreateGoalOperation):
+                goal = Goal(
+                    title=item.goal.title,
+                    description=item.goal.description,
+                    price=item.goal.price,
+                    user_id=user_id,
+                    deadline=item.goal.deadline
+                )
+                await goal.acreate(transaction)
+                created[index] = goal
+
+            elif isinstance(item, UpdateGoalOperation):
+                goal = goals.get(item.goal_id)
+                if goal is None:
+                    results[index] = BatchResult(status=404, detail="Goal with specified id is not found.")
+                    continue
+
+                if goal.user_id != user_id:
+                    results[index] = BatchResult(status=403, detail="Forbidden")
+                    continue
+
+                if item.goal.title is not None:
+                    goal.title = item.goal.title
+                if item.goal.description is not None:
+                    goal.description = item.goal.description
+                if item.goal.price is not None:
+                    goal.price = item.goal.price
+                if item.goal.deadline is not None:
+                    goal.deadline = datetime.fromtimestamp(item.goal.deadline)
+
+                await goal.aupdate(transaction)
+                updated_goals[index] = goal
+
+            elif isinstance(item, UpdateStoryOperation):
+                story = stories.get(item.story_id)
+                if story is None:
+                    results[index] = BatchResult(status=404, detail="Story not found.")
+                    continue
+
+                if story.user_id != user_id:
+                    results[index] = BatchResult(status=403, detail="Forbidden")
+                    continue
+
+                story.summary = item.description
+                await story.aupdate(transaction)
+                updated_stories[index] = story
+
+            elif isinstance(item, LIKE_OPERATIONS):
+                if item.story_id not in stories:
+                    results[index] = BatchResult(status=404, detail="Story not found.")
+                    continue
+
+                if isinstance(item, LikeOperation):
+                    if item.story_id in liked:
+                        results[index] = BatchResult(status=409, detail="Story already liked.")
+                        continue
+                    liked.add(item.story_id)
+                else:
+                    if item.story_id not in liked:
+                        results[index] = BatchResult(status=409, detail="Story already disliked.")
+                        continue
+                    liked.discard(item.story_id)
+
+                results[index] = BatchResult(status=200, result={"status": True})
+
+        # only the net change of the like set is written
+        await user.alike_stories(transaction, liked - liked_before)
+        await user.adislike_stories(transaction, liked_before - liked)
+
+    for story_id in liked - liked_before:
+        like_counter.add(story_id, 1)
+    for story_id in liked_before - liked:
+        like_counter.add(story_id, -1)
+
+    for index, goal in created.items():
+        results[index] = BatchResult(status=201, result=goal_response(goal))
+    for index, goal in updated_goals.items():
+        results[index] = BatchResult(status=200, result=goal_response(goal))
+    for index, story in updated_stories.items():
+        results[index] = BatchResult(status=200, result=story_response(story, liked))
+
+    return results
@@ -3,9 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 
 from pydantic import BaseModel, validator, Field
-from sqlmodel import Session
-
-from src.backend.database import engine
+from src.backend.database import async_session
 from src.backend.database.orm import Goal
 
 
@@ -52,6 +50,17 @@ class GoalResponse(BaseModel):
     deadline: float | None
 
 
+def goal_response(goal: Goal) -> GoalResponse:
+    return GoalResponse(
+        id=goal.id,
+        user_id=goal.user_id,
+        title=goal.title,
+        description=goal.description,
+        price=goal.price,
+        deadline=goal.deadline.timestamp() if goal.deadline is not None else None,
+    )
+
+
 class GoalPatchRequest(BaseModel):
     title: str | None = None
     description: str | None = None
@@ -95,7 +104,7 @@ class GoalPatchRequest(BaseModel):
             return price
 
 
-def goal_create(goal_data, user_id) -> Goal:
+async def goal_create(goal_data, user_id) -> Goal:
     goal = Goal(
         title=goal_data.title,
         description=goal_data.description,
@@ -104,8 +113,8 @@ def goal_create(goal_data, user_id) -> Goal:
         deadline=goal_data.deadline
     )
 
-    with Session(engine) as transaction:
-        goal = Goal.create(goal, transaction)
+    async with async_session() as transaction:
+        goal = await goal.acreate(transaction)
 
         if goal.deadline is not None:
             goal.deadline = goal.deadline.timestamp()
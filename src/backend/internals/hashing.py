@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from os import environ
+from time import perf_counter
+
+from fastapi import HTTPException
+from passlib.hash import sha256_crypt
+
+
+MIN_ROUNDS = sha256_crypt.min_rounds
+MAX_ROUNDS = sha256_crypt.max_rounds
+
+
+def get_password_hash(password, rounds: int | None = None):
+    # sha256_crypt with a random salt per hash, the hash string keeps its own
+    # rounds and salt so it can be verified after the settings change
+    return sha256_crypt.using(
+        rounds=rounds or int(environ.get('ENCRYPT_SALT_ROUNDS'))
+    ).hash(password)
+
+
+def verify_password(password, _hash):
+    return sha256_crypt.verify(password, _hash)
+
+
+def needs_rehash(_hash, rounds: int | None = None) -> bool:
+    """Check whether hash was made with other rounds or with the legacy global salt
+
+    :param _hash: password hash
+    :param rounds: current rounds, ENCRYPT_SALT_ROUNDS by default
+    :return: whether password should be hashed again
+    """
+    parsed = sha256_crypt.from_string(_hash)
+    return (
+        parsed.rounds != (rounds or int(environ.get('ENCRYPT_SALT_ROUNDS')))
+        or parsed.salt == environ.get('ENCRYPT_SALT')
+    )
+
+
+def verify_and_update(password, _hash) -> tuple[bool, str | None]:
+    """Verify password and rehash it with current settings if needed
+
+    :param password: password
+    :param _hash: stored password hash
+    :return: whether password matches and the new hash, if any
+    """
+    if not verify_password(password, _hash):
+        return False, None
+
+    if needs_rehash(_hash):
+        return True, get_password_hash(password)
+
+    return True, None
+
+
+def calibrate(target_ms: float, samples: int = 5, probe_rounds: int = 20000) -> int:
+    """Find rounds for which a hash takes about target_ms on this host
+
+    :param target_ms: hashing latency budget in milliseconds
+    :param samples: number of timed hashes
+    :param probe_rounds: rounds used for timing
+    :return: recommended rounds
+    """
+    timings = []
+    for _ in range(samples):
+        start = perf_counter()
+        get_password_hash("calibration", probe_rounds)
+        timings.append(perf_counter() - start)
+
+    # the cost is linear in rounds, use the median to ignore outliers
+    per_round = sorted(timings)[len(timings) // 2] / probe_rounds
+    rounds = int(target_ms / 1000 / per_round)
+
+    return min(max(rounds, MIN_ROUNDS), MAX_ROUNDS)
+
+
+class PasswordHasher:
+    """Runs password hashing in a bounded process pool.
+
+    Hashing is CPU bound and takes tens of milliseconds, so doing it in the
+    handler stalls the event loop. At most ``workers + queue_limit`` hashes
+    are accepted at once, anything above that is rejected with 503 instead
+    of piling up.
+
+    :param workers: pool size
+    :param queue_limit: number of hashes allowed to wait for a free worker
+    """
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_time = 0.
+        self.max_time = 0.
+        self._executor: ProcessPoolExecutor | None = None
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server is busy, try again later.")
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        self.pending += 1
+        start = perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            elapsed = perf_counter() - start
+            self.pending -= 1
+            self.completed += 1
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+
+    async def hash(self, password: str) -> str:
+        """Hash password
+
+        :param password: password
+        :return: password hash
+        """
+        return await self._submit(get_password_hash, password)
+
+    async def verify(self, password: str, _hash: str) -> bool:
+        """Verify password against hash
+
+        :param password: password
+        :param _hash: password hash
+        :return: whether password matches
+        """
+        return await self._submit(verify_password, password, _hash)
+
+    async def verify_and_update(self, password: str, _hash: str) -> tuple[bool, str | None]:
+        """Verify password and rehash it with current settings if needed
+
+        :param password: password
+        :param _hash: stored password hash
+        :return: whether password matches and the new hash, if any
+        """
+        return await self._submit(verify_and_update, password, _hash)
+
+    def stats(self) -> dict:
+        """Get pool statistics
+
+        :return: queue depth, in-flight, completed and rejected hashes, latency in seconds
+        """
+        return {
+            "queue_depth": max(0, self.pending - self.workers),
+            "in_flight": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_latency": self.total_time / self.completed if self.completed else 0.,
+            "max_latency": self.max_time,
+        }
+
+    def shutdown(self) -> None:
+        """Shut down process pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recommend ENCRYPT_SALT_ROUNDS for this host.")
+    parser.add_argument("--target-ms", type=float, default=100., help="hashing latency budget per login")
+    parser.add_argument("--samples", type=int, default=5, help="number of timed hashes")
+    args = parser.parse_args()
+
+    recommended = calibrate(args.target_ms, args.samples)
+
+    start = perf_counter()
+    get_password_hash("calibration", recommended)
+    measured = (perf_counter() - start) * 1000
+
+    print(f"ENCRYPT_SALT_ROUNDS={recommended}  # {measured:.1f} ms per hash, target {args.target_ms:.1f} ms")
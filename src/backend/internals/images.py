@@ -0,0 +1,226 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict
+
+from PIL import Image, ImageOps
+
+from src.backend.internals.uploads import FILE_MODE, UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def parse_sizes(spec: str) -> Dict[str, int]:
+    """Parse derivative sizes, e.g. ``thumb:256,medium:1024``
+
+    :param spec: comma separated name:max_side pairs
+    :return: longest side in pixels by derivative name
+    """
+    sizes = {}
+    for item in spec.split(","):
+        if item.strip():
+            name, size = item.split(":")
+            sizes[name.strip()] = int(size)
+
+    return sizes
+
+
+def manifest_path(photo: Path) -> Path:
+    """Get path of the derivative manifest of image
+
+    :param photo: original image
+    :return: manifest path
+    """
+    return photo.with_name(f"{photo.stem}.json")
+
+
+def _replace(path: Path, write: Callable[[BinaryIO], None]) -> None:
+    # a unique name, two workers writing one file do not share a temporary;
+    # the dot and suffix let garbage collection remove it if the worker dies
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".part")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            os.fchmod(file.fileno(), FILE_MODE)
+            write(file)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+
+def _save(image: Image.Image, path: Path, image_format: str, quality: int) -> None:
+    options = {"quality": quality} if image_format in ("JPEG", "WEBP") else {"optimize": True}
+    if image_format == "WEBP" and image.mode == "L":
+        image = image.convert("RGB")
+
+    _replace(path, lambda file: image.save(file, format=image_format, **options))
+
+
+def make_derivatives(path: str, sizes: Dict[str, int], webp: bool, quality: int) -> Dict[str, str]:
+    """Write resized copies and WebP variants of image, then its manifest
+
+    Derivatives are named ``<stem>.<name>.<ext>`` next to the original.
+    EXIF orientation is applied to the pixels and all metadata is dropped.
+    The manifest is written last, so a present manifest means every
+    derivative is complete. Runs in a worker process.
+
+    :param path: original image
+    :param sizes: longest side in pixels by derivative name
+    :param webp: also write WebP variants, including one of the full size
+    :param quality: JPEG and WebP quality
+    :return: derivative paths by name, WebP variants are suffixed ``_webp``
+    """
+    source = Path(path)
+    created = {}
+
+    with Image.open(source) as original:
+        image_format = original.format if original.format in ("JPEG", "PNG") else "PNG"
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA", "L"):
+            # palette transparency lives in the metadata dropped below
+            transparent = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if transparent else "RGB")
+        # metadata of the upload, EXIF included, is not copied to derivatives
+        image.info = {}
+
+        variants = [(name, image.copy()) for name in sizes]
+        for name, variant in variants:
+            variant.thumbnail((sizes[name], sizes[name]), Image.Resampling.LANCZOS)
+
+        if webp:
+            variants.append(("full", image))
+
+        for name, variant in variants:
+            if name != "full":
+                target = source.with_name(f"{source.stem}.{name}{source.suffix}")
+                _save(variant, target, image_format, quality)
+                created[name] = str(target)
+
+            if webp:
+                target = source.with_name(f"{source.stem}.{name}.webp")
+                _save(variant, target, "WEBP", quality)
+                created[f"{name}_webp"] = str(target)
+
+    _replace(manifest_path(source), lambda file: file.write(json.dumps(created).encode()))
+
+    return created
+
+
+class ImagePipeline:
+    """Produces image derivatives in a process pool after the request
+
+    :meth:`schedule` returns at once, the derivatives of an upload appear
+    once its manifest is written. An upload already being processed by
+    this worker is not scheduled again. :meth:`derivatives` reads manifests of
+    files in the upload directory only and remembers the ones it found,
+    a manifest does not change once written. Missing manifests are
+    remembered for ``missing_ttl`` seconds, or until this worker writes
+    them, another worker may write them meanwhile.
+
+    :param sizes: longest side in pixels by derivative name
+    :param webp: also write WebP variants
+    :param quality: JPEG and WebP quality
+    :param workers: pool size
+    :param cache_size: remembered manifests, and as many missing ones
+    :param missing_ttl: seconds to remember a missing manifest
+    """
+    def __init__(
+            self, sizes: Dict[str, int], webp: bool = True, quality: int = 80, workers: int = 2,
+            cache_size: int = 10000, missing_ttl: float = 5.
+    ):
+        self.sizes = sizes
+        self.webp = webp
+        self.quality = quality
+        self.workers = workers
+        self.cache_size = cache_size
+        self.missing_ttl = missing_ttl
+        self._executor: ProcessPoolExecutor | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._pending: set[Path] = set()
+        self._manifests: OrderedDict[str, Dict[str, str]] = OrderedDict()
+        self._missing: OrderedDict[str, float] = OrderedDict()
+
+    async def _process(self, path: Path) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, make_derivatives, str(path), self.sizes, self.webp, self.quality
+            )
+        except Exception:
+            logger.exception("Failed to make derivatives of %s", path)
+        finally:
+            self._pending.discard(path)
+            self._missing.pop(str(path), None)
+
+    def schedule(self, path: Path) -> None:
+        """Make derivatives of uploaded image in the background
+
+        :param path: uploaded image
+        """
+        # content-addressed uploads are reused, their derivatives may exist already
+        if (not self.sizes and not self.webp) or path in self._pending or manifest_path(path).exists():
+            return
+
+        # identical uploads arriving together share one job
+        self._pending.add(path)
+
+        # run outside the request context, the work is not the request's
+        task = contextvars.Context().run(asyncio.create_task, self._process(path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def derivatives(self, photo: str | None) -> Dict[str, str]:
+        """Get ready derivatives of uploaded image
+
+        :param photo: path of uploaded image
+        :return: derivative paths by name, empty until they are ready
+        """
+        if not photo:
+            return {}
+
+        cached = self._manifests.get(photo)
+        if cached is not None:
+            return cached
+
+        path = Path(photo)
+        # photo paths of users are client supplied, only read manifests of uploads
+        if path.parent != UPLOAD_DIR:
+            return {}
+
+        expires = self._missing.get(photo)
+        if expires is not None and expires > time.monotonic():
+            return {}
+
+        try:
+            manifest = json.loads(manifest_path(path).read_text())
+        except (OSError, ValueError):
+            # photos still being processed, or never to be, are listed often; do not read each time
+            self._missing[photo] = time.monotonic() + self.missing_ttl
+            self._missing.move_to_end(photo)
+            if len(self._missing) > self.cache_size:
+                self._missing.popitem(last=False)
+            return {}
+
+        self._missing.pop(photo, None)
+
+        self._manifests[photo] = manifest
+        if len(self._manifests) > self.cache_size:
+            self._manifests.popitem(last=False)
+
+        return manifest
+
+    def shutdown(self) -> None:
+        """Shut down process pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
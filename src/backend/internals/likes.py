@@ -0,0 +1,251 @@
+import argparse
+import asyncio
+import logging
+import random
+from time import monotonic
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, func, select
+
+from src.backend.database.orm import Story
+
+logger = logging.getLogger(__name__)
+
+
+def reconcile_like_counts(engine: Engine, batch_size: int = 10000) -> int:
+    """Recount likes of every story and fix counts that drifted
+
+    Stories are recounted in id ranges of ``batch_size``, one transaction
+    per range, so long tables are not locked as a whole.
+
+    :param engine: engine
+    :param batch_size: stories recounted per transaction
+    :return: number of fixed stories
+    """
+    with Session(engine) as session:
+        last_id = session.exec(select(func.max(Story.id))).one() or 0
+
+    fixed = 0
+    for first_id in range(1, last_id + 1, batch_size):
+        with Session(engine) as session:
+            fixed += Story.reconcile_like_counts(session, first_id, first_id + batch_size - 1)
+
+    return fixed
+
+
+class LikeCounter:
+    """Write-behind aggregator of ``Story.like_count``.
+
+    Like and dislike handlers add +1/-1 deltas in memory once their
+    ``UserStoryLikes`` change is committed. A background task recounts the
+    changed stories with one UPDATE every ``flush_interval`` seconds, or as
+    soon as ``max_pending`` deltas are waiting. Popular stories thus cost one
+    row update per flush instead of one per like. Pending stories are
+    recounted on shutdown, a failed flush keeps them for the next one.
+
+    Flushes write absolute counts, so every worker runs its own counter and
+    a flush or reconciliation never adds to a count that already includes
+    the likes of another worker. The deltas only adjust responses until
+    the flush. A periodic reconciliation recounts every story to repair
+    drift, e.g. from a worker killed before its last flush.
+
+    :param engine: engine
+    :param flush_interval: seconds between flushes
+    :param max_pending: number of deltas that triggers an early flush
+    :param reconcile_interval: seconds between reconciliations, 0 disables them
+    :param reconcile_batch_size: stories recounted per transaction
+    """
+    def __init__(
+            self, engine: Engine, flush_interval: float = .5, max_pending: int = 1000,
+            reconcile_interval: float = 3600., reconcile_batch_size: int = 10000
+    ):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.reconcile_interval = reconcile_interval
+        self.reconcile_batch_size = reconcile_batch_size
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_size = 0
+        self.max_flush_size = 0
+        self.total_flushed = 0
+        self.last_lag = 0.
+        self.max_lag = 0.
+        self.last_reconciled = 0
+        self.total_reconciled = 0
+        self._pending: dict[int, int] = {}
+        self._pending_deltas = 0
+        self._oldest: float | None = None
+        self._writing: dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = False
+
+    def add(self, story_id: int, delta: int) -> None:
+        """Record like count change of story
+
+        :param story_id: story id
+        :param delta: change, +1 for a like and -1 for a dislike
+        """
+        self._pending[story_id] = self._pending.get(story_id, 0) + delta
+        self._pending_deltas += 1
+
+        if self._oldest is None:
+            self._oldest = monotonic()
+
+        if self._pending_deltas >= self.max_pending:
+            self._wakeup.set()
+
+    def pending(self, story_ids) -> dict[int, int]:
+        """Get changes not written to the database yet
+
+        :param story_ids: story ids
+        :return: unwritten change by story id, stories without one are left out
+        """
+        pending = {}
+        for story_id in story_ids:
+            delta = self._pending.get(story_id, 0) + self._writing.get(story_id, 0)
+            if delta:
+                pending[story_id] = delta
+
+        return pending
+
+    def _write(self, deltas: dict[int, int]) -> None:
+        with Session(self.engine) as session:
+            Story.recount_like_counts(session, deltas)
+
+    async def _flush(self) -> int:
+        if not self._pending:
+            return 0
+
+        deltas, self._pending = self._pending, {}
+        oldest, self._oldest = self._oldest, None
+        self._pending_deltas = 0
+        self._wakeup.clear()
+
+        changes = {story_id: delta for story_id, delta in deltas.items() if delta}
+        self._writing = changes
+        try:
+            await asyncio.to_thread(self._write, changes)
+        except Exception:
+            # keep the deltas for the next flush
+            for story_id, delta in changes.items():
+                self.add(story_id, delta)
+            self._oldest = min(oldest, self._oldest)
+            self.failed_flushes += 1
+            raise
+        finally:
+            self._writing = {}
+
+        self.flushes += 1
+        self.last_flush_size = len(changes)
+        self.max_flush_size = max(self.max_flush_size, len(changes))
+        self.total_flushed += len(changes)
+        self.last_lag = monotonic() - oldest
+        self.max_lag = max(self.max_lag, self.last_lag)
+
+        return len(changes)
+
+    async def flush(self) -> int:
+        """Write pending changes
+
+        :return: number of updated stories
+        """
+        async with self._lock:
+            return await self._flush()
+
+    async def reconcile(self) -> int:
+        """Write pending changes, then recount likes of every story
+
+        :return: number of fixed stories
+        """
+        async with self._lock:
+            await self._flush()
+            fixed = await asyncio.to_thread(reconcile_like_counts, self.engine, self.reconcile_batch_size)
+
+        self.last_reconciled = fixed
+        self.total_reconciled += fixed
+        if fixed:
+            logger.warning("Like counter reconciliation fixed %d stories", fixed)
+
+        return fixed
+
+    async def _run_flush(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Like counter flush failed")
+
+    async def _run_reconcile(self) -> None:
+        # spread workers started at the same time over the interval
+        await asyncio.sleep(random.uniform(0, self.reconcile_interval))
+
+        while not self._stopping:
+            try:
+                await self.reconcile()
+            except Exception:
+                logger.exception("Like counter reconciliation failed")
+
+            await asyncio.sleep(self.reconcile_interval)
+
+    def start(self) -> None:
+        """Start background tasks"""
+        if self._tasks:
+            return
+
+        self._stopping = False
+        self._tasks.append(asyncio.create_task(self._run_flush()))
+        if self.reconcile_interval > 0:
+            self._tasks.append(asyncio.create_task(self._run_reconcile()))
+
+    async def stop(self) -> None:
+        """Stop background tasks and write pending changes"""
+        # before python 3.12 wait_for swallows a cancellation arriving together
+        # with a wakeup, the flag still ends the loop
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+        await self.flush()
+
+    def stats(self) -> dict:
+        """Get counter statistics
+
+        :return: statistics
+        """
+        return {
+            "pending_stories": len(self._pending),
+            "pending_deltas": self._pending_deltas,
+            "pending_age": monotonic() - self._oldest if self._oldest is not None else 0.,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_size": self.last_flush_size,
+            "max_flush_size": self.max_flush_size,
+            "total_flushed": self.total_flushed,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "last_reconciled": self.last_reconciled,
+            "total_reconciled": self.total_reconciled,
+        }
+
+
+if __name__ == "__main__":
+    from src.backend.database import engine
+
+    parser = argparse.ArgumentParser(description="Recount likes of every story and fix drifted like counts.")
+    parser.add_argument("--batch-size", type=int, default=10000, help="stories recounted per transaction")
+    args = parser.parse_args()
+
+    print("Fixed like counts:", reconcile_like_counts(engine, args.batch_size))
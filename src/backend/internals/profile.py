@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from hashlib import sha256
+from os import environ
+from typing import List
+
+from src.backend.database import async_session
+from src.backend.database.orm import Goal, Story, User, UserStoryLikes
+from src.backend.internals.goals import GoalResponse, goal_response
+from src.backend.internals.stories import StoryResponse, story_responses
+from src.backend.internals.users import UserResponse
+
+PROFILE_CACHE_MAX_AGE = int(environ.get("PROFILE_CACHE_MAX_AGE", 30))
+PROFILE_MAX_STORIES = 20
+
+
+class ProfileGoalResponse(GoalResponse):
+    stories: List[StoryResponse]
+
+
+class ProfileResponse(UserResponse):
+    goals: List[ProfileGoalResponse]
+
+
+def profile_etag(body: bytes) -> str:
+    return f'"{sha256(body).hexdigest()[:32]}"'
+
+
+async def profile_load(user_id: int, viewer_id: int, stories_per_goal: int) -> ProfileResponse | None:
+    # four queries whatever the number of goals: user with metadata, active
+    # goals, newest stories of every goal and the viewer's likes among them
+    async with async_session() as transaction:
+        found = await User.aget_with_metadata(transaction, user_id)
+        if found is None:
+            return None
+
+        user, metadata = found
+        goals = await Goal.aget_active_by_user_id(transaction, user_id)
+        stories = await Story.aget_recent_by_goal_ids(transaction, (goal.id for goal in goals), stories_per_goal)
+        liked = await UserStoryLikes.aliked_story_ids(transaction, viewer_id, (story.id for story in stories))
+
+    stories_by_goal = defaultdict(list)
+    for story in story_responses(stories, liked):
+        stories_by_goal[story.goal_id].append(story)
+
+    return ProfileResponse(
+        id=user.id,
+        nickname=user.nickname,
+        photo=metadata.photo if metadata is not None else None,
+        description=metadata.description if metadata is not None else None,
+        goals=[
+            ProfileGoalResponse(**goal_response(goal).dict(), stories=stories_by_goal[goal.id])
+            for goal in goals
+        ],
+    )
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Dict, List, Set
 
 from fastapi import File
 from pydantic import BaseModel, parse, Field
-from sqlmodel import Session
-
-from src.backend.database import engine
+from src.backend.database import async_session
 from src.backend.database.orm import Story, Goal
+from src.backend.dependencies import images, like_counter, uploads
 
 
 def check_description(description):
@@ -19,15 +19,16 @@ def check_description(description):
 def check_photo(photo: File):
     if photo.content_type not in ('image/png', 'image/jpg', 'image/jpeg'):
         raise TypeError('File content must be image.')
-    elif int(photo.size) > 4194304:
-        raise ValueError('File size must be < 4194304.')
+    # the size is checked again while the file is written
+    elif photo.size is not None and int(photo.size) > uploads.max_bytes:
+        raise ValueError(f'File size must be < {uploads.max_bytes}.')
     else:
         return photo
 
 
-def validate_goal_exists(goal_id):
-    with Session(engine) as transaction:
-        if Goal.get_by_id(transaction, goal_id) is not None:
+async def validate_goal_exists(goal_id):
+    async with async_session() as transaction:
+        if await Goal.aget_by_id(transaction, goal_id) is not None:
             return True
 
         return False
@@ -40,9 +41,36 @@ class StoryResponse(BaseModel):
     photo: str
     summary: str
     date_create: float
+    like_count: int = 0
+    liked_by_me: bool = False
+    derivatives: Dict[str, str] = {}
+
+
+def story_responses(stories: List[Story], liked_story_ids: Set[int] = frozenset()) -> List[StoryResponse]:
+    # stored counts lag behind by the deltas the like counter has not written yet
+    pending = like_counter.pending(story.id for story in stories)
+
+    return [
+        StoryResponse(
+            id=story.id,
+            user_id=story.user_id,
+            goal_id=story.goal_id,
+            photo=story.photo,
+            summary=story.summary,
+            date_create=story.date_create.timestamp(),
+            like_count=max(story.like_count + pending.get(story.id, 0), 0),
+            liked_by_me=story.id in liked_story_ids,
+            derivatives=images.derivatives(story.photo),
+        )
+        for story in stories
+    ]
+
+
+def story_response(story: Story, liked_story_ids: Set[int] = frozenset()) -> StoryResponse:
+    return story_responses([story], liked_story_ids)[0]
 
 
-def story_create(user_id, goal_id: int, photo: str, description: str) -> Story:
+async def story_create(user_id, goal_id: int, photo: str, description: str) -> Story:
     story = Story(
         user_id=user_id,
         goal_id=goal_id,
@@ -50,8 +78,8 @@ def story_create(user_id, goal_id: int, photo: str, description: str) -> Story:
         photo=photo
     )
 
-    with Session(engine) as transaction:
-        story = Story.create(story, transaction)
+    async with async_session() as transaction:
+        story = await story.acreate(transaction)
 
         if story.date_create is not None:
             story.date_create = story.date_create.timestamp()
@@ -0,0 +1,335 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import Counter as Tally, defaultdict
+from pathlib import Path
+from time import time
+from typing import BinaryIO, Callable, Dict, List, Set
+
+from fastapi import UploadFile
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from src.backend.database.orm import Story, UserMetadata
+from src.backend.metrics import Counter
+
+UPLOAD_DIR = Path(__file__).parent.parent.parent.parent / "uploads"
+"""Directory of uploaded files."""
+
+
+def _file_mode() -> int:
+    # the umask can only be read by setting it
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+FILE_MODE = _file_mode()
+"""Mode of written files, what ``open`` would give them; ``mkstemp`` creates files readable by the owner only."""
+
+
+class UploadTooLarge(ValueError):
+    """Upload exceeds the size limit"""
+
+
+def blob_name(digest: str, head: bytes) -> str:
+    """Get content-addressed file name
+
+    The extension comes from the content too, so identical uploads get
+    one name whatever the client called them.
+
+    :param digest: sha256 of the content
+    :param head: first bytes of the content
+    :return: file name
+    """
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        extension = "png"
+    elif head.startswith(b"\xff\xd8\xff"):
+        extension = "jpg"
+    else:
+        extension = "bin"
+
+    return f"{digest}.{extension}"
+
+
+def is_blob(path: Path) -> bool:
+    """Check whether file is an upload, not a derivative, manifest or temporary file
+
+    :param path: file in the upload directory
+    :return: whether file is an upload
+    """
+    return not path.name.startswith(".") and path.suffix != ".json" and "." not in path.stem
+
+
+def file_blob_name(path: Path, chunk_size: int = 65536) -> str:
+    """Get content-addressed name of file without reading it into memory at once
+
+    :param path: file
+    :param chunk_size: bytes read at once
+    :return: file name
+    """
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        head = chunk = file.read(chunk_size)
+        while chunk:
+            digest.update(chunk)
+            chunk = file.read(chunk_size)
+
+    return blob_name(digest.hexdigest(), head)
+
+
+def _remove_with_derivatives(path: Path, dry_run: bool) -> int:
+    removed = 0
+    # derivatives and the manifest share the stem of their upload
+    for related in path.parent.glob(f"{path.stem}.*"):
+        removed += related.stat().st_size
+        if not dry_run:
+            related.unlink()
+
+    return removed
+
+
+def _directory_size(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.iterdir()) if directory.exists() else 0
+
+
+def blob_references(engine: Engine, directory: Path = UPLOAD_DIR) -> Dict[str, int]:
+    """Count stories and user metadata using each upload
+
+    Deleted stories keep their photos, they may be restored.
+
+    :param engine: engine
+    :param directory: upload directory
+    :return: number of references by file name
+    """
+    with Session(engine) as session:
+        references = Tally(Story.photo_references(session))
+        references.update(UserMetadata.photo_references(session))
+
+    # user photos are client supplied and may point anywhere
+    return {Path(photo).name: count for photo, count in references.items() if Path(photo).parent == directory}
+
+
+def collect_garbage(engine: Engine, directory: Path = UPLOAD_DIR, grace: float = 86400., dry_run: bool = False) -> dict:
+    """Remove uploads nothing refers to, with their derivatives
+
+    Uploads and temporary files younger than ``grace`` seconds are kept, a
+    fresh upload is referenced only once its story or profile is saved.
+
+    :param engine: engine
+    :param directory: upload directory
+    :param grace: minimal age in seconds of removed files
+    :param dry_run: only report what would be removed
+    :return: removed files and bytes
+    """
+    references = blob_references(engine, directory)
+    cutoff = time() - grace
+    report = {"removed": 0, "bytes_reclaimed": 0}
+
+    for path in sorted(directory.iterdir()) if directory.exists() else []:
+        if path.stat().st_mtime > cutoff:
+            continue
+
+        if path.name.startswith(".") and path.name.endswith(".part"):
+            # left behind by a crashed worker
+            report["bytes_reclaimed"] += path.stat().st_size
+            if not dry_run:
+                path.unlink()
+        elif is_blob(path) and path.name not in references:
+            report["removed"] += 1
+            report["bytes_reclaimed"] += _remove_with_derivatives(path, dry_run)
+
+    return report
+
+
+def deduplicate(
+        engine: Engine, directory: Path = UPLOAD_DIR, derive: Callable[[str], object] | None = None,
+        dry_run: bool = False
+) -> dict:
+    """Move uploads to content-addressed names and drop duplicates
+
+    Every group of identical uploads is kept once under its content hash,
+    references are pointed to it, then the old files and their derivatives
+    are removed. A kept file without derivatives gets them from ``derive``.
+
+    :param engine: engine
+    :param directory: upload directory
+    :param derive: makes derivatives of an upload
+    :param dry_run: only report what would change
+    :return: scanned files, blobs, duplicates, updated references, bytes reclaimed by removing
+        duplicates and bytes of derivatives written for kept files
+    """
+    groups: Dict[str, List[Path]] = defaultdict(list)
+    for path in sorted(directory.iterdir()) if directory.exists() else []:
+        if is_blob(path):
+            groups[file_blob_name(path)].append(path)
+
+    report = {
+        "files": sum(len(paths) for paths in groups.values()),
+        "blobs": len(groups),
+        "duplicates": sum(len(paths) - 1 for paths in groups.values()),
+        "references_updated": 0,
+        # estimate of a dry run: every copy but one of each original
+        "bytes_reclaimed": sum(paths[0].stat().st_size * (len(paths) - 1) for paths in groups.values()),
+        "derivative_bytes_written": 0,
+    }
+    size_before = _directory_size(directory)
+
+    obsolete: List[Path] = []
+    kept: Set[Path] = set()
+    with Session(engine) as session:
+        for name, paths in groups.items():
+            target = directory / name
+            kept.add(target)
+
+            if target not in paths and not dry_run:
+                try:
+                    os.link(paths[0], target)
+                except OSError:
+                    shutil.copy2(paths[0], target)
+
+            for path in paths:
+                if path == target:
+                    continue
+
+                obsolete.append(path)
+                if not dry_run:
+                    report["references_updated"] += Story.replace_photo(session, str(path), str(target))
+                    report["references_updated"] += UserMetadata.replace_photo(session, str(path), str(target))
+
+    if not dry_run:
+        # every reference is moved, the old files can go
+        for path in obsolete:
+            _remove_with_derivatives(path, False)
+
+        # measured before deriving, new derivatives are not negative savings
+        size_deduplicated = _directory_size(directory)
+        report["bytes_reclaimed"] = size_before - size_deduplicated
+
+        if derive is not None:
+            for target in kept:
+                if not target.with_name(f"{target.stem}.json").exists():
+                    derive(str(target))
+
+        report["derivative_bytes_written"] = _directory_size(directory) - size_deduplicated
+
+    return report
+
+
+class UploadWriter:
+    """Writes uploaded files to disk off the event loop
+
+    The body starlette spooled for the request is copied in ``chunk_size``
+    pieces in a worker thread, so an upload holds one chunk in memory
+    whatever its size. The copy stops as soon as it passes ``max_bytes``,
+    the client-reported size is not trusted. At most ``concurrency``
+    uploads are written at once per worker.
+
+    Files are named by the sha256 of their content, hashed while copying.
+    An upload identical to a stored one reuses it, otherwise the file is
+    written under a temporary name and renamed into place, readers never
+    see a partial file.
+
+    :param directory: upload directory
+    :param max_bytes: size limit of one upload
+    :param chunk_size: bytes copied at once
+    :param concurrency: uploads written at once
+    :param uploaded_bytes: counter of received bytes by endpoint
+    :param deduplicated_bytes: counter of received bytes that reused a stored file, by endpoint
+    """
+    def __init__(
+            self, directory: Path = UPLOAD_DIR, max_bytes: int = 4194304, chunk_size: int = 65536,
+            concurrency: int = 8, uploaded_bytes: Counter | None = None, deduplicated_bytes: Counter | None = None
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.uploaded_bytes = uploaded_bytes
+        self.deduplicated_bytes = deduplicated_bytes
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def _copy(self, source: BinaryIO) -> tuple[Path, int, bool]:
+        self.directory.mkdir(exist_ok=True)
+        source.seek(0)
+
+        # same directory, so the rename stays on one filesystem and is atomic
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".part")
+        try:
+            written = 0
+            digest = hashlib.sha256()
+            with os.fdopen(descriptor, "wb") as target:
+                os.fchmod(target.fileno(), FILE_MODE)
+                head = chunk = source.read(self.chunk_size)
+                while chunk:
+                    written += len(chunk)
+                    if written > self.max_bytes:
+                        raise UploadTooLarge(f"File size must be < {self.max_bytes}.")
+                    digest.update(chunk)
+                    target.write(chunk)
+                    chunk = source.read(self.chunk_size)
+
+            path = self.directory / blob_name(digest.hexdigest(), head)
+            if path.exists():
+                os.unlink(temporary)
+                # restart the grace period, so garbage collection keeps it until it is referenced
+                os.utime(path)
+                return path, written, False
+
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+
+        return path, written, True
+
+    async def save(self, file: UploadFile, endpoint: str) -> Path:
+        """Write uploaded file under its content hash
+
+        :param file: uploaded file
+        :param endpoint: endpoint name for metrics
+        :return: path of the written or reused file
+        :raises UploadTooLarge: file exceeds ``max_bytes``, nothing is written
+        """
+        async with self._semaphore:
+            path, written, created = await asyncio.to_thread(self._copy, file.file)
+
+        if self.uploaded_bytes is not None:
+            self.uploaded_bytes.inc(written, (endpoint,))
+        if not created and self.deduplicated_bytes is not None:
+            self.deduplicated_bytes.inc(written, (endpoint,))
+
+        return path
+
+
+if __name__ == "__main__":
+    from functools import partial
+
+    from src.backend.database import engine
+    from src.backend.internals.images import make_derivatives, parse_sizes
+
+    parser = argparse.ArgumentParser(description="Maintain the content-addressed upload directory.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    dedup_parser = subparsers.add_parser("dedup", help="rename uploads to their content hash and drop duplicates")
+    dedup_parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    gc_parser = subparsers.add_parser("gc", help="remove uploads nothing refers to")
+    gc_parser.add_argument("--grace-hours", type=float, default=24., help="keep files younger than this")
+    gc_parser.add_argument("--dry-run", action="store_true", help="only report what would be removed")
+    args = parser.parse_args()
+
+    if args.command == "dedup":
+        derive = partial(
+            make_derivatives,
+            sizes=parse_sizes(os.environ.get("IMAGE_DERIVATIVES", "thumb:256,medium:1024")),
+            webp=os.environ.get("IMAGE_WEBP", "True") == "True",
+            quality=int(os.environ.get("IMAGE_QUALITY", 80)),
+        )
+        result = deduplicate(engine, derive=derive, dry_run=args.dry_run)
+    else:
+        result = collect_garbage(engine, grace=args.grace_hours * 3600, dry_run=args.dry_run)
+
+    for key, value in result.items():
+        print(f"{key}: {value}")
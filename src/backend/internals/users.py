@@ -1,13 +1,12 @@
 import re
-from os import environ
-from typing import List
+from typing import Dict, List
 
-from passlib.hash import sha256_crypt
 from pydantic import BaseModel, validator
-from sqlmodel import Session, Field
+from sqlmodel import Field
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.backend.database import engine
 from src.backend.database.orm import User, UserMetadata
+from src.backend.dependencies import images, uploads
 from src.backend.routes.nickname_validation import validate_nickname
 
 NICKNAME_PATTERN = re.compile(r"^[a-zA-Z0-9]+$")
@@ -15,61 +14,37 @@ PASSWORD_PATTERN = re.compile(r"[0-9]")
 FILE_FORMAT = ["image/jpg", "image/png", "image/jpeg"]
 
 
-def get_password_hash(password):
-    # using salt from environment variable with 1000 rounds
-    # using sha256_crypt
-    hashed_pass = sha256_crypt.using(
-        rounds=environ.get('ENCRYPT_SALT_ROUNDS'),
-        salt=environ.get('ENCRYPT_SALT')
-    ).hash(password)
-
-    print(hashed_pass)
-
-    return hashed_pass
-
-
-def verify_password(password, _hash):
-    return sha256_crypt.using(
-        rounds=environ.get('ENCRYPT_SALT_ROUNDS'),
-        salt=environ.get('ENCRYPT_SALT')
-    ).verify(password, _hash)
-
-
 def validate_photo(content_type, size):
 
     state = True
 
-    if (content_type not in FILE_FORMAT) or (int(size) > 4194304):
+    # the size is checked again while the file is written
+    if (content_type not in FILE_FORMAT) or (size is not None and int(size) > uploads.max_bytes):
         state = False
         
     return state
 
 
-def user_registrate(user_data) -> User:
+async def user_registrate(user_data, session: AsyncSession) -> User:
 
     new_user = User(
         nickname=user_data.nickname,
         password=user_data.password,
     )
 
-    with Session(engine) as session:
-        User.create(new_user, session)
-
-    return new_user
+    return await new_user.acreate(session)
 
 
-def user_metadata_create(user_data, user_id) -> UserMetadata:
+async def user_metadata_create(user_data, user: User, session: AsyncSession) -> UserMetadata:
 
+    # linked through the relationship, the user may not have an id before the unit of work commits
     new_user_metadata = UserMetadata(
-        user_id=user_id,
+        user=user,
         description=user_data.description,
         photo=user_data.photo,
     )
 
-    with Session(engine) as session:
-        UserMetadata.create(new_user_metadata, session)
-
-    return new_user_metadata
+    return await new_user_metadata.acreate(session)
 
 
 class Nickname(BaseModel):
@@ -139,6 +114,12 @@ class UserRequest(Metadata, Nickname, Credentials):
 
 class UserResponse(Metadata, Nickname):
     id: int
+    derivatives: Dict[str, str] = {}
+
+    @validator("derivatives", always=True)
+    def ready_derivatives(cls, value, values):
+        # derivatives of the photo appear once the image pipeline wrote them
+        return value or images.derivatives(values.get("photo"))
 
 
 class UserPatchRequest(Nickname):
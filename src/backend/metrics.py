@@ -0,0 +1,314 @@
+"""Prometheus metrics.
+
+Counters, gauges and histograms rendered in the Prometheus text format.
+Updates go to a per-thread shard, a plain dict owned by the updating
+thread, so the hot path takes no lock; shards are summed when scraped.
+Every worker process serves its own metrics, scrape each worker.
+"""
+from bisect import bisect_left
+from threading import Lock, local
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Tuple
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "MetricsMiddleware",
+    "CONTENT_TYPE",
+    "LATENCY_BUCKETS",
+    "SIZE_BUCKETS",
+]
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+"""Media type of the text format, the response adds the charset."""
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10.)
+"""Default histogram buckets in seconds."""
+
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+"""Default histogram buckets in bytes."""
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Metric with per-thread shards
+
+    :param name: metric name
+    :param documentation: help text
+    :param labels: label names
+    :param function: callable returning values by label values, evaluated when scraped
+    """
+    type = "untyped"
+
+    def __init__(
+            self, name: str, documentation: str, labels: Labels = (),
+            function: Callable[[], Dict[Labels, float]] | None = None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.function = function
+        self._local = local()
+        self._shards: List[dict] = []
+        self._lock = Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            # once per thread
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _items(self) -> List[Tuple[Labels, object]]:
+        with self._lock:
+            shards = list(self._shards)
+
+        # copying a dict holds the GIL, so a concurrent update cannot break it
+        return [item for shard in shards for item in list(shard.items())]
+
+    def collect(self) -> Dict[Labels, float]:
+        """Get current values
+
+        :return: values by label values
+        """
+        if self.function is not None:
+            return self.function()
+
+        values = {}
+        for labels, value in self._items():
+            values[labels] = values.get(labels, 0) + value
+
+        return values
+
+    def render(self) -> List[str]:
+        """Render metric in the text format
+
+        :return: lines
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}")
+
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic counter"""
+    type = "counter"
+
+    def inc(self, amount: float = 1, labels: Labels = ()) -> None:
+        """Increase counter
+
+        :param amount: non-negative increase
+        :param labels: label values
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+    type = "gauge"
+
+    def inc(self, amount: float = 1, labels: Labels = ()) -> None:
+        """Increase gauge
+
+        :param amount: increase
+        :param labels: label values
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def dec(self, amount: float = 1, labels: Labels = ()) -> None:
+        """Decrease gauge
+
+        :param amount: decrease
+        :param labels: label values
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) - amount
+
+
+class Histogram(_Metric):
+    """Distribution of observed values
+
+    Each shard keeps, per label values, the count of every bucket followed
+    by the ``+Inf`` count and the sum; buckets are made cumulative when
+    scraped.
+
+    :param buckets: upper bounds of buckets, ascending
+    """
+    type = "histogram"
+
+    def __init__(
+            self, name: str, documentation: str, labels: Labels = (),
+            buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        """Record value
+
+        :param value: observed value
+        :param labels: label values
+        """
+        shard = self._shard()
+        cells = shard.get(labels)
+        if cells is None:
+            cells = shard[labels] = [0] * (len(self.buckets) + 2)
+
+        cells[bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def collect(self) -> Dict[Labels, List[float]]:
+        """Get bucket counts and sums
+
+        :return: non-cumulative bucket counts, ``+Inf`` count and sum by label values
+        """
+        values = {}
+        for labels, cells in self._items():
+            total = values.setdefault(labels, [0] * len(cells))
+            for index, cell in enumerate(list(cells)):
+                total[index] += cell
+
+        return values
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        names = (*self.labels, "le")
+        for labels, cells in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), cells):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(names, (*labels, _format_value(bound)))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(cells[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics served by one worker"""
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Labels = (), function=None) -> Counter:
+        """Register counter
+
+        :param name: metric name
+        :param documentation: help text
+        :param labels: label names
+        :param function: callable returning values by label values, instead of :meth:`Counter.inc`
+        :return: counter
+        """
+        return self._register(Counter(name, documentation, labels, function))
+
+    def gauge(self, name: str, documentation: str, labels: Labels = (), function=None) -> Gauge:
+        """Register gauge
+
+        :param name: metric name
+        :param documentation: help text
+        :param labels: label names
+        :param function: callable returning values by label values, instead of :meth:`Gauge.inc`
+        :return: gauge
+        """
+        return self._register(Gauge(name, documentation, labels, function))
+
+    def histogram(
+            self, name: str, documentation: str, labels: Labels = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Histogram:
+        """Register histogram
+
+        :param name: metric name
+        :param documentation: help text
+        :param labels: label names
+        :param buckets: upper bounds of buckets
+        :return: histogram
+        """
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        """Render every metric in the text format
+
+        :return: exposition
+        """
+        return "\n".join(line for metric in self.metrics.values() for line in metric.render()) + "\n"
+
+
+class MetricsMiddleware:
+    """Records latency, size and concurrency of requests per route
+
+    Requests are labelled with the route template, so path parameters do
+    not create new series.
+
+    :param app: ASGI application
+    :param registry: metrics registry
+    """
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.in_flight = registry.gauge("actnow_http_requests_in_flight", "Requests being served.")
+        self.duration = registry.histogram(
+            "actnow_http_request_duration_seconds", "Request latency.", ("method", "route", "status")
+        )
+        self.size = registry.histogram(
+            "actnow_http_response_size_bytes", "Response body size.", ("method", "route"), SIZE_BUCKETS
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        size = 0
+
+        async def send_measured(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.in_flight.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_measured)
+        finally:
+            elapsed = perf_counter() - start
+            self.in_flight.dec()
+
+            route = scope.get("route")
+            path = route.path if route is not None else "<unmatched>"
+            self.duration.observe(elapsed, (scope["method"], path, str(status)))
+            self.size.observe(size, (scope["method"], path))
@@ -3,12 +3,10 @@ from fastapi import Depends, Response
 from fastapi.exceptions import HTTPException
 from fastapi.security import HTTPBasicCredentials, HTTPBasic
 from pydantic import BaseModel
-from sqlmodel import Session
 
-from src.backend.database import engine
+from src.backend.database import async_session
 from src.backend.database.orm import User
-from src.backend.dependencies import cookie, backend, verifier
-from src.backend.internals.users import get_password_hash
+from src.backend.dependencies import cookie, backend, verifier, hasher
 from src.backend.sessions import SessionData
 
 app = APIRouter()
@@ -20,13 +18,22 @@ class UserAuth(BaseModel):
     password = str
 
 
-def verify_credentials(nickname: str, password: str) -> User | HTTPException:
-    with Session(engine) as session:
-        user = User.get_by_nickname(session, nickname)
-        if user is None:
-            return HTTPException(status_code=401, detail="Invalid username or password")
-        if get_password_hash(password) != user.password:
-            return HTTPException(status_code=401, detail="Invalid username or password")
+async def verify_credentials(nickname: str, password: str) -> User | HTTPException:
+    async with async_session() as session:
+        user = await User.aget_by_nickname(session, nickname)
+
+    if user is None:
+        return HTTPException(status_code=401, detail="Invalid username or password")
+
+    valid, new_hash = await hasher.verify_and_update(password, user.password)
+    if not valid:
+        return HTTPException(status_code=401, detail="Invalid username or password")
+
+    # stored hash uses outdated parameters, upgrade it while we know the password
+    if new_hash is not None:
+        async with async_session() as session:
+            user.password = new_hash
+            await user.aupdate(session)
 
     return user
 
@@ -40,7 +47,7 @@ async def login(
     if old_session is not None:
         return {"message": "Already logged in"}
 
-    user = verify_credentials(credentials.username, credentials.password)
+    user = await verify_credentials(credentials.username, credentials.password)
 
     if isinstance(user, HTTPException):
         raise user
@@ -49,6 +56,6 @@ async def login(
 
     await backend.create(session.uuid, session)
 
-    cookie.attach_to_response(response, session.uuid)
+    cookie.attach_session(response, session)
 
     return {"success": True}
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+
+from src.backend.dependencies import cookie, verifier
+from src.backend.internals.batch import BatchRequest, BatchResponse, apply_batch
+from src.backend.sessions import SessionData
+
+app = APIRouter()
+
+
+@app.post('/batch', response_model=BatchResponse, dependencies=[Depends(cookie)], status_code=200)
+async def post_batch(item: BatchRequest, session: SessionData = Depends(verifier)):
+
+    results = await apply_batch(item.operations, session.user_id)
+
+    return BatchResponse(results=results)
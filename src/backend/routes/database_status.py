@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+
+from src.backend.database import engine_stats, async_engine_stats, query_profiler, replica_stats, replicas
+from src.backend.dependencies import like_counter
+
+app = APIRouter()
+
+
+@app.get("/status/database")
+def get_database_status():
+    return {
+        engine_stats.name: engine_stats.snapshot(),
+        async_engine_stats.name: async_engine_stats.snapshot(),
+        **{stats.name: stats.snapshot() for stats in replica_stats},
+        "routing": replicas.stats(),
+    }
+
+
+@app.get("/status/likes")
+def get_like_counter_status():
+    return like_counter.stats()
+
+
+@app.get("/status/queries")
+def get_query_status():
+    return query_profiler.stats()
@@ -1,49 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 
 from src.backend.dependencies import cookie, verifier
-from src.backend.internals.stories import StoryResponse
+from src.backend.internals.stories import StoryResponse, story_responses
 from src.backend.sessions import SessionData
-from src.backend.database.orm import Story
+from src.backend.database.orm import Story, UserStoryLikes
+from src.backend.database.profiling import query_budget
+from src.backend.database.pagination import encode_cursor, decode_cursor
 
-from sqlmodel import Session
-from src.backend.database import engine
+from src.backend.database import sync_session
 
 app = APIRouter()
 
 
 @app.get("/stories/user/{user_id}", response_model=list[StoryResponse], dependencies=[Depends(cookie)])
-def get_story_by_id(user_id: int, limit: int = 100, offset: int = 0, _: SessionData = Depends(verifier)):
+@query_budget(3)
+def get_story_by_id(
+        user_id: int,
+        response: Response,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: str | None = None,
+        session: SessionData = Depends(verifier)
+):
     if offset < 0 or limit < 0:
         raise HTTPException(status_code=400, detail="Offset and limit must be positive.")
 
     if limit > 100:
         limit = 100
 
-    with Session(engine) as transaction:
-        stories = Story.get_by_user_id(transaction, user_id, limit, offset)
+    try:
+        position = decode_cursor(cursor) if cursor is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        stories = [story for story in stories if not story.deleted]
+    with sync_session() as transaction:
+        stories = Story.get_by_user_id(transaction, user_id, limit, offset, position)
 
-        for idx, story in enumerate(stories):
-            stories[idx].date_create = story.date_create.timestamp()
+        # a full page may be followed by more stories
+        if stories and len(stories) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(stories[-1].date_create, stories[-1].id)
 
-        return stories
+        liked = UserStoryLikes.liked_story_ids(transaction, session.user_id, (story.id for story in stories))
+
+        return story_responses(stories, liked)
 
 
 @app.get("/stories/goal/{goal_id}", response_model=list[StoryResponse], dependencies=[Depends(cookie)])
-def get_story_by_id(goal_id: int, limit: int = 100, offset: int = 0, _: SessionData = Depends(verifier)):
+@query_budget(3)
+def get_story_by_id(
+        goal_id: int,
+        response: Response,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: str | None = None,
+        session: SessionData = Depends(verifier)
+):
     if offset < 0 or limit < 0:
         raise HTTPException(status_code=400, detail="Offset and limit must be positive.")
 
     if limit > 100:
         limit = 100
 
-    with Session(engine) as transaction:
-        stories = Story.get_by_goal_id(transaction, goal_id, limit, offset)
+    try:
+        position = decode_cursor(cursor) if cursor is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    with sync_session() as transaction:
+        stories = Story.get_by_goal_id(transaction, goal_id, limit, offset, position)
 
-        stories = [story for story in stories if not story.deleted]
+        # a full page may be followed by more stories
+        if stories and len(stories) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(stories[-1].date_create, stories[-1].id)
 
-        for idx, story in enumerate(stories):
-            stories[idx].date_create = story.date_create.timestamp()
+        liked = UserStoryLikes.liked_story_ids(transaction, session.user_id, (story.id for story in stories))
 
-        return stories
+        return story_responses(stories, liked)
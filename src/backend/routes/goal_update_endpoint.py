@@ -1,10 +1,9 @@
 from datetime import datetime
 
 from fastapi import HTTPException, Depends, APIRouter
-from sqlmodel import Session
-
-from src.backend.database import engine
+from src.backend.database import async_unit_of_work
 from src.backend.database.orm import Goal
+from src.backend.database.profiling import query_budget
 from src.backend.dependencies import verifier, cookie
 from src.backend.internals.goals import GoalPatchRequest, GoalResponse
 from src.backend.sessions import SessionData
@@ -13,20 +12,18 @@ app = APIRouter()
 
 
 @app.patch("/goal/{goal_id}", response_model=GoalResponse, dependencies=[Depends(cookie)], status_code=200)
+@query_budget(3)
 async def update_goal(goal_id: int, item: GoalPatchRequest, session: SessionData = Depends(verifier)):
     # check if fields are not empty
     if item.title is None and item.description is None and item.price is None and item.deadline is None:
         raise HTTPException(status_code=400, detail="At least one field must be specified.")
 
-    with Session(engine) as transaction:
-        goal = Goal.get_by_id(transaction, goal_id)
+    async with async_unit_of_work() as transaction:
+        goal = await Goal.aget_by_id(transaction, goal_id)
 
         if goal is None:
             raise HTTPException(status_code=404, detail="Goal with specified id is not found.")
 
-        if goal.deleted:
-            raise HTTPException(status_code=404, detail="Goal with specified id is not found.")
-
         if goal.user_id != session.user_id:
             raise HTTPException(status_code=403, detail="Forbidden")
 
@@ -39,9 +36,10 @@ async def update_goal(goal_id: int, item: GoalPatchRequest, session: SessionData
         if item.deadline is not None:
             goal.deadline = datetime.fromtimestamp(item.deadline)
 
-        goal.update(transaction)
+        await goal.aupdate(transaction)
 
-        if goal.deadline is not None:
-            goal.deadline = goal.deadline.timestamp()
+    # converted after the commit, so the timestamp is never flushed
+    if goal.deadline is not None:
+        goal.deadline = goal.deadline.timestamp()
 
-        return goal
+    return goal
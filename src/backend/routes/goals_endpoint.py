@@ -4,28 +4,30 @@ from src.backend.dependencies import cookie, verifier
 from src.backend.internals.goals import GoalRequest, GoalResponse, goal_create
 from src.backend.sessions import SessionData
 from src.backend.database.orm import Goal
+from src.backend.database.profiling import query_budget
 
-from sqlmodel import Session
-from src.backend.database import engine
+from src.backend.database import sync_session
 
 app = APIRouter()
 
 
 @app.post('/goal', response_model=GoalResponse, dependencies=[Depends(cookie)], status_code=201)
+@query_budget(3)
 async def create_goal(item: GoalRequest, session: SessionData = Depends(verifier)):
 
-    new_goal = goal_create(item, session.user_id)
+    new_goal = await goal_create(item, session.user_id)
 
     return new_goal
 
 
 @app.get("/goal/{goal_id}", dependencies=[Depends(cookie)])
+@query_budget(1)
 def get_goal_by_id(goal_id: int) -> Goal:
 
-    with Session(engine) as transaction:
+    with sync_session() as transaction:
         goal = Goal.get_by_id(transaction, goal_id)
 
-        if goal is None or goal.deleted is True:
+        if goal is None:
             raise HTTPException(status_code=404, detail="Goal with specified id is not found.")
 
         return goal
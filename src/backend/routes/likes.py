@@ -1,57 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
 
-from src.backend.database import engine
-from src.backend.database.orm import User, Story
-from src.backend.dependencies import cookie, verifier
+from src.backend.database import async_unit_of_work
+from src.backend.database.orm import Story, UserStoryLikes
+from src.backend.database.profiling import query_budget
+from src.backend.dependencies import cookie, verifier, like_counter
 from src.backend.sessions import SessionData
 
 app = APIRouter()
 
 
 @app.post('/story/like/{story_id}', dependencies=[Depends(cookie)], status_code=200)
+@query_budget(3)
 async def like_story(
         story_id: int,
         session: SessionData = Depends(verifier)
 ):
-    with Session(engine) as transaction:
-        user = User.get_by_id(transaction, session.user_id)
-
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found.")
-
-        story = Story.get_by_id(transaction, story_id)
+    async with async_unit_of_work() as transaction:
+        story = await Story.aget_by_id(transaction, story_id)
 
         if not story:
             raise HTTPException(status_code=404, detail="Story not found.")
 
-        if story in user.liked_stories:
+        # a single insert-or-ignore, concurrent likes cannot conflict on the key
+        if not await UserStoryLikes.aadd(transaction, session.user_id, [story_id]):
             raise HTTPException(status_code=409, detail="Story already liked.")
 
-        user.like_story(transaction, story_id)
+    like_counter.add(story_id, 1)
 
-        return {"status": True}
+    return {"status": True}
 
 
 @app.post('/story/dislike/{story_id}', dependencies=[Depends(cookie)], status_code=200)
+@query_budget(3)
 async def dislike_story(
         story_id: int,
         session: SessionData = Depends(verifier)
 ):
-    with Session(engine) as transaction:
-        user = User.get_by_id(transaction, session.user_id)
-
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found.")
-
-        story = Story.get_by_id(transaction, story_id)
+    async with async_unit_of_work() as transaction:
+        story = await Story.aget_by_id(transaction, story_id)
 
         if not story:
             raise HTTPException(status_code=404, detail="Story not found.")
 
-        if story not in user.liked_stories:
+        if not await UserStoryLikes.aremove(transaction, session.user_id, [story_id]):
             raise HTTPException(status_code=409, detail="Story already disliked.")
 
-        user.dislike_story(transaction, story_id)
+    like_counter.add(story_id, -1)
 
-        return {"status": True}
+    return {"status": True}
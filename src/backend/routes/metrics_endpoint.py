@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from src.backend.dependencies import metrics
+from src.backend.metrics import CONTENT_TYPE
+
+app = APIRouter()
+
+
+@app.get("/metrics", response_class=Response)
+def get_metrics():
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from sqlmodel import Session
 
-from src.backend.database import engine
+from src.backend.database import sync_session
 from src.backend.database.orm import User
+from src.backend.database.profiling import query_budget
 from src.backend.dependencies import cookie, verifier
 from src.backend.sessions import SessionData
 
@@ -17,8 +17,9 @@ class Nicknames(BaseModel):
 
 # логика типа
 def validate_nickname(requested_nickname: str):
-    with Session(engine) as transaction:
-        user = User.get_by_nickname(transaction, nickname=requested_nickname)
+    with sync_session() as transaction:
+        # nicknames of deleted users stay taken
+        user = User.get_by_nickname(transaction, nickname=requested_nickname, include_deleted=True)
 
     if user is None:
         return True
@@ -27,6 +28,7 @@ def validate_nickname(requested_nickname: str):
 
 
 @app.post("/user/validate_nickname", dependencies=[Depends(cookie)])
+@query_budget(2)
 def get_nickname(request: Nicknames, _: SessionData = Depends(verifier)):
     if validate_nickname(request.nickname):
         return JSONResponse(
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+
+from src.backend.database.profiling import query_budget
+from src.backend.dependencies import cookie, verifier
+from src.backend.internals.profile import (
+    PROFILE_CACHE_MAX_AGE,
+    PROFILE_MAX_STORIES,
+    ProfileResponse,
+    profile_etag,
+    profile_load,
+)
+from src.backend.sessions import SessionData
+
+app = APIRouter()
+
+
+@app.get("/user/{user_id}/profile", response_model=ProfileResponse, dependencies=[Depends(cookie)])
+@query_budget(5)
+async def get_profile(
+        user_id: int,
+        request: Request,
+        stories: int = 5,
+        session: SessionData = Depends(verifier)
+):
+    if stories < 0:
+        raise HTTPException(status_code=400, detail="Stories must be positive.")
+
+    profile = await profile_load(user_id, session.user_id, min(stories, PROFILE_MAX_STORIES))
+
+    if profile is None:
+        raise HTTPException(status_code=404, detail="User with specified id is not found.")
+
+    body = profile.json().encode()
+    # liked_by_me differs per viewer, so only the client may cache it
+    headers = {
+        "ETag": profile_etag(body),
+        "Cache-Control": f"private, max-age={PROFILE_CACHE_MAX_AGE}",
+    }
+
+    if headers["ETag"] in request.headers.get("if-none-match", "").replace("W/", "").split(", "):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
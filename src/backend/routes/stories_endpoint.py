@@ -1,20 +1,18 @@
-from pathlib import Path
-from uuid import uuid4
-
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-from sqlmodel import Session
-
-from src.backend.database import engine
-from src.backend.database.orm import Story
-from src.backend.dependencies import cookie, verifier
+from src.backend.database import async_session
+from src.backend.database.orm import Story, UserStoryLikes
+from src.backend.database.profiling import query_budget
+from src.backend.dependencies import cookie, verifier, uploads, images
 from src.backend.internals.stories import story_create, StoryResponse, check_photo, validate_goal_exists, \
-    check_description
+    check_description, story_response
+from src.backend.internals.uploads import UploadTooLarge
 from src.backend.sessions import SessionData
 
 app = APIRouter()
 
 
 @app.post('/story', response_model=StoryResponse, dependencies=[Depends(cookie)], status_code=201)
+@query_budget(4)
 async def create_story(
         goal_id: int,
         description: str,
@@ -26,40 +24,36 @@ async def create_story(
     except (TypeError, ValueError) as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    filename = f'{str(uuid4())}.{photo.filename.split(".")[-1]}'
-
-    upload_dir = Path(__file__).parent.parent.parent.parent / "uploads"
-    upload_dir.mkdir(exist_ok=True)
-
-    file_path = upload_dir / filename
-
-    with file_path.open("wb+") as file_object:
-        file_object.write(photo.file.read())
+    try:
+        description = check_description(description)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if not validate_goal_exists(goal_id):
+    # validate everything before the file is written, rejected requests leave no files behind
+    if not await validate_goal_exists(goal_id):
         raise HTTPException(status_code=404, detail="Goal with specified id is not found.")
 
     try:
-        description = check_description(description)
-    except ValueError as e:
+        file_path = await uploads.save(photo, "create_story")
+    except UploadTooLarge as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    story = story_create(session.user_id, goal_id, description, str(file_path))
+    images.schedule(file_path)
+
+    story = await story_create(session.user_id, goal_id, photo=str(file_path), description=description)
 
     return story
 
 
 @app.get("/story/{story_id}", response_model=StoryResponse, dependencies=[Depends(cookie)], status_code=200)
-async def get_story(story_id, _: SessionData = Depends(verifier)):
-    with Session(engine) as transaction:
-        story = Story.get_by_id(transaction, story_id)
-
-    if story is None:
-        raise HTTPException(status_code=404, detail="Story not found")
+@query_budget(3)
+async def get_story(story_id: int, session: SessionData = Depends(verifier)):
+    async with async_session() as transaction:
+        story = await Story.aget_by_id(transaction, story_id)
 
-    if story.deleted:
-        raise HTTPException(status_code=404, detail="Story not found")
+        if story is None:
+            raise HTTPException(status_code=404, detail="Story not found")
 
-    story.date_create = story.date_create.timestamp()
+        liked = await UserStoryLikes.aliked_story_ids(transaction, session.user_id, [story.id])
 
-    return story
+    return story_response(story, liked)
@@ -1,39 +1,29 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import Session
 
-from src.backend.database import engine
-from src.backend.database.orm import Story
+from src.backend.database import unit_of_work
+from src.backend.database.orm import Story, UserStoryLikes
+from src.backend.database.profiling import query_budget
 from src.backend.dependencies import cookie, verifier
-from src.backend.internals.stories import StoryResponse, check_description
+from src.backend.internals.stories import StoryResponse, check_description, story_response
 from src.backend.sessions import SessionData
 
 app = APIRouter()
 
 
-def validate_story_exists(story_id):
-    with Session(engine) as transaction:
-        if Story.get_by_id(transaction, story_id) is None:
-            return False
-
-        if Story.get_by_id(transaction, story_id).deleted:
-            return False
-
-        return True
-
-
 @app.patch('/story', response_model=StoryResponse, dependencies=[Depends(cookie)], status_code=201)
+@query_budget(4)
 def update_story(story_id: int, description: str, session: SessionData = Depends(verifier)):
-    if not validate_story_exists(story_id):
-        raise HTTPException(status_code=400, detail='История не найдена')
+    if not check_description(description):
+        raise HTTPException(status_code=400, detail='Описание истории превышает возможное количество символов')
 
-    with Session(engine) as transaction:
+    with unit_of_work() as transaction:
         story = Story.get_by_id(transaction, story_id)
-        if not check_description(description):
-            raise HTTPException(status_code=400, detail='Описание истории превышает возможное количество символов')
+        if story is None:
+            raise HTTPException(status_code=400, detail='История не найдена')
 
         story.summary = description
         story.update(transaction)
 
-        story.date_create = story.date_create.timestamp()
+        liked = UserStoryLikes.liked_story_ids(transaction, session.user_id, [story.id])
 
-    return story
+    return story_response(story, liked)
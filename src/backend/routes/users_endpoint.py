@@ -6,31 +6,32 @@ from src.backend.internals.users import (
     UserResponse,
     UserPatchRequest,
     UserPatchResponse,
-    get_password_hash,
+    Metadata,
     validate_photo,
     user_registrate,
     user_metadata_create,
 )
-from pathlib import Path
-from uuid import uuid4
 
-from sqlmodel import Session
-from src.backend.database import engine
-from src.backend.dependencies import cookie, verifier
+from src.backend.database import sync_session, async_session, async_unit_of_work, unit_of_work
+from src.backend.dependencies import cookie, verifier, backend, hasher, uploads, images
+from src.backend.internals.uploads import UploadTooLarge
 from src.backend.sessions import SessionData
 from src.backend.database.orm import User, UserMetadata
+from src.backend.database.profiling import query_budget
 from src.backend.routes.nickname_validation import validate_nickname
 
 app = APIRouter()
 
 
 @app.post('/users', response_model=UserResponse, status_code=201)
-def post_user(item: UserRequest):
-    item.password = get_password_hash(item.password)
+@query_budget(2)
+async def post_user(item: UserRequest):
+    item.password = await hasher.hash(item.password)
 
-    new_user = user_registrate(item)
+    async with async_unit_of_work() as transaction:
+        new_user = await user_registrate(item, transaction)
 
-    new_user_metadata = user_metadata_create(item, new_user.id)
+        new_user_metadata = await user_metadata_create(item, new_user, transaction)
 
     return UserResponse(id=new_user.id,
                         nickname=new_user.nickname,
@@ -39,8 +40,8 @@ def post_user(item: UserRequest):
 
 
 @app.post('/user/upload_file')
-def post_photo(file: UploadFile | None = None):
-    if validate_photo(file.content_type, file.size):
+async def post_photo(file: UploadFile | None = None):
+    if file is not None and validate_photo(file.content_type, file.size):
         ...
     else:
 
@@ -49,31 +50,29 @@ def post_photo(file: UploadFile | None = None):
             detail='Загружаемый файл не соответствует условиям'
         )
 
-    filename = f'{str(uuid4())}.{file.filename.split(".")[-1]}'
-
-    upload_dir = Path(__file__).parent.parent.parent.parent / "uploads"
-    upload_dir.mkdir(exist_ok=True)
-
-    file_path = upload_dir / filename
+    try:
+        file_path = await uploads.save(file, "post_photo")
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=400,
+            detail='Загружаемый файл не соответствует условиям'
+        )
 
-    with file_path.open("wb+") as file_object:
-        file_object.write(file.file.read())
+    images.schedule(file_path)
 
     return str(file_path)
 
 
 @app.get('/user/me', response_model=UserResponse, dependencies=[Depends(cookie)])
+@query_budget(2)
 def get_user_me(session: SessionData = Depends(verifier)):
-    with Session(engine) as transaction:
-        user = User.get_by_id(transaction, session.user_id)
-
-    if user is None:
-        raise HTTPException(status_code=404, detail="User with specified id is not found.")
+    with sync_session() as transaction:
+        found = User.get_with_metadata(transaction, session.user_id)
 
-    if user.deleted:
+    if found is None:
         raise HTTPException(status_code=404, detail="User with specified id is not found.")
 
-    metadata = UserMetadata.get_by_user_id(transaction, user.id)
+    user, metadata = found
 
     return UserResponse(id=user.id,
                         nickname=user.nickname,
@@ -82,6 +81,7 @@ def get_user_me(session: SessionData = Depends(verifier)):
 
 
 @app.get('/user', dependencies=[Depends(cookie)], response_model=UserResponse)
+@query_budget(3)
 def read_user(
         user_id: Annotated[int, Form()] = None,
         nickname: Annotated[str, Form()] = None,
@@ -104,7 +104,7 @@ def read_user(
     # pick any not none field
     field = user_id if user_id is not None else nickname
 
-    with Session(engine) as transaction:
+    with sync_session() as transaction:
         if user_id is not None:
             user = User.get_by_id(transaction, field)
         else:
@@ -113,9 +113,6 @@ def read_user(
         if user is None:
             raise HTTPException(status_code=404, detail="User with specified id is not found.")
 
-        if user.deleted:
-            raise HTTPException(status_code=404, detail="User with specified id is not found.")
-
         user_metadata = UserMetadata.get_by_user_id(transaction, user.id)
 
         return UserResponse(nickname=user.nickname,
@@ -125,17 +122,17 @@ def read_user(
 
 
 @app.patch("/user", dependencies=[Depends(cookie)], status_code=200, response_model=UserPatchResponse)
+@query_budget(5)
 def update_user(update_data: UserPatchRequest, session: SessionData = Depends(verifier)):
-    with Session(engine) as transaction:
+    if update_data.nickname is not None and validate_nickname(update_data.nickname) is not True:
+        raise HTTPException(
+            status_code=400,
+            detail='Никнейм занят'
+        )
 
-        updated_user = User.get_by_id(transaction, session.user_id)
-        updated_metadata = UserMetadata.get_by_user_id(transaction, session.user_id)
+    with unit_of_work() as transaction:
 
-        if validate_nickname(update_data.nickname) is not True:
-            raise HTTPException(
-                status_code=400,
-                detail='Никнейм занят'
-            )
+        updated_user, updated_metadata = User.get_with_metadata(transaction, session.user_id)
 
         if update_data.nickname is not None:
             updated_user.nickname = update_data.nickname
@@ -147,18 +144,20 @@ def update_user(update_data: UserPatchRequest, session: SessionData = Depends(ve
         updated_user.update(transaction)
         updated_metadata.update(transaction)
 
-        updated_user.user_metadata = [updated_metadata]
-
-        return updated_user
+    return UserPatchResponse(nickname=updated_user.nickname,
+                             user_metadata=[Metadata(photo=updated_metadata.photo,
+                                                     description=updated_metadata.description)])
 
 
 @app.delete("/user", dependencies=[Depends(cookie)], status_code=204)
-def delete_user(session: SessionData = Depends(verifier)):
-    with Session(engine) as transaction:
-        current_user = User.get_by_id(transaction, session.user_id)
+async def delete_user(session: SessionData = Depends(verifier)):
+    async with async_session() as transaction:
+        current_user = await User.aget_by_id(transaction, session.user_id)
 
-        if current_user.deleted:
+        if current_user is None:
             raise HTTPException(status_code=404, detail='User not found.')
 
-        current_user.delete(transaction)
+        await current_user.adelete(transaction)
+
+    await backend.revoke_user(session.user_id)
 
@@ -1,19 +1,39 @@
+import asyncio
+import contextvars
+import fcntl
+import logging
+import mmap
+import os
+import random
+import struct
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from threading import Lock
+from time import monotonic, perf_counter
 from typing import Union
 
-from fastapi import HTTPException, Request
+from fastapi import HTTPException, Request, Response
 from fastapi_sessions.frontends.implementations import SessionCookie
 from fastapi_sessions.frontends.session_frontend import FrontendError, ID
 from fastapi_sessions.session_verifier import SessionVerifier, SessionBackend
 from itsdangerous import BadSignature, SignatureExpired
 from pydantic import validator
-from sqlmodel import SQLModel, Session, Field
+from sqlmodel import SQLModel, Session, Field, select, delete, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 from uuid import UUID, uuid4
 from os import environ
 
+from src.backend.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+SESSION_TTL = timedelta(minutes=int(environ.get('SESSION_MINUTES_TO_LIVE')))
+
 
 def get_expiration(
-        delta: timedelta = timedelta(minutes=int(environ.get('SESSION_MINUTES_TO_LIVE')))
+        delta: timedelta = SESSION_TTL
 ) -> float:
     """Get expiration time in seconds from now.
 
@@ -52,6 +72,62 @@ class FastSessionCookie(SessionCookie):
         super().attach_id_state(request, session_id)
         return session_id
 
+    def attach_session(self, response: Response, data: "SessionData") -> None:
+        """Attach session cookie to response.
+
+        Args:
+            response (Response): Response.
+            data (SessionData): Session data.
+        """
+        self.attach_to_response(response, data.uuid)
+
+
+class SignedSessionCookie(FastSessionCookie):
+    """Session cookie that carries the whole session data.
+
+    The cookie holds a signed ``[uuid, user_id, nickname, expires_in]``
+    payload, so the session can be verified without touching the database.
+    The session id attached to the request is the decoded ``SessionData``.
+    """
+    def _load(self, request: Request) -> Union["SessionData", FrontendError]:
+        signed_session = request.cookies.get(self.model.name)
+
+        if not signed_session:
+            return FrontendError("No session cookie attached to request")
+
+        try:
+            uuid, user_id, nickname, expires_in = self.signer.loads(
+                signed_session,
+                max_age=self.cookie_params.max_age,
+                return_timestamp=False,
+            )
+            return SessionData(uuid=UUID(uuid), user_id=user_id, nickname=nickname, expires_in=expires_in)
+        except (SignatureExpired, BadSignature, TypeError, ValueError):
+            return FrontendError("Session cookie has invalid signature")
+
+    def __call__(self, request: Request) -> Union["SessionData", FrontendError]:
+        data = self._load(request)
+
+        if isinstance(data, FrontendError) and self.auto_error:
+            if request.cookies.get(self.model.name):
+                raise HTTPException(status_code=401, detail="Invalid session provided")
+            raise HTTPException(status_code=403, detail="No session provided")
+
+        super().attach_id_state(request, data)
+        return data
+
+    def get_last_cookie(self, request: Request) -> Union["SessionData", FrontendError]:
+        data = self._load(request)
+        super().attach_id_state(request, data)
+        return data
+
+    def attach_session(self, response: Response, data: "SessionData") -> None:
+        response.set_cookie(
+            key=self.model.name,
+            value=str(self.signer.dumps([data.uuid.hex, data.user_id, data.nickname, data.expires_in])),
+            **dict(self.cookie_params),
+        )
+
 
 class SessionData(SQLModel, table=True):
     """Session data model.
@@ -76,7 +152,7 @@ class SessionData(SQLModel, table=True):
     uuid: UUID = Field(default_factory=uuid4, primary_key=True)
     user_id: int
     nickname: str
-    expires_in: float = Field(default_factory=get_expiration)
+    expires_in: float = Field(default_factory=get_expiration, index=True)
 
     @validator("user_id")
     def user_id_must_be_positive(cls, v):
@@ -91,6 +167,103 @@ class SessionData(SQLModel, table=True):
         return v
 
 
+class SessionCache:
+    """Bounded LRU cache of session data with per-entry TTL.
+
+    An entry lives for at most ``ttl`` seconds and never outlives the
+    ``expires_in`` of the cached session. The cache is per process, so a
+    session deleted by another worker may still be served from here for up
+    to ``ttl`` seconds.
+
+    Attributes:
+        maxsize (int): Maximum number of cached sessions.
+        ttl (float): Maximum entry age in seconds.
+        hits (int): Number of reads served from the cache.
+        misses (int): Number of reads that fell through to the backend.
+
+    Returns:
+        SessionCache: Session cache.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[UUID, tuple[float, SessionData]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, session_id: UUID) -> SessionData | None:
+        """Get cached session.
+
+        Args:
+            session_id (UUID): Session UUID.
+
+        Returns:
+            SessionData | None: Session data if cached and fresh.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+
+            if entry is None or entry[0] <= monotonic():
+                if entry is not None:
+                    del self._entries[session_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, session_id: UUID, data: SessionData) -> None:
+        """Cache session.
+
+        Args:
+            session_id (UUID): Session UUID.
+            data (SessionData): Session data.
+        """
+        if self.maxsize <= 0:
+            return
+
+        # never keep an entry past the moment the session itself expires
+        ttl = min(self.ttl, data.expires_in - datetime.now().timestamp())
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[session_id] = (monotonic() + ttl, data)
+            self._entries.move_to_end(session_id)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: UUID) -> None:
+        """Drop cached session.
+
+        Args:
+            session_id (UUID): Session UUID.
+        """
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached session of a user.
+
+        Args:
+            user_id (int): User ID.
+        """
+        with self._lock:
+            for session_id in [k for k, (_, v) in self._entries.items() if v.user_id == user_id]:
+                del self._entries[session_id]
+
+    def stats(self) -> dict:
+        """Get cache counters.
+
+        Returns:
+            dict: Size, hits and misses.
+        """
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
 # create sql backend for sessions
 class SQLBackend(SessionBackend):
     """SQL backend for sessions.
@@ -100,12 +273,14 @@ class SQLBackend(SessionBackend):
 
     Attributes:
         engine (Engine): SQLAlchemy engine.
+        cache (SessionCache | None): Optional read cache.
 
     Returns:
         SQLBackend: SQL backend for sessions.
         """
-    def __init__(self, _engine):
+    def __init__(self, _engine, cache: SessionCache | None = None):
         self.engine = _engine
+        self.cache = cache
 
     async def create(self, session_id: UUID, data: SessionData) -> None:
         """Create session.
@@ -119,6 +294,9 @@ class SQLBackend(SessionBackend):
             session.commit()
             session.refresh(data)
 
+        if self.cache is not None:
+            self.cache.put(session_id, data)
+
     async def read(self, session_id: UUID) -> SessionData | None:
         """Read session.
 
@@ -128,8 +306,18 @@ class SQLBackend(SessionBackend):
         Returns:
             SessionData | None: Session data.
         """
+        if self.cache is not None:
+            data = self.cache.get(session_id)
+            if data is not None:
+                return data
+
         with Session(self.engine) as session:
-            return session.get(SessionData, session_id)
+            data = session.get(SessionData, session_id)
+
+        if data is not None and self.cache is not None:
+            self.cache.put(session_id, data)
+
+        return data
 
     async def update(self, session_id: UUID, data: SessionData) -> None:
         """Update session.
@@ -142,9 +330,16 @@ class SQLBackend(SessionBackend):
             SessionData | None: Session data.
         """
         with Session(self.engine) as session:
-            session.add(data)
+            result = session.exec(
+                update(SessionData)
+                .where(SessionData.uuid == session_id)
+                .values(user_id=data.user_id, nickname=data.nickname, expires_in=data.expires_in)
+            )
             session.commit()
-            session.refresh(data)
+
+        # the session may have been deleted meanwhile, do not resurrect it in the cache
+        if self.cache is not None and result.rowcount:
+            self.cache.put(session_id, data)
 
     async def delete(self, session_id: UUID) -> None:
         """Delete session.
@@ -155,11 +350,565 @@ class SQLBackend(SessionBackend):
         Returns:
             SessionData | None: Session data.
         """
+        if self.cache is not None:
+            self.cache.invalidate(session_id)
+
         with Session(self.engine) as session:
             data = session.get(SessionData, session_id)
             session.delete(data)
             session.commit()
 
+    async def revoke_user(self, user_id: int) -> None:
+        """Delete every session of a user.
+
+        Args:
+            user_id (int): User ID.
+        """
+        if self.cache is not None:
+            self.cache.invalidate_user(user_id)
+
+        with Session(self.engine) as session:
+            session.exec(delete(SessionData).where(SessionData.user_id == user_id))
+            session.commit()
+
+
+class AsyncSQLBackend(SQLBackend):
+    """Asynchronous SQL backend for sessions.
+
+    Same as ``SQLBackend`` but talks to the database through an
+    ``AsyncEngine``, so a session lookup does not block the event loop.
+
+    Args:
+        SQLBackend (SQLBackend): SQL backend for sessions.
+
+    Attributes:
+        engine (AsyncEngine): SQLAlchemy async engine.
+        cache (SessionCache | None): Optional read cache.
+
+    Returns:
+        AsyncSQLBackend: Asynchronous SQL backend for sessions.
+    """
+    async def create(self, session_id: UUID, data: SessionData) -> None:
+        """Create session.
+
+        Args:
+            session_id (UUID): Session UUID.
+            data (SessionData): Session data.
+        """
+        async with AsyncSession(self.engine) as session:
+            session.add(data)
+            await session.commit()
+            await session.refresh(data)
+
+        if self.cache is not None:
+            self.cache.put(session_id, data)
+
+    async def read(self, session_id: UUID) -> SessionData | None:
+        """Read session.
+
+        Args:
+            session_id (UUID): Session UUID.
+
+        Returns:
+            SessionData | None: Session data.
+        """
+        if self.cache is not None:
+            data = self.cache.get(session_id)
+            if data is not None:
+                return data
+
+        async with AsyncSession(self.engine) as session:
+            data = await session.get(SessionData, session_id)
+
+        if data is not None and self.cache is not None:
+            self.cache.put(session_id, data)
+
+        return data
+
+    async def update(self, session_id: UUID, data: SessionData) -> None:
+        """Update session.
+
+        Args:
+            session_id (UUID): Session UUID.
+            data (SessionData): Session data.
+        """
+        async with AsyncSession(self.engine) as session:
+            result = await session.exec(
+                update(SessionData)
+                .where(SessionData.uuid == session_id)
+                .values(user_id=data.user_id, nickname=data.nickname, expires_in=data.expires_in)
+            )
+            await session.commit()
+
+        # the session may have been deleted meanwhile, do not resurrect it in the cache
+        if self.cache is not None and result.rowcount:
+            self.cache.put(session_id, data)
+
+    async def delete(self, session_id: UUID) -> None:
+        """Delete session.
+
+        Args:
+            session_id (UUID): Session UUID.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(session_id)
+
+        async with AsyncSession(self.engine) as session:
+            await session.exec(delete(SessionData).where(SessionData.uuid == session_id))
+            await session.commit()
+
+    async def revoke_user(self, user_id: int) -> None:
+        """Delete every session of a user.
+
+        Args:
+            user_id (int): User ID.
+        """
+        if self.cache is not None:
+            self.cache.invalidate_user(user_id)
+
+        async with AsyncSession(self.engine) as session:
+            await session.exec(delete(SessionData).where(SessionData.user_id == user_id))
+            await session.commit()
+
+
+class SharedSessionTable:
+    """Fixed-size open-addressing hash table of sessions in a memory-mapped file.
+
+    Every worker on the host maps the same file. Records are
+    ``(state, uuid, user_id, nickname, expires_in)`` packed into a fixed
+    size and placed by linear probing from ``uuid % slots``. Deleted records
+    become tombstones, expired and deleted records are reused on insert.
+    Tombstones still lengthen probes, once ``max_tombstones`` of them
+    accumulate the table is rebuilt in place without them.
+    Access is serialized between processes with ``flock`` on the file
+    (shared for reads, exclusive for writes) and between threads with a
+    lock.
+
+    A file laid out for another table size is mapped by other workers,
+    possibly of a previous deployment, and is refused instead of reset.
+
+    Attributes:
+        path (str): Path of the mapped file.
+        slots (int): Number of records in the table.
+        max_tombstones (int): Tombstones that trigger a rebuild, a quarter of the slots by default.
+        rebuilds (int): Number of rebuilds done by this worker.
+
+    Raises:
+        ValueError: If the file is laid out for another table.
+
+    Returns:
+        SharedSessionTable: Shared session table.
+    """
+    MAGIC = b"ACTNSES2"
+    HEADER = struct.Struct("<8sII")
+    TOMBSTONES = struct.Struct("<Q")
+    RECORD = struct.Struct("<B16sq32sd")
+    EMPTY, USED, DELETED = 0, 1, 2
+
+    def __init__(self, path: str, slots: int, max_tombstones: int | None = None):
+        self.path = path
+        self.slots = slots
+        self.max_tombstones = slots // 4 if max_tombstones is None else max_tombstones
+        self.rebuilds = 0
+        self._lock = Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = self._offset(slots)
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                # a new file, no worker maps it yet
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, self.HEADER.pack(self.MAGIC, slots, self.RECORD.size), 0)
+
+            header = os.pread(self._fd, self.HEADER.size, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        if header != self.HEADER.pack(self.MAGIC, slots, self.RECORD.size):
+            os.close(self._fd)
+            raise ValueError(
+                f"Session table {path} is laid out for another table size or version, "
+                "remove it once no worker maps it or set SESSION_SHM_SLOTS to match"
+            )
+
+        self._map = mmap.mmap(self._fd, size)
+
+    def _offset(self, slot: int) -> int:
+        return self.HEADER.size + self.TOMBSTONES.size + slot * self.RECORD.size
+
+    def _count_tombstones(self, change: int) -> int:
+        tombstones = self.TOMBSTONES.unpack_from(self._map, self.HEADER.size)[0] + change
+        self.TOMBSTONES.pack_into(self._map, self.HEADER.size, tombstones)
+        return tombstones
+
+    def _rebuild(self) -> None:
+        # every worker probes the same map, rebuild it in place under the exclusive lock
+        now = datetime.now().timestamp()
+        records = []
+        for slot in range(self.slots):
+            record = self._map[self._offset(slot):self._offset(slot + 1)]
+            state, _, _, _, expires_in = self.RECORD.unpack(record)
+            if state == self.USED and expires_in > now:
+                records.append(record)
+
+        self._map[self._offset(0):self._offset(self.slots)] = bytes(self._offset(self.slots) - self._offset(0))
+        self.TOMBSTONES.pack_into(self._map, self.HEADER.size, 0)
+        for record in records:
+            session_id = UUID(bytes=self.RECORD.unpack(record)[1])
+            for slot, (state, *_) in self._probe(session_id):
+                if state == self.EMPTY:
+                    self._map[self._offset(slot):self._offset(slot + 1)] = record
+                    break
+
+        self.rebuilds += 1
+
+    def _probe(self, session_id: UUID):
+        start = session_id.int % self.slots
+        for i in range(self.slots):
+            slot = (start + i) % self.slots
+            yield slot, self.RECORD.unpack_from(self._map, self._offset(slot))
+
+    @contextmanager
+    def _locked(self, operation: int):
+        with self._lock:
+            fcntl.flock(self._fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def get(self, session_id: UUID) -> SessionData | None:
+        """Get session.
+
+        Args:
+            session_id (UUID): Session UUID.
+
+        Returns:
+            SessionData | None: Session data unless missing or expired.
+        """
+        now = datetime.now().timestamp()
+
+        with self._locked(fcntl.LOCK_SH):
+            for _, (state, uuid, user_id, nickname, expires_in) in self._probe(session_id):
+                if state == self.EMPTY:
+                    return None
+
+                if state == self.USED and uuid == session_id.bytes:
+                    if expires_in <= now:
+                        return None
+
+                    return SessionData(
+                        uuid=session_id,
+                        user_id=user_id,
+                        nickname=nickname.rstrip(b"\0").decode(),
+                        expires_in=expires_in,
+                    )
+
+        return None
+
+    def put(self, session_id: UUID, data: SessionData, replace_only: bool = False) -> bool:
+        """Insert or replace session.
+
+        Args:
+            session_id (UUID): Session UUID.
+            data (SessionData): Session data.
+            replace_only (bool): Only overwrite an existing record.
+
+        Returns:
+            bool: False if the session was not stored.
+        """
+        nickname = data.nickname.encode()
+        if len(nickname) > 32:
+            return False
+
+        record = self.RECORD.pack(self.USED, session_id.bytes, data.user_id, nickname, data.expires_in)
+        now = datetime.now().timestamp()
+        free = None
+
+        with self._locked(fcntl.LOCK_EX):
+            found = None
+            for slot, (state, uuid, _, _, expires_in) in self._probe(session_id):
+                if state == self.USED and uuid == session_id.bytes:
+                    found = slot
+                    break
+
+                # empty, deleted and expired records can all be reused
+                if free is None and (state != self.USED or expires_in <= now):
+                    free = slot
+
+                if state == self.EMPTY:
+                    break
+
+            slot = found if found is not None or replace_only else free
+            if slot is None:
+                return False
+
+            if self._map[self._offset(slot)] == self.DELETED:
+                self._count_tombstones(-1)
+            self._map[self._offset(slot):self._offset(slot + 1)] = record
+
+        return True
+
+    def delete(self, session_id: UUID) -> None:
+        """Delete session.
+
+        Args:
+            session_id (UUID): Session UUID.
+        """
+        with self._locked(fcntl.LOCK_EX):
+            for slot, (state, uuid, _, _, _) in self._probe(session_id):
+                if state == self.EMPTY:
+                    return
+
+                if state == self.USED and uuid == session_id.bytes:
+                    self._map[self._offset(slot)] = self.DELETED
+                    if self._count_tombstones(1) > self.max_tombstones:
+                        self._rebuild()
+                    return
+
+    def delete_user(self, user_id: int) -> None:
+        """Delete every session of a user.
+
+        Args:
+            user_id (int): User ID.
+        """
+        with self._locked(fcntl.LOCK_EX):
+            deleted = 0
+            for slot in range(self.slots):
+                state, _, owner, _, _ = self.RECORD.unpack_from(self._map, self._offset(slot))
+                if state == self.USED and owner == user_id:
+                    self._map[self._offset(slot)] = self.DELETED
+                    deleted += 1
+
+            if deleted and self._count_tombstones(deleted) > self.max_tombstones:
+                self._rebuild()
+
+
+class SharedMemoryBackend(SessionBackend):
+    """Session backend shared by all workers of a host.
+
+    Sessions live in a ``SharedSessionTable``. An optional fallback backend
+    keeps them durable: writes go to both, and reads that miss the table
+    (after a restart or when the table is full) are served by the fallback
+    and copied into the table.
+
+    Attributes:
+        table (SharedSessionTable): Shared session table.
+        fallback (SessionBackend | None): Durable backend.
+
+    Returns:
+        SharedMemoryBackend: Shared memory backend for sessions.
+    """
+    def __init__(self, table: SharedSessionTable, fallback: SessionBackend | None = None):
+        self.table = table
+        self.fallback = fallback
+
+    async def create(self, session_id: UUID, data: SessionData) -> None:
+        """Create session.
+
+        Args:
+            session_id (UUID): Session UUID.
+            data (SessionData): Session data.
+        """
+        if self.fallback is not None:
+            await self.fallback.create(session_id, data)
+
+        if not self.table.put(session_id, data) and self.fallback is None:
+            logger.warning("Shared session table is full, session %s is not stored", session_id)
+
+    async def read(self, session_id: UUID) -> SessionData | None:
+        """Read session.
+
+        Args:
+            session_id (UUID): Session UUID.
+
+        Returns:
+            SessionData | None: Session data.
+        """
+        data = self.table.get(session_id)
+
+        if data is None and self.fallback is not None:
+            data = await self.fallback.read(session_id)
+            if data is not None:
+                self.table.put(session_id, data)
+
+        return data
+
+    async def update(self, session_id: UUID, data: SessionData) -> None:
+        """Update session.
+
+        Args:
+            session_id (UUID): Session UUID.
+            data (SessionData): Session data.
+        """
+        if self.fallback is not None:
+            await self.fallback.update(session_id, data)
+
+        # a session deleted meanwhile must not come back
+        self.table.put(session_id, data, replace_only=True)
+
+    async def delete(self, session_id: UUID) -> None:
+        """Delete session.
+
+        Args:
+            session_id (UUID): Session UUID.
+        """
+        self.table.delete(session_id)
+
+        if self.fallback is not None:
+            await self.fallback.delete(session_id)
+
+    async def revoke_user(self, user_id: int) -> None:
+        """Delete every session of a user.
+
+        Args:
+            user_id (int): User ID.
+        """
+        self.table.delete_user(user_id)
+
+        if self.fallback is not None:
+            await self.fallback.revoke_user(user_id)
+
+
+class RevokedSession(SQLModel, table=True):
+    """Revoked signed session.
+
+    Either ``uuid`` or ``user_id`` is set. A uuid entry revokes a single
+    session, a user entry revokes every session of that user that expires
+    no later than ``expires_in``. Entries are useless once ``expires_in``
+    has passed.
+
+    Attributes:
+        id (int): Entry ID.
+        uuid (UUID | None): Revoked session UUID.
+        user_id (int | None): Revoked user ID.
+        expires_in (float): Time after which the entry can be forgotten.
+    """
+    __tablename__ = "revoked_sessions"
+    id: int | None = Field(default=None, primary_key=True)
+    uuid: UUID | None = Field(default=None)
+    user_id: int | None = Field(default=None)
+    expires_in: float = Field(index=True)
+
+
+class SignedSessionBackend(SessionBackend):
+    """Stateless backend for sessions carried by ``SignedSessionCookie``.
+
+    Sessions are verified in memory. The database only holds a revocation
+    list, which is reloaded at most once per ``refresh_interval`` seconds,
+    so a logout performed by another worker takes effect within that delay.
+    Concurrent reads wait for one shared reload.
+
+    Attributes:
+        engine (AsyncEngine): SQLAlchemy async engine.
+        refresh_interval (float): Revocation list reload interval in seconds.
+
+    Returns:
+        SignedSessionBackend: Stateless backend for sessions.
+    """
+    def __init__(self, _engine, refresh_interval: float = 5.):
+        self.engine = _engine
+        self.refresh_interval = refresh_interval
+        self._revoked_sessions: dict[UUID, float] = {}
+        self._revoked_users: dict[int, float] = {}
+        self._loaded_at = float("-inf")
+        self._loading: asyncio.Task | None = None
+
+    def _add(self, entry: RevokedSession) -> None:
+        if entry.uuid is not None:
+            self._revoked_sessions[entry.uuid] = entry.expires_in
+        else:
+            self._revoked_users[entry.user_id] = max(
+                entry.expires_in, self._revoked_users.get(entry.user_id, float("-inf"))
+            )
+
+    async def _load(self) -> None:
+        now = datetime.now().timestamp()
+        async with AsyncSession(self.engine) as session:
+            entries = (await session.exec(select(RevokedSession).where(RevokedSession.expires_in > now))).all()
+
+        # merge instead of replacing, a revocation made here while loading stays
+        self._revoked_sessions = {key: value for key, value in self._revoked_sessions.items() if value > now}
+        self._revoked_users = {key: value for key, value in self._revoked_users.items() if value > now}
+        for entry in entries:
+            self._add(entry)
+        self._loaded_at = monotonic()
+
+    def _loaded(self, _task: asyncio.Task) -> None:
+        self._loading = None
+
+    async def _refresh(self) -> None:
+        if monotonic() - self._loaded_at < self.refresh_interval:
+            return
+
+        if self._loading is None:
+            # run outside the request context, the reload is shared by every waiting request
+            self._loading = contextvars.Context().run(asyncio.create_task, self._load())
+            self._loading.add_done_callback(self._loaded)
+
+        # a cancelled request does not cancel the reload the others wait for
+        await asyncio.shield(self._loading)
+
+    async def _revoke(self, entry: RevokedSession) -> None:
+        async with AsyncSession(self.engine) as session:
+            session.add(entry)
+            await session.commit()
+            await session.refresh(entry)
+
+        self._add(entry)
+
+    async def create(self, session_id: SessionData, data: SessionData) -> None:
+        """Create session. Nothing is stored, the cookie is the session.
+
+        Args:
+            session_id (SessionData): Session data.
+            data (SessionData): Session data.
+        """
+
+    async def read(self, session_id: SessionData) -> SessionData | None:
+        """Read session.
+
+        Args:
+            session_id (SessionData): Session data decoded from the cookie.
+
+        Returns:
+            SessionData | None: Session data unless revoked.
+        """
+        await self._refresh()
+
+        if session_id.uuid in self._revoked_sessions:
+            return None
+
+        if session_id.expires_in <= self._revoked_users.get(session_id.user_id, float("-inf")):
+            return None
+
+        return session_id
+
+    async def update(self, session_id: SessionData, data: SessionData) -> None:
+        """Update session. Signed sessions are immutable.
+
+        Args:
+            session_id (SessionData): Session data.
+            data (SessionData): Session data.
+        """
+
+    async def delete(self, session_id: SessionData) -> None:
+        """Delete session by adding it to the revocation list.
+
+        Args:
+            session_id (SessionData): Session data.
+        """
+        await self._revoke(RevokedSession(uuid=session_id.uuid, expires_in=session_id.expires_in))
+
+    async def revoke_user(self, user_id: int) -> None:
+        """Revoke every session of a user issued so far.
+
+        Args:
+            user_id (int): User ID.
+        """
+        await self._revoke(RevokedSession(user_id=user_id, expires_in=get_expiration()))
+
 
 class FastSessionVerifier(SessionVerifier[UUID, SessionData]):
     def __init__(
@@ -169,14 +918,26 @@ class FastSessionVerifier(SessionVerifier[UUID, SessionData]):
         auto_error: bool,
         backend: SessionBackend[UUID, SessionData],
         auth_http_exception: HTTPException,
+        renew_fraction: float | None = None,
+        verify_seconds: Histogram | None = None,
     ):
         """Basic session verifier.
 
+        With ``renew_fraction`` set, a verified session whose age exceeds
+        that fraction of ``SESSION_TTL`` gets its expiration pushed forward.
+        The update runs in a background task and only one renewal per
+        session is in flight at a time, so a burst of requests writes the
+        session at most once per renewal window.
+
         Attributes:
             identifier (str): Session identifier.
             auto_error (bool): Auto error.
             backend (SessionBackend[UUID, SessionData]): Session backend.
             auth_http_exception (HTTPException): Auth HTTP exception.
+            renew_fraction (float | None): Fraction of the TTL after which a session is renewed.
+            verify_seconds (Histogram | None): Histogram of session verification time.
+            renewals_written (int): Number of renewals written to the backend.
+            renewals_skipped (int): Number of verified sessions that did not need a renewal.
 
         Returns:
             FastSessionVerifier: Basic session verifier.
@@ -185,6 +946,12 @@ class FastSessionVerifier(SessionVerifier[UUID, SessionData]):
         self._auto_error = auto_error
         self._backend = backend
         self._auth_http_exception = auth_http_exception
+        self.renew_fraction = renew_fraction
+        self.verify_seconds = verify_seconds
+        self.renewals_written = 0
+        self.renewals_skipped = 0
+        self._renewing: set[UUID] = set()
+        self._renewal_tasks: set[asyncio.Task] = set()
 
     @property
     def identifier(self):
@@ -219,8 +986,73 @@ class FastSessionVerifier(SessionVerifier[UUID, SessionData]):
                 raise self.auth_http_exception
             return None
 
+        self.renew(session_data)
+
         return session_data
 
+    async def __call__(self, request: Request):
+        start = perf_counter()
+        try:
+            session_data = await super().__call__(request)
+        finally:
+            if self.verify_seconds is not None:
+                self.verify_seconds.observe(perf_counter() - start)
+
+        if isinstance(session_data, SessionData):
+            self.renew(session_data)
+
+        return session_data
+
+    def renew(self, model: SessionData) -> None:
+        """Schedule sliding renewal of a verified session if it is due.
+
+        Args:
+            model (SessionData): Session data.
+        """
+        if self.renew_fraction is None:
+            return
+
+        ttl = SESSION_TTL.total_seconds()
+        age = ttl - (model.expires_in - datetime.now().timestamp())
+
+        if age < ttl * self.renew_fraction or model.uuid in self._renewing:
+            self.renewals_skipped += 1
+            return
+
+        self._renewing.add(model.uuid)
+        # run outside the request context, the renewal is not the request's work
+        task = contextvars.Context().run(asyncio.create_task, self._renew(model))
+        self._renewal_tasks.add(task)
+        task.add_done_callback(self._renewal_tasks.discard)
+
+    async def _renew(self, model: SessionData) -> None:
+        renewed = SessionData(
+            uuid=model.uuid,
+            user_id=model.user_id,
+            nickname=model.nickname,
+            expires_in=get_expiration(),
+        )
+
+        try:
+            await self.backend.update(model.uuid, renewed)
+            self.renewals_written += 1
+        except Exception:
+            logger.exception("Session renewal failed")
+        finally:
+            self._renewing.discard(model.uuid)
+
+    def renewal_stats(self) -> dict:
+        """Get sliding renewal counters.
+
+        Returns:
+            dict: Written, skipped and in-flight renewals.
+        """
+        return {
+            "written": self.renewals_written,
+            "skipped": self.renewals_skipped,
+            "in_flight": len(self._renewing),
+        }
+
     def verify_session(self, model: SessionData) -> bool:
         """Verify session.
 
@@ -235,3 +1067,99 @@ class FastSessionVerifier(SessionVerifier[UUID, SessionData]):
             return False
 
         return True
+
+
+class SessionReaper:
+    """Background task deleting expired sessions.
+
+    Every pass deletes expired rows of ``sessions`` and ``revoked_sessions``
+    in transactions of at most ``batch_size`` rows. Rows are claimed with
+    ``FOR UPDATE SKIP LOCKED`` where the dialect supports it and passes are
+    started with a random offset, so several workers can run the reaper
+    against the same database without waiting on each other.
+
+    Attributes:
+        engine (Engine): SQLAlchemy engine.
+        interval (float): Seconds between passes.
+        batch_size (int): Maximum rows deleted per transaction.
+        last_removed (int): Rows removed by the last pass.
+        total_removed (int): Rows removed since start.
+
+    Returns:
+        SessionReaper: Background task deleting expired sessions.
+    """
+    def __init__(self, _engine, interval: float = 60., batch_size: int = 1000):
+        self.engine = _engine
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_removed = 0
+        self.total_removed = 0
+        self._task: asyncio.Task | None = None
+
+    def _reap_batch(self, model, key) -> tuple[int, int]:
+        now = datetime.now().timestamp()
+        removed = 0
+
+        with Session(self.engine) as session:
+            keys = session.exec(
+                select(key)
+                .where(model.expires_in <= now)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+
+            if keys:
+                # without SKIP LOCKED another reaper may have deleted some of them already
+                removed = session.exec(delete(model).where(key.in_(keys))).rowcount
+            session.commit()
+
+        return len(keys), removed
+
+    async def reap(self) -> int:
+        """Delete every expired session and revocation entry.
+
+        Returns:
+            int: Number of removed rows.
+        """
+        removed = 0
+
+        for model, key in ((SessionData, SessionData.uuid), (RevokedSession, RevokedSession.id)):
+            while True:
+                claimed, count = await asyncio.to_thread(self._reap_batch, model, key)
+                removed += count
+
+                if claimed < self.batch_size:
+                    break
+
+        self.last_removed = removed
+        self.total_removed += removed
+        logger.info("Session reaper removed %d expired rows", removed)
+
+        return removed
+
+    async def _run(self) -> None:
+        # spread workers started at the same time over the interval
+        await asyncio.sleep(random.uniform(0, self.interval))
+
+        while True:
+            try:
+                await self.reap()
+            except Exception:
+                logger.exception("Session reaper pass failed")
+
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start background task."""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop background task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
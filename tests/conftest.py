@@ -0,0 +1,46 @@
+"""Shared fixtures.
+
+Settings are read from the environment when the application modules are
+imported, so it is prepared here, before any test module imports them.
+"""
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+
+_directory = tempfile.mkdtemp(prefix="actnow-tests-")
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_directory}/app.sqlite",
+    "SESSION_COOKIE_NAME": "actnow_test",
+    "SESSION_IDENTIFIER": "actnow_test",
+    "SESSION_SECRET_KEY": "test",
+    "SESSION_MINUTES_TO_LIVE": "60",
+    "ENCRYPT_SALT_ROUNDS": "1000",
+    "ENCRYPT_SALT": "test",
+})
+
+from src.backend.database.migrations import migrate  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine of a fresh, migrated sqlite database"""
+    _engine = create_engine(f"sqlite:///{tmp_path}/test.sqlite")
+    migrate(_engine)
+    yield _engine
+    _engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Client of the application signed in as a fresh user"""
+    from fastapi.testclient import TestClient
+
+    from app import app
+
+    with TestClient(app) as _client:
+        _client.post("/users", json={"nickname": "tester", "password": "Passw0rdX", "description": "", "photo": None})
+        _client.post("/login", auth=("tester", "Passw0rdX")).raise_for_status()
+        yield _client
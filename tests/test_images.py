@@ -0,0 +1,17 @@
+import json
+
+from src.backend.internals import images
+from src.backend.internals.images import ImagePipeline, manifest_path
+
+
+def test_missing_manifests_are_remembered(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "UPLOAD_DIR", tmp_path)
+    pipeline = ImagePipeline({"thumb": 256}, missing_ttl=60)
+    photo = tmp_path / "photo.png"
+
+    assert pipeline.derivatives(str(photo)) == {}
+    manifest_path(photo).write_text(json.dumps({"thumb": "photo.thumb.png"}))
+    assert pipeline.derivatives(str(photo)) == {}
+
+    pipeline._missing[str(photo)] = 0.
+    assert pipeline.derivatives(str(photo)) == {"thumb": "photo.thumb.png"}
@@ -0,0 +1,75 @@
+import asyncio
+from threading import Thread
+
+from sqlmodel import Session
+
+from src.backend.database.orm import Goal, Story, User, UserStoryLikes
+from src.backend.internals.likes import LikeCounter
+
+
+def _story(engine) -> int:
+    with Session(engine) as session:
+        user = User(nickname="author", password="-")
+        session.add(user)
+        session.commit()
+        goal = Goal(title="goal", description="goal", user_id=user.id)
+        session.add(goal)
+        session.commit()
+        story = Story(user_id=user.id, goal_id=goal.id, photo="photo", summary="story")
+        session.add(story)
+        session.commit()
+
+        return story.id
+
+
+def _like(engine, story_id: int, likes: int) -> None:
+    with Session(engine) as session:
+        users = [User(nickname=f"fan{index}", password="-") for index in range(likes)]
+        session.add_all(users)
+        session.commit()
+        session.add_all(UserStoryLikes(user_id=user.id, story_id=story_id) for user in users)
+        session.commit()
+
+
+def test_stop_flushes_when_wakeup_races_cancellation(engine):
+    story_id = _story(engine)
+    _like(engine, story_id, 10)
+
+    async def burst_then_stop():
+        counter = LikeCounter(engine, max_pending=10, reconcile_interval=0)
+        counter.start()
+        await asyncio.sleep(0)
+        # the last delta wakes the flush task just before it is cancelled
+        for _ in range(10):
+            counter.add(story_id, 1)
+        await asyncio.sleep(0)
+        await counter.stop()
+
+    # a hanging stop cannot be cancelled, so the loop runs in a thread that may be left behind
+    loop = Thread(target=asyncio.run, args=(burst_then_stop(),), daemon=True)
+    loop.start()
+    loop.join(5)
+
+    assert not loop.is_alive(), "stop() did not return"
+
+    with Session(engine) as session:
+        assert session.get(Story, story_id).like_count == 10
+
+
+def test_reconcile_does_not_double_count_other_workers_likes(engine):
+    story_id = _story(engine)
+    _like(engine, story_id, 3)
+
+    async def other_worker_flushes_after_reconcile():
+        # the likes are committed, this worker has not flushed them yet
+        buffering = LikeCounter(engine, reconcile_interval=0)
+        for _ in range(3):
+            buffering.add(story_id, 1)
+
+        await LikeCounter(engine, reconcile_interval=0).reconcile()
+        await buffering.flush()
+
+    asyncio.run(other_worker_flushes_after_reconcile())
+
+    with Session(engine) as session:
+        assert session.get(Story, story_id).like_count == 3
@@ -0,0 +1,42 @@
+def _metrics(client) -> dict[str, float]:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+
+    return samples
+
+
+def test_session_renewals_are_exported(client):
+    client.get("/user/me").raise_for_status()
+    samples = _metrics(client)
+
+    assert 'actnow_session_renewals_total{outcome="written"}' in samples
+    assert samples['actnow_session_renewals_total{outcome="skipped"}'] >= 1
+    assert samples["actnow_session_renewals_in_flight"] >= 0
+
+
+def test_password_hasher_stats_are_exported(client):
+    samples = _metrics(client)
+
+    # the client fixture registered and signed in a user
+    assert samples['actnow_password_hashes_total{outcome="completed"}'] >= 2
+    assert samples['actnow_password_hashes_total{outcome="rejected"}'] == 0
+    assert samples["actnow_password_hash_seconds_total"] > 0
+    assert samples["actnow_password_hash_max_seconds"] > 0
+    assert samples["actnow_password_hash_queue_depth"] == 0
+
+
+def test_session_cache_stats_are_exported(client):
+    before = _metrics(client)
+    client.get("/user/me").raise_for_status()
+    after = _metrics(client)
+
+    hits = 'actnow_session_cache_lookups_total{result="hit"}'
+    assert after[hits] > before[hits]
+    assert 'actnow_session_cache_lookups_total{result="miss"}' in after
+    assert after["actnow_session_cache_size"] >= 1
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, func, inspect, text
+from sqlmodel import Session, SQLModel, select
+
+from src.backend.database.migrations import MIGRATIONS, migrate
+from src.backend.database.orm import Goal, Story, User, UserMetadata, UserStoryLikes
+
+
+def _seed(session: Session) -> None:
+    for user_id in range(1, 4):
+        session.add(User(id=user_id, nickname=f"user{user_id}", password="x"))
+        session.add(UserMetadata(user_id=user_id))
+        for goal in range(3):
+            goal_id = user_id * 10 + goal
+            session.add(Goal(id=goal_id, title="t", description="d", user_id=user_id))
+            for story in range(3):
+                session.add(Story(
+                    id=goal_id * 10 + story, user_id=user_id, goal_id=goal_id, photo="p", summary="s",
+                    date_create=datetime(2023, 1, 1, story),
+                ))
+    session.commit()
+    session.add(UserStoryLikes(user_id=1, story_id=100))
+    session.commit()
+
+
+def _plans(engine, query) -> list[str]:
+    """Run query and get the sqlite plan of every statement it ran"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    with Session(engine) as session:
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            query(session)
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        with engine.connect() as connection:
+            return [
+                " | ".join(row.detail for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters))
+                for sql, parameters in statements
+            ]
+
+
+def test_migrate_applies_every_version_once(engine):
+    with engine.connect() as connection:
+        versions = connection.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars()
+        assert list(versions) == [m.version for m in MIGRATIONS]
+
+    assert migrate(engine) == []
+
+
+def test_migrated_schema_matches_models(engine):
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        assert columns == {column.name for column in table.columns}
+
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert indexes == {index.name for index in table.indexes}
+
+
+@pytest.mark.parametrize("index, query", [
+    ("ix_user_nickname", lambda session: User.get_by_nickname(session, "user2")),
+    ("ix_usermetadata_user_id", lambda session: UserMetadata.get_by_user_id(session, 2)),
+    ("ix_goal_user_id_date_create", lambda session: Goal.get_by_user_id(session, 2, limit=10)),
+    ("ix_story_user_id_date_create", lambda session: Story.get_by_user_id(session, 2, limit=10)),
+    ("ix_story_goal_id_date_create", lambda session: Story.get_by_goal_id(session, 21, limit=10)),
+    (
+        "ix_userstorylikes_story_id",
+        lambda session: session.exec(select(func.count()).where(UserStoryLikes.story_id == 100)).one(),
+    ),
+])
+def test_filtered_queries_use_indexes(engine, index, query):
+    with Session(engine) as session:
+        _seed(session)
+
+    plans = _plans(engine, query)
+
+    assert plans
+    for plan in plans:
+        assert f"USING INDEX {index}" in plan or f"USING COVERING INDEX {index}" in plan, plan
+        assert "SCAN" not in plan, plan
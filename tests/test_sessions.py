@@ -0,0 +1,168 @@
+import asyncio
+import sqlite3
+from datetime import datetime
+from threading import Event, Thread
+from time import perf_counter, sleep
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event, func
+from sqlmodel import Session, select
+
+from src.backend.database import create_engines
+from src.backend.database.pool import PoolStats
+from src.backend.sessions import (
+    AsyncSQLBackend, RevokedSession, SessionCache, SessionData, SessionReaper, SharedSessionTable,
+    SignedSessionBackend, SQLBackend,
+)
+
+EXPIRED = 2000
+LIVE = 50
+
+
+def test_concurrent_reapers_delete_each_row_once(engine):
+    now = datetime.now().timestamp()
+    with Session(engine) as session:
+        session.add_all(
+            SessionData(user_id=1, nickname="user", expires_in=now - 1 - i) for i in range(EXPIRED)
+        )
+        session.add_all(SessionData(user_id=1, nickname="user", expires_in=now + 3600) for _ in range(LIVE))
+        session.add_all(RevokedSession(uuid=uuid4(), expires_in=now - 1) for _ in range(EXPIRED // 10))
+        session.commit()
+
+    reapers = [SessionReaper(engine, interval=0, batch_size=100) for _ in range(2)]
+
+    async def reap_together():
+        return await asyncio.gather(*(reaper.reap() for reaper in reapers))
+
+    removed = asyncio.run(reap_together())
+
+    assert sum(removed) == EXPIRED + EXPIRED // 10
+    assert sum(reaper.total_removed for reaper in reapers) == EXPIRED + EXPIRED // 10
+    with Session(engine) as session:
+        assert session.exec(select(func.count()).select_from(SessionData)).one() == LIVE
+        assert session.exec(select(func.count()).select_from(RevokedSession)).one() == 0
+
+
+def test_async_backend_lookups_do_not_block_the_event_loop(tmp_path):
+    path = tmp_path / "sessions.sqlite"
+    engine, async_engine = create_engines(f"sqlite:///{path}", PoolStats("engine"), PoolStats("async_engine"))
+    SessionData.metadata.create_all(engine, tables=[SessionData.__table__])
+    ids = [uuid4() for _ in range(10)]
+    with Session(engine) as session:
+        session.add_all(SessionData(uuid=_id, user_id=1, nickname="user") for _id in ids)
+        session.commit()
+
+    locked = .3
+
+    def hold_lock(acquired: Event):
+        # a writer keeps the database busy, lookups wait for it
+        connection = sqlite3.connect(path)
+        connection.execute("BEGIN EXCLUSIVE")
+        acquired.set()
+        sleep(locked)
+        connection.rollback()
+        connection.close()
+
+    async def longest_stall(backend) -> float:
+        """Read sessions while a writer holds the database, return the longest event loop stall"""
+        acquired = Event()
+        writer = Thread(target=hold_lock, args=(acquired,))
+        writer.start()
+        acquired.wait()
+
+        lookups = asyncio.gather(*(backend.read(_id) for _id in ids))
+        stalls = []
+        while not lookups.done():
+            tick = perf_counter()
+            await asyncio.sleep(.005)
+            stalls.append(perf_counter() - tick)
+
+        assert all(data is not None for data in await lookups)
+        writer.join()
+        return max(stalls)
+
+    try:
+        blocking = asyncio.run(longest_stall(SQLBackend(engine)))
+        concurrent = asyncio.run(longest_stall(AsyncSQLBackend(async_engine)))
+    finally:
+        engine.dispose()
+        asyncio.run(async_engine.dispose())
+
+    # the sync backend waits for the writer on the event loop, nothing else runs meanwhile
+    assert blocking >= locked / 2
+    assert concurrent < locked / 4
+
+
+def test_sync_backend_updates_existing_session(engine):
+    backend = SQLBackend(engine, SessionCache(maxsize=10, ttl=60))
+    session_id, now = uuid4(), datetime.now().timestamp()
+    created = SessionData(uuid=session_id, user_id=1, nickname="user", expires_in=now + 60)
+    asyncio.run(backend.create(session_id, created))
+
+    renewed = SessionData(uuid=session_id, user_id=1, nickname="user", expires_in=now + 120)
+    asyncio.run(backend.update(session_id, renewed))
+
+    with Session(engine) as session:
+        assert session.get(SessionData, session_id).expires_in == now + 120
+    assert backend.cache.get(session_id).expires_in == now + 120
+
+    # a session deleted meanwhile is not put back in the cache
+    asyncio.run(backend.delete(session_id))
+    asyncio.run(backend.update(session_id, renewed))
+    assert backend.cache.get(session_id) is None
+
+
+def test_signed_backend_concurrent_reads_share_one_reload(tmp_path):
+    engine, async_engine = create_engines(
+        f"sqlite:///{tmp_path / 'sessions.sqlite'}", PoolStats("engine"), PoolStats("async_engine")
+    )
+    RevokedSession.metadata.create_all(engine, tables=[RevokedSession.__table__])
+    backend = SignedSessionBackend(async_engine, refresh_interval=60)
+    sessions = [SessionData(uuid=uuid4(), user_id=1, nickname="user") for _ in range(10)]
+
+    statements = []
+    event.listen(async_engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    async def read_all():
+        await backend.delete(sessions[0])
+        return await asyncio.gather(*(backend.read(data) for data in sessions))
+
+    try:
+        read = asyncio.run(read_all())
+    finally:
+        engine.dispose()
+        asyncio.run(async_engine.dispose())
+
+    assert read[0] is None
+    assert read[1:] == sessions[1:]
+    assert sum("revoked_sessions.expires_in >" in statement for statement in statements) == 1
+
+
+def test_shared_table_refuses_another_layout(tmp_path):
+    path = str(tmp_path / "sessions.shm")
+    table = SharedSessionTable(path, slots=8)
+    session = SessionData(uuid=uuid4(), user_id=1, nickname="user")
+    table.put(session.uuid, session)
+
+    with pytest.raises(ValueError):
+        SharedSessionTable(path, slots=16)
+
+    assert table.get(session.uuid) == session
+
+
+def test_shared_table_rebuilds_without_tombstones(tmp_path):
+    table = SharedSessionTable(str(tmp_path / "sessions.shm"), slots=16, max_tombstones=4)
+    sessions = [SessionData(uuid=uuid4(), user_id=1 + i % 2, nickname="user") for i in range(10)]
+    for session in sessions:
+        assert table.put(session.uuid, session)
+
+    for session in sessions[:4]:
+        table.delete(session.uuid)
+    assert table.rebuilds == 0
+
+    table.delete(sessions[4].uuid)
+    assert table.rebuilds == 1
+    states = [table.RECORD.unpack_from(table._map, table._offset(slot))[0] for slot in range(table.slots)]
+    assert table.DELETED not in states
+    assert [table.get(session.uuid) for session in sessions] == [None] * 5 + sessions[5:]
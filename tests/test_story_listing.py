@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+
+from src.backend.database import async_engine, engine
+from src.backend.database.orm import Goal, Story, UserStoryLikes
+
+STORIES = 100
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (engine, async_engine.sync_engine)
+    for _engine in engines:
+        event.listen(_engine, "before_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        for _engine in engines:
+            event.remove(_engine, "before_cursor_execute", count)
+
+
+@pytest.fixture(scope="module")
+def seeded(client):
+    user_id = client.get("/user/me").json()["id"]
+
+    with Session(engine) as session:
+        goal = Goal(title="goal", description="stories", user_id=user_id)
+        session.add(goal)
+        session.commit()
+        stories = [
+            Story(user_id=user_id, goal_id=goal.id, photo="photo", summary=f"story {i}", like_count=i % 2)
+            for i in range(STORIES)
+        ]
+        session.add_all(stories)
+        session.commit()
+        UserStoryLikes.add(session, user_id, (story.id for story in stories[::2]))
+        session.commit()
+
+        return user_id, goal.id
+
+
+@pytest.mark.parametrize("path", ["/stories/user/{user_id}", "/stories/goal/{goal_id}"])
+def test_listing_runs_constant_number_of_queries(client, seeded, path):
+    user_id, goal_id = seeded
+    url = path.format(user_id=user_id, goal_id=goal_id)
+    # the first request may fill the session cache
+    client.get(url).raise_for_status()
+
+    counts = {}
+    for limit in (1, 10, STORIES):
+        with count_statements() as statements:
+            response = client.get(url, params={"limit": limit})
+
+        assert response.status_code == 200
+        assert len(response.json()) == limit
+        counts[limit] = len(statements)
+
+    assert len(set(counts.values())) == 1, counts
+    # stories and the likes of the viewer, session verification hits the cache
+    assert counts[STORIES] == 2
+
+
+def test_listing_reports_likes(client, seeded):
+    user_id, _ = seeded
+    stories = client.get(f"/stories/user/{user_id}", params={"limit": STORIES}).json()
+
+    assert sum(story["liked_by_me"] for story in stories) == STORIES // 2
+    assert all("like_count" in story for story in stories)
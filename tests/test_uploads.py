@@ -0,0 +1,17 @@
+import asyncio
+import io
+import os
+import stat
+
+from fastapi import UploadFile
+
+from src.backend.internals.uploads import FILE_MODE, UploadWriter
+
+
+def test_saved_upload_gets_default_permissions(tmp_path):
+    writer = UploadWriter(directory=tmp_path)
+    upload = UploadFile(file=io.BytesIO(b"\x89PNG\r\n\x1a\n" + b"0" * 100), filename="photo.png")
+
+    path = asyncio.run(writer.save(upload, "test"))
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == FILE_MODE